@@ -1,50 +1,74 @@
 import streamlit as st
-import plotly.graph_objects as go
 import numpy as np
 import pandas as pd
 
-# Importamos las tablas reales
-from tablas import (
-    generar_aportes,
-    simular_saldo_inicial_excel,
-    simular_saldo_comprometido_excel,
-    simular_bono_excel
-)
-
 from allianz_functions import (
     calcular_bono_fidelidad,
-    simular_retiro_simple,
-    simular_retiro_ppr,
-    buscar_retiro_optimo,
-    serie_vp,
-    generar_aportes_con_offset,
-    generar_aportes_early_stop
+    serie_vp
 )
 
-from allianz_functions_indexadas import (
-    simular_retiro_ppr_indexado,
-    simular_retiro_simple_indexado,
-    buscar_retiro_optimo_indexado,
-    tabla_retiro_completa
+from allianz_functions_indexadas import tabla_retiro_completa
+
+from kernel_lineal import saldo_comprometido_lineal
+
+from graficas import (
+    LAYOUT_ACUMULACION,
+    Grafica,
+    figura_cacheada,
+    figura_comparacion,
+    grafica_acumulacion,
+    mostrar_grafica
 )
+from paginacion import mostrar_detalle_mensual
+
+from cola_trabajos import (
+    ColaTrabajos,
+    TrabajoFallido,
+    asegurar_trabajador,
+    clave_trabajo,
+    esperar_en_cola
+)
+from ejecutor import TrabajoCancelado, despachador_de_sesion, esperar_en_streamlit
+
+# Etapas del cálculo (con caché por parámetros)
+from pipeline_allianz import (
+    grafo_acumulacion,
+    etf_neto_despues_de_isr,
+    etapa_retiros_optimos,
+    etapa_curvas_nominales,
+    etapa_curvas_indexadas,
+    etapa_montecarlo
+)
+from montecarlo import MIN_BLOQUES_IC
 
 st.set_page_config(page_title="Simulador Allianz", layout="wide")
 st.title("📘 Simulador Allianz — Versión Real 100% Excel")
 
 # ================================================================
-#                    📌 TABS
+#                    📌 VISTAS
 # ================================================================
-tab1, tab2, tab3 = st.tabs([
+# Solo se calcula y dibuja la vista elegida: la acumulación ya no espera
+# a las búsquedas de retiro ni a las tablas completas. Los datos de
+# entrada viven en la barra lateral para que sigan vivos al cambiar de
+# vista.
+VISTAS = [
     "1️⃣ Inputs + Acumulación",
     "2️⃣ Simulación de Retiro",
     "3️⃣ Tablas reales mes a mes"
-])
+]
+
+# Streamlit borra el estado de los widgets que no se dibujan en un rerun;
+# re-asignarlo mantiene los datos de la pestaña de retiro al cambiar de vista
+for clave in [k for k in st.session_state if str(k).startswith("retiro_")]:
+    st.session_state[clave] = st.session_state[clave]
+
+vista = st.segmented_control("Vista", VISTAS, default=VISTAS[0], key="vista") or VISTAS[0]
 
 
 # ================================================================
-#                        TAB 1 — INPUTS + GRÁFICA
+#                 BARRA LATERAL — INPUTS
 # ================================================================
-with tab1:
+with st.sidebar:
     st.header("📥 Datos del simulador Allianz")
 
     # ----------------------- DATOS GENERALES -----------------------
@@ -187,198 +211,274 @@ with tab1:
         usar_bono=usar_bono
     )
 
-    col1, col2 = st.columns(2)
-    col1.metric("% Bono", f"{porcentaje_bono * 100:.0f}%")
-    col2.metric("Bono Mensual", f"${bono:,.0f}")
-
-    # ================================================================
-    # RUN SIMULACIONES REALES
-    # ================================================================
-    meses = plazo_comprometido * 12
-
-    # ================================================================
-    # GENERACIÓN REAL DE APORTES — CON O SIN ESTRATEGIA
-    # ================================================================
 
-    aportes = []
-
-    if modo_estrategia:
-        # estrategia + early stop
-        aportes = generar_aportes_con_offset(
-            aporte_inicial=aporte_temporal,
-            meses=meses,
-            inflacion_anual=inflacion_anual,
-            incrementar=(incremento_inflacion == "Sí"),
-            offset=18,
-            nuevo_aporte=aportacion
-        )
-
-        aportes[18] += offset_manual
-
-    else:
-        # aquí detectamos early stop
-        aportes = generar_aportes_early_stop(
-            aporte_inicial=aportacion,
-            meses=meses,
-            inflacion_anual=inflacion_anual,
-            incrementar=(incremento_inflacion == "Sí"),
-            meses_aportando=años_aportando * 12
-        )
-    print("#"*100)
-    print("aportes ")
-    print(aportes[0:30])
-    print("#"*100)
-    # 2) SALDO INICIAL (todo el plazo, aportando solo 18 meses)
-    ap_inicial_real = aportes[0]  # primera mensualidad REAL
-
-    df_inicial = simular_saldo_inicial_excel(
-        aporte_inicial=ap_inicial_real,
-        meses_totales=meses,
-        meses_aportando=18,
-        tasa_anual=rendimiento_anual,
-        cargo_fijo_inicial=-500,
-        incrementar=(incremento_inflacion == "Sí"),
-        inflacion_anual=inflacion_anual
-    )
-
-    # 3) SAT: DEVOLUCIÓN ANUAL (REGLAS REALES) Y SERIE MENSUAL
-    # ======================================================
-    # 3.1) Aportes por año (con inflación)
-    aportes_por_anio = []
-    for year in range(plazo_comprometido):
-        inicio = year * 12
-        fin = min((year + 1) * 12, len(aportes))
-        aportes_por_anio.append(sum(aportes[inicio:fin]))
-
-    # 3.2) Salario que crece con la inflación
-    salarios_por_anio = []
-    salario_actual = salario_anual
-    for _ in range(plazo_comprometido):
-        salarios_por_anio.append(salario_actual)
-        salario_actual *= (1 + inflacion_anual)
-
-    # 3.3) SAT devuelto por año
-    sat_por_anio = []
-    for year, a_anual in enumerate(aportes_por_anio):
-        salario_base_anual = salarios_por_anio[year]
-        UMA = uma_inicial  # input editable
-
-        # Límite 1: 10% del salario anual
-        limite_salario = salario_base_anual * 0.10
-
-        # Límite 2: 5 UMA * 365 días
-        limite_uma = UMA * 365 * 5
-
-        # Límite 3: tus aportes del año
-        limite_aporte = a_anual
-
-        deducible = min(limite_aporte, limite_salario, limite_uma)
-        sat_anual = deducible * tasa_marginal_isr
-        sat_por_anio.append(sat_anual)
-
-    # 3.4) Serie mensual de inyecciones SAT (mes 13, 25, 37, ...)
-    sat_inyectado = [0.0] * meses
-    for year, sat in enumerate(sat_por_anio):
-        mes_inyeccion = year * 12 + 13  # 13, 25, 37, ...
-        if 1 <= mes_inyeccion <= meses:
-            sat_inyectado[mes_inyeccion - 1] = sat
-
-    # ================================================================
-    # 4) SALDO COMPROMETIDO SIN SAT y CON SAT DENTRO DEL PPR
-    # ================================================================
-    # Lista de ceros para la simulación "sin SAT"
-    sat_ceros = [0.0] * meses
-
-    # 4.1) Allianz "real" SIN SAT (solo tus aportes normales)
-    df_comp_sin_sat = simular_saldo_comprometido_excel(
-        aportes_lista=aportes,
-        sat_inyectado_lista=sat_ceros,
-        inflacion=inflacion_anual,
-        udi_inicial=udi_inicial,
-        tasa_anual=rendimiento_anual,
-        meses=meses,
-        offset=18
-    )
-
-    # 4.2) Allianz CON SAT dentro del mismo PPR
-    df_comp_con_sat = simular_saldo_comprometido_excel(
-        aportes_lista=aportes,
-        sat_inyectado_lista=sat_inyectado,
-        inflacion=inflacion_anual,
-        udi_inicial=udi_inicial,
-        tasa_anual=rendimiento_anual,
-        meses=meses,
-        offset=18
-    )
+# ================================================================
+# RUN SIMULACIONES REALES
+# ================================================================
+meses = plazo_comprometido * 12
 
-    # 5) BONO DE FIDELIDAD REAL
-    df_bono = simular_bono_excel(
-        aporte_mensual=aportacion if usar_bono else 0,
-        plazo_anios=plazo_comprometido,
-        tasa_anual_bono=0.09
-    )
+# ================================================================
+# GENERACIÓN REAL DE APORTES — CON O SIN ESTRATEGIA
+# ================================================================
 
-    # 6) TABLA TOTAL (sin SAT y con SAT)
-    df_total = pd.DataFrame({
-        "Mes": np.arange(1, meses + 1),
-        "Inicial": df_inicial["Saldo Final"].tolist(),
-        "Comprometido_sin_SAT": df_comp_sin_sat["Saldo Final"].tolist(),
-        "Comprometido_con_SAT": df_comp_con_sat["Saldo Final"].tolist(),
-        "Bono": df_bono["Saldo Final"].tolist(),
-        "SAT_inyectado": sat_inyectado,
-    })
-
-    # SAT acumulado aportado (solo la suma de depósitos)
-    df_total["SAT_Acumulado"] = np.cumsum(df_total["SAT_inyectado"])
-
-    # 7) TOTALES ALLIANZ
-    df_total["Total Allianz sin SAT"] = (
-            df_total["Inicial"] + df_total["Comprometido_sin_SAT"] + df_total["Bono"]
-    )
+# Grafo de etapas (pipeline_allianz.py / dag.py): solo se recalcula lo que
+# está río abajo de un dato que cambió. Un grafo por sesión.
+if "pipeline_acumulacion" not in st.session_state:
+    st.session_state["pipeline_acumulacion"] = grafo_acumulacion()
+pipeline_acumulacion = st.session_state["pipeline_acumulacion"]
+
+# La vista de tablas solo muestra el resumen por año: las tablas salen
+# por año de los simuladores (detalle="anual") y los meses se arman solo
+# si se pide el detalle.
+entradas = {
+    "aportacion": aportacion,
+    "meses": meses,
+    "plazo": plazo_comprometido,
+    "inflacion_anual": inflacion_anual,
+    "rendimiento_anual": rendimiento_anual,
+    "incrementar": incremento_inflacion == "Sí",
+    "modo_estrategia": modo_estrategia,
+    "aporte_temporal": aporte_temporal,
+    "offset_manual": offset_manual,
+    "meses_aportando": años_aportando * 12,
+    "udi_inicial": udi_inicial,
+    "salario_anual": salario_anual,
+    "uma_inicial": uma_inicial,
+    "tasa_marginal_isr": tasa_marginal_isr,
+    "aporte_bono": aportacion if usar_bono else 0,
+}
+etapas = pipeline_acumulacion.ejecutar({
+    **entradas,
+    "detalle": "anual" if vista == VISTAS[2] else True,
+})
+
+# 1) APORTES (con estrategia de 18 meses o early stop)
+aportes = etapas["aportes"]
+print("#"*100)
+print("aportes ")
+print(aportes[0:30])
+print("#"*100)
+
+# 2) SALDO INICIAL (todo el plazo, aportando solo 18 meses)
+df_inicial = etapas["saldo_inicial"]
+
+# 3) SAT: DEVOLUCIÓN ANUAL (REGLAS REALES) Y SERIE MENSUAL (mes 13, 25, 37, ...)
+sat_por_anio, sat_inyectado = etapas["sat"]
+
+# 4) SALDO COMPROMETIDO SIN SAT y CON SAT DENTRO DEL PPR
+df_comp_sin_sat, df_comp_con_sat = etapas["comprometido"]
+
+# 5) BONO DE FIDELIDAD REAL
+df_bono = etapas["bono"]
+
+# 6) TABLA TOTAL (sin SAT y con SAT) + TOTALES ALLIANZ
+df_total = etapas["total"]
+
+saldo_allianz_sin_sat = df_total["Total Allianz sin SAT"].iloc[-1]
+saldo_allianz_con_sat = df_total["Allianz + SAT"].iloc[-1]
+
+sat_total_aportado = df_total["SAT_Acumulado"].iloc[-1]
+sat_valor_actual = saldo_allianz_con_sat - saldo_allianz_sin_sat
+
+# ----------------------- BENCHMARK (ETF y Colchón) -----------------------
+# ETF ideal sin comisiones: serie geométrica (analitico.py)
+saldo_benchmark = etapas["benchmark"]
+
+colchon = np.cumsum(aportes)
 
-    df_total["Allianz + SAT"] = (
-            df_total["Inicial"] + df_total["Comprometido_con_SAT"] + df_total["Bono"]
-    )
+# ================================================================
+# COMPARATIVA FINAL
+# ================================================================
+total_aportado = sum(aportes)
+etf_bruto = saldo_benchmark[-1]
 
-    saldo_allianz_sin_sat = df_total["Total Allianz sin SAT"].iloc[-1]
-    saldo_allianz_con_sat = df_total["Allianz + SAT"].iloc[-1]
+etf_neto = etf_neto_despues_de_isr(etf_bruto, total_aportado)  # ISR 10% sobre la ganancia
+saldo_etf_neto = etf_neto
 
-    sat_total_aportado = df_total["SAT_Acumulado"].iloc[-1]
-    sat_valor_actual = saldo_allianz_con_sat - saldo_allianz_sin_sat
+rend_allianz = saldo_allianz_con_sat
 
-    # ----------------------- BENCHMARK (ETF y Colchón) -----------------------
-    r_m = (1 + rendimiento_anual) ** (1 / 12) - 1
+if rend_allianz >= etf_neto:
+    faltante = 0
+    excedente = rend_allianz - etf_neto
+else:
+    excedente = 0
+    faltante = etf_neto - rend_allianz
 
-    saldo_benchmark = []
-    s = 0
-    for a in aportes:
-        s += a
-        s *= (1 + r_m)
-        saldo_benchmark.append(s)
+diferencia_final = rend_allianz - etf_neto
 
-    colchon = np.cumsum(aportes)
 
-    # ================================================================
-    # COMPARATIVA FINAL
-    # ================================================================
-    total_aportado = sum(aportes)
-    etf_bruto = saldo_benchmark[-1]
+# ================================================================
+#          🎲 ESCENARIOS ESTOCÁSTICOS (Monte Carlo) — FRAGMENTO
+# ================================================================
+@st.fragment
+def mostrar_montecarlo(flujo_ppr, meses_retiro, tasa_cetes_anual, ret_nom_ppr, ret_ind_ppr,
+                       factor_descuento):
+    saldo_deterministico = df_total["Allianz + SAT"]
+
+    with st.expander("🎲 ¿Y si los rendimientos y la inflación varían? (Monte Carlo)"):
+        col_vol, col_tray = st.columns(2)
+        with col_vol:
+            volatilidad_anual = st.number_input(
+                "Volatilidad anual del PPR (%)", 0.0, 50.0, 15.0, key="retiro_volatilidad"
+            ) / 100
+            volatilidad_inflacion = st.number_input(
+                "Volatilidad de la inflación (%)", 0.0, 10.0, 1.0, key="retiro_volatilidad_inflacion"
+            ) / 100
+        with col_tray:
+            n_trayectorias = st.select_slider(
+                "Trayectorias", options=[1_000, 2_000, 5_000, 10_000, 50_000, 100_000],
+                value=10_000, key="retiro_trayectorias"
+            )
+            tamano_bloque = st.select_slider(
+                "Trayectorias por bloque (memoria)", options=[1_000, 2_000, 5_000, 10_000],
+                value=2_000, key="retiro_bloque"
+            )
+            volatilidad_cetes = st.number_input(
+                "Volatilidad anual de CETES (%)", 0.0, 20.0, 0.0, key="retiro_volatilidad_cetes"
+            ) / 100
+
+        col_muestreo, col_tol = st.columns(2)
+        with col_muestreo:
+            muestreo = st.radio(
+                "Muestreo", ["halton", "pseudo"], horizontal=True,
+                format_func=lambda m: {"halton": "Cuasi Monte Carlo (Halton)",
+                                       "pseudo": "Pseudoaleatorio"}[m],
+                key="retiro_muestreo"
+            )
+            antiteticas = st.checkbox("Variables antitéticas", value=True, key="retiro_antiteticas")
+        with col_tol:
+            tolerancia_ruina = st.number_input(
+                "Detener cuando el IC 95% de la ruina PPR sea menor a (pp, 0 = no detener)",
+                0.0, 10.0, 0.5, key="retiro_tolerancia"
+            ) / 100
+
+        # Con tolerancia hacen falta al menos MIN_BLOQUES_IC bloques
+        if tolerancia_ruina:
+            tamano_bloque = min(tamano_bloque, max(1, n_trayectorias // MIN_BLOQUES_IC))
+
+        # Flujo que entra al PPR: aportes + depósitos del SAT.
+        parametros_mc = dict(
+            aportes=flujo_ppr,
+            meses_retiro=meses_retiro,
+            rendimiento_anual=rendimiento_anual,
+            inflacion_anual=inflacion_anual,
+            udi_inicial=udi_inicial,
+            tasa_cetes_anual=tasa_cetes_anual,
+            volatilidad_anual=volatilidad_anual,
+            volatilidad_inflacion=volatilidad_inflacion,
+            volatilidad_cetes=volatilidad_cetes,
+            retiro_mensual=ret_nom_ppr,
+            retiro_indexado=ret_ind_ppr,
+            n_trayectorias=n_trayectorias,
+            semilla=0,
+            tamano_bloque=tamano_bloque,
+            muestreo=muestreo,
+            antiteticas=antiteticas,
+            tolerancia=tolerancia_ruina or None
+        )
 
-    ganancia = etf_bruto - total_aportado
-    impuesto = ganancia * 0.10  # ISR 10%
-    etf_neto = etf_bruto - impuesto
-    saldo_etf_neto = etf_neto
+        # En la cola de trabajos (cola_trabajos.py) corre en otro proceso y
+        # sobrevive a recargas de la página: al volver, el mismo envío
+        # recoge el trabajo en curso o su resultado.
+        en_cola = st.toggle(
+            "📬 Correr en la cola de trabajos (sigue aunque recargues la página)",
+            key="retiro_en_cola"
+        )
+        # Una simulación cancelada no se vuelve a lanzar en el siguiente
+        # rerun: solo cuando cambian sus parámetros
+        clave_mc = clave_trabajo("montecarlo", **parametros_mc)
+        if st.session_state.get("montecarlo_cancelado") == clave_mc:
+            st.info("Simulación cancelada. Cambia cualquier control para volver a correrla.")
+            return
+
+        if en_cola:
+            cola = ColaTrabajos()
+            id_mc = cola.enviar("montecarlo", **parametros_mc)
+            if st.button("⏹️ Cancelar simulación", key="cancelar_montecarlo"):
+                cola.cancelar(id_mc)
+            asegurar_trabajador(cola)
+            try:
+                mc = esperar_en_cola(cola, id_mc, f"Simulando trayectorias (trabajo {id_mc})…")
+            except TrabajoCancelado:
+                st.session_state["montecarlo_cancelado"] = clave_mc
+                st.info("Simulación cancelada. Cambia cualquier control para volver a correrla.")
+                return
+            except TrabajoFallido as e:
+                st.error(f"La simulación falló después de varios intentos:\n\n{e}")
+                return
+        else:
+            # Corre en segundo plano con progreso; se puede cancelar.
+            despachador = despachador_de_sesion()
+            if st.button("⏹️ Cancelar simulación", key="cancelar_montecarlo"):
+                despachador.cancelar("montecarlo")
+                st.session_state["montecarlo_cancelado"] = clave_mc
+                st.info("Simulación cancelada. Cambia cualquier control para volver a correrla.")
+                return
+
+            trabajo_mc = despachador.enviar("montecarlo", etapa_montecarlo, **parametros_mc)
+            try:
+                mc = esperar_en_streamlit(trabajo_mc, "Simulando trayectorias…")
+            except TrabajoCancelado:
+                st.info("Simulación cancelada.")
+                return
+
+        st.caption(
+            f"Probabilidad de quedarse sin dinero con el retiro nominal de "
+            f"${ret_nom_ppr:,.2f}: PPR {mc['prob_ruina_ppr']:.1%} · "
+            f"CETES {mc['prob_ruina_cetes']:.1%}"
+        )
+        st.caption(
+            f"Con el retiro indexado de ${ret_ind_ppr:,.2f}: "
+            f"PPR {mc['prob_ruina_ppr_indexada']:.1%} · "
+            f"CETES {mc['prob_ruina_cetes_indexada']:.1%}"
+        )
+        ic_texto = "" if mc["ic_95"] is None else f" · IC 95% ruina PPR ±{mc['ic_95']:.2%}"
+        st.caption(f"Trayectorias simuladas: {mc['trayectorias']:,}{ic_texto}")
+
+        df_mc = pd.DataFrame({
+            "Percentil": [f"P{p}" for p in mc["percentiles"]],
+            "Saldo al retiro (VP)": [x / factor_descuento for x in mc["saldo_retiro"]],
+            "Pensión sostenible PPR (VP)": [x / factor_descuento for x in mc["pension_ppr"]],
+            "Pensión sostenible CETES (VP)": [x / factor_descuento for x in mc["pension_cetes"]],
+            "Pensión indexada PPR (VP)": [x / factor_descuento for x in mc["pension_ppr_indexada"]],
+            "Pensión indexada CETES (VP)": [x / factor_descuento for x in mc["pension_cetes_indexada"]],
+        })
+        st.dataframe(df_mc.style.format({c: "${:,.2f}" for c in df_mc.columns[1:]}),
+                     use_container_width=True)
+
+        # Bandas P5–P95 del saldo durante la acumulación
+        p_bajo, p_medio, p_alto = mc["bandas_acumulacion"]
+        meses_mc = list(range(1, len(p_medio) + 1))
+
+        graf_mc = Grafica()
+        graf_mc.banda(
+            meses_mc, p_bajo, p_alto,
+            name=f"P{mc['percentiles'][0]}–P{mc['percentiles'][2]}",
+            nombres=(f"P{mc['percentiles'][0]}", f"P{mc['percentiles'][2]}"),
+            fillcolor="rgba(128,0,128,0.2)"
+        )
+        graf_mc.linea(meses_mc, p_medio, f"P{mc['percentiles'][1]} (mediana)",
+                      line=dict(color="purple"))
+        graf_mc.linea(meses_mc, saldo_deterministico, "Allianz + SAT (determinístico)",
+                      line=dict(color="black", dash="dot"))
+        fig_mc = graf_mc.figura(
+            title="Bandas del saldo en la acumulación (VF)",
+            xaxis_title="Mes",
+            yaxis_title="Saldo (VF)",
+            height=380
+        )
+        mostrar_grafica(graf_mc, fig_mc, "bandas_montecarlo.csv")
 
-    rend_allianz = saldo_allianz_con_sat
 
-    if rend_allianz >= etf_neto:
-        faltante = 0
-        excedente = rend_allianz - etf_neto
-    else:
-        excedente = 0
-        faltante = etf_neto - rend_allianz
+# ================================================================
+#                        TAB 1 — ACUMULACIÓN
+# ================================================================
+if vista == VISTAS[0]:
+    st.header("📈 Acumulación")
 
-    diferencia_final = rend_allianz - etf_neto
+    col1, col2 = st.columns(2)
+    col1.metric("% Bono", f"{porcentaje_bono * 100:.0f}%")
+    col2.metric("Bono Mensual", f"${bono:,.0f}")
 
     st.markdown("---")
     st.header("💰 Comparación de aportaciones y rendimientos")
@@ -408,35 +508,11 @@ with tab1:
     # ================================================================
     # GRÁFICA 1 — EVOLUCIÓN EN EL TIEMPO
     # ================================================================
-    fig = go.Figure()
-
-    fig.add_trace(go.Scatter(
-        x=df_total["Mes"], y=colchon,
-        name="Colchón", line=dict(color="gray", dash="dash")
-    ))
-
-    fig.add_trace(go.Scatter(
-        x=df_total["Mes"], y=saldo_benchmark,
-        name="ETF ideal", line=dict(color="green")
-    ))
-
-    fig.add_trace(go.Scatter(
-        x=df_total["Mes"], y=df_total["Total Allianz sin SAT"],
-        name="Allianz Real (sin SAT)", line=dict(color="red", width=3)
-    ))
-
-    fig.add_trace(go.Scatter(
-        x=df_total["Mes"], y=df_total["Allianz + SAT"],
-        name="Allianz + SAT reinvertido",
-        line=dict(color="orange", width=3, dash="dot")
-    ))
-
-    fig.update_layout(
-        title="Comparación: Colchón vs ETF ideal vs Allianz Real (+SAT)",
-        xaxis_title="Mes",
-        yaxis_title="Saldo",
-        height=480
+    graf_acum = grafica_acumulacion(
+        df_total["Mes"], colchon, saldo_benchmark,
+        df_total["Total Allianz sin SAT"], df_total["Allianz + SAT"]
     )
+    fig = graf_acum.figura(**LAYOUT_ACUMULACION)
 
     # ================================================================
     # GRÁFICA 2 — BARRA APILADA ETF vs Allianz + SAT
@@ -447,66 +523,72 @@ with tab1:
     rendimiento_allianz_sat = saldo_allianz_con_sat
     dif_etf_allianz = rendimiento_etf - rendimiento_allianz_sat
 
-    #if rendimiento_allianz_sat >= rendimiento_etf:
-    fig3 = go.Figure()
-
-    fig3.add_trace(go.Bar(
-        name='Allianz sin SAT',
-        x=['Comparación Final'],
-        y=[saldo_allianz_sin_sat],
-        marker_color='blue'
-    ))
-
-    fig3.add_trace(go.Bar(
-        name='SAT reinvertido',
-        x=['Comparación Final'],
-        y=[sat_valor_actual],
-        marker_color='gray'
-    ))
-
-    if faltante > 0:
-        fig3.add_trace(go.Bar(
-            name='Faltante vs ETF Neto',
-            x=['Comparación Final'],
-            y=[faltante],
-            marker_color='red'
-        ))
-    else:
-        fig3.add_trace(go.Bar(
-            name='Excedente sobre ETF Neto',
-            x=['Comparación Final'],
-            y=[excedente],
-            marker_color='green'
-        ))
-
-    fig3.update_layout(
-        barmode='stack',
-        title='Allianz vs SAT vs Faltante/Excedente frente a ETF Neto',
-        yaxis_title='Pesos'
+    # Misma figura mientras no cambien los saldos finales (graficas.py)
+    fig3 = figura_cacheada(
+        figura_comparacion,
+        sin_sat=saldo_allianz_sin_sat,
+        sat_reinvertido=sat_valor_actual,
+        faltante=faltante,
+        excedente=excedente
     )
 
     # --------- MOSTRAR LAS DOS GRÁFICAS LADO A LADO ----------
     col_g1, col_g2 = st.columns(2)
-    col_g1.plotly_chart(fig, use_container_width=True)
+    mostrar_grafica(graf_acum, fig, "acumulacion.csv", contenedor=col_g1)
     col_g2.plotly_chart(fig3, use_container_width=True)
 
+    # ================================================================
+    # ¿Y SI DEJO DE APORTAR ANTES? — kernel lineal (un solo producto)
+    # ================================================================
+    with st.expander("⏹️ ¿Qué pasa si dejo de aportar antes? (estimación rápida, sin SAT)"):
+        años_paro = np.arange(1, plazo_comprometido + 1)
+        calendarios = np.where(
+            np.arange(meses)[:, None] < años_paro[None, :] * 12,
+            np.asarray(aportes, dtype=float)[:, None],
+            0.0
+        )
+        saldos_paro = saldo_comprometido_lineal(
+            calendarios,
+            inflacion=inflacion_anual,
+            udi_inicial=udi_inicial,
+            tasa_anual=rendimiento_anual,
+            meses=meses,
+            offset=18
+        )
+        # Con el plazo completo el calendario es el mismo de las tablas reales
+        diferencia = saldos_paro[-1] - df_total["Comprometido_sin_SAT"].iloc[-1]
+        st.caption(
+            f"Sin el redondeo del Excel: con el plazo completo difiere ${abs(diferencia):,.0f} "
+            f"({abs(diferencia) / df_total['Comprometido_sin_SAT'].iloc[-1]:.4%}) de las tablas "
+            "reales. La diferencia crece con el plazo (miles de pesos a 60 años) pero se "
+            "mantiene por debajo de 0.01% del saldo."
+        )
+        st.dataframe(pd.DataFrame({
+            "Años aportando": años_paro,
+            "Saldo comprometido final (aprox.)": saldos_paro,
+        }), use_container_width=True)
+
+    with st.expander("⏱️ Tiempos por etapa"):
+        st.caption("Última corrida del grafo de acumulación; las etapas no recalculadas reutilizan su valor anterior.")
+        st.dataframe(pd.DataFrame(pipeline_acumulacion.reporte()), use_container_width=True)
+
 
 # ================================================================
 #                        TAB 2 — RETIRO
 # ================================================================
-with tab2:
+elif vista == VISTAS[1]:
     st.header("🧓 Simulación completa del retiro")
 
     # ------------ Inputs del escenario de retiro ------------
     años_retiro = st.number_input(
         "Años estimados de retiro",
-        min_value=5, max_value=50, value=20
+        min_value=5, max_value=50, value=20, key="retiro_años"
     )
     meses_retiro = años_retiro * 12
 
     tasa_cetes_anual = st.number_input(
         "Tasa anual alternativa (CETES / renta fija fuera del PPR) (%)",
-        min_value=0.0, max_value=20.0, value=7.5
+        min_value=0.0, max_value=20.0, value=7.5, key="retiro_tasa_cetes"
     ) / 100
 
     st.markdown(
@@ -532,33 +614,36 @@ with tab2:
     def vp(vf):
         return vf / factor_descuento
 
+    # Los cuatro retiros óptimos con el solver de Brent:
+    # nominal PPR, nominal CETES, indexado PPR, indexado CETES
+    # (en segundo plano; si cambian los datos, la búsqueda vieja se cancela)
+    trabajo_retiro = despachador_de_sesion().enviar(
+        "retiros_optimos", etapa_retiros_optimos,
+        capital_base=capital_base,
+        meses_retiro=meses_retiro,
+        rendimiento_anual=rendimiento_anual,
+        tasa_cetes_anual=tasa_cetes_anual,
+        inflacion_anual=inflacion_anual,
+        udi_inicial=udi_inicial
+    )
+    retiros_optimos, iteraciones_retiro = esperar_en_streamlit(
+        trabajo_retiro, "Buscando retiros óptimos…"
+    )
+    ret_nom_ppr, ret_nom_cet, ret_ind_ppr, ret_ind_cet = retiros_optimos
 
     with col_nom:
         st.subheader("📉 Simulación NOMINAL — Retiro fijo")
 
-        # buscar retiro óptimo (NOMINAL)
-        ret_nom_ppr, saldos_nom_ppr_vf, mes_nom_ppr = buscar_retiro_optimo(
-            capital_inicial=capital_base,
-            meses=meses_retiro,
-            simulador=lambda cap, m, r: simular_retiro_ppr(
-                capital_inicial=cap,
-                tasa_anual=rendimiento_anual,
-                inflacion_anual=inflacion_anual,
-                udi_inicial=udi_inicial,
-                meses=m,
-                retiro_mensual=r,
-            )
-        )
-
-        ret_nom_cet, saldos_nom_cet_vf, mes_nom_cet = buscar_retiro_optimo(
-            capital_inicial=capital_base,
-            meses=meses_retiro,
-            simulador=lambda cap, m, r: simular_retiro_simple(
-                capital_inicial=cap,
-                tasa_anual=tasa_cetes_anual,
-                meses=m,
-                retiro_mensual=r,
-            )
+        # curvas completas con el retiro óptimo (NOMINAL)
+        saldos_nom_ppr_vf, mes_nom_ppr, saldos_nom_cet_vf, mes_nom_cet = etapa_curvas_nominales(
+            capital_base=capital_base,
+            meses_retiro=meses_retiro,
+            rendimiento_anual=rendimiento_anual,
+            tasa_cetes_anual=tasa_cetes_anual,
+            inflacion_anual=inflacion_anual,
+            udi_inicial=udi_inicial,
+            ret_ppr=ret_nom_ppr,
+            ret_cet=ret_nom_cet
         )
 
         # Convertir ambas curvas a VP
@@ -574,26 +659,18 @@ with tab2:
         st.metric("Años de duración", f"{mes_nom_cet/12:.2f}")
 
         # Gráfica NOMINAL en VP
-        fig_nom = go.Figure()
-        fig_nom.add_trace(go.Scatter(
-            x=list(range(1, meses_retiro+1)),
-            y=saldos_nom_ppr_vp,
-            name="PPR nominal (VP)",
-            line=dict(color="purple")
-        ))
-        fig_nom.add_trace(go.Scatter(
-            x=list(range(1, meses_retiro+1)),
-            y=saldos_nom_cet_vp,
-            name="CETES nominal (VP)",
-            line=dict(color="teal")
-        ))
-        fig_nom.update_layout(
+        graf_nom = Grafica()
+        graf_nom.linea(range(1, meses_retiro+1), saldos_nom_ppr_vp, "PPR nominal (VP)",
+                        line=dict(color="purple"))
+        graf_nom.linea(range(1, meses_retiro+1), saldos_nom_cet_vp, "CETES nominal (VP)",
+                        line=dict(color="teal"))
+        fig_nom = graf_nom.figura(
             title="Evolución NOMINAL del saldo (VP)",
             xaxis_title="Mes",
             yaxis_title="Saldo (VP)",
             height=380
         )
-        st.plotly_chart(fig_nom, use_container_width=True)
+        mostrar_grafica(graf_nom, fig_nom, "retiro_nominal.csv")
 
         # Tabla NOMINAL VP
         df_nom = tabla_retiro_completa(
@@ -615,22 +692,17 @@ with tab2:
     with col_ind:
         st.subheader("📈 Simulación INDEXADA — Retiro que sube con inflación")
 
-        # buscar retiro óptimo (INDEXADO)
-        ret_ind_ppr, saldos_ind_ppr_vf, mensualidades_ppr, tot_ppr = buscar_retiro_optimo_indexado(
-            capital_inicial=capital_base,
-            meses=meses_retiro,
+        # curvas completas con el retiro óptimo (INDEXADO)
+        (saldos_ind_ppr_vf, mensualidades_ppr,
+         saldos_ind_cet_vf, mensualidades_cet) = etapa_curvas_indexadas(
+            capital_base=capital_base,
+            meses_retiro=meses_retiro,
+            rendimiento_anual=rendimiento_anual,
+            tasa_cetes_anual=tasa_cetes_anual,
             inflacion_anual=inflacion_anual,
-            tasa_anual=rendimiento_anual,
             udi_inicial=udi_inicial,
-        )
-
-        ret_ind_cet, saldos_ind_cet_vf, mensualidades_cet, tot_cet = buscar_retiro_optimo_indexado(
-            capital_inicial=capital_base,
-            meses=meses_retiro,
-            inflacion_anual=inflacion_anual,
-            tasa_anual=tasa_cetes_anual,
-            udi_inicial=udi_inicial,  # no se usa en CETES, pero no pasa nada
-            cetes=True
+            ret_ppr=ret_ind_ppr,
+            ret_cet=ret_ind_cet
         )
 
         saldos_ind_ppr_vp = serie_vp(saldos_ind_ppr_vf, inflacion_anual, plazo_comprometido)
@@ -645,26 +717,18 @@ with tab2:
         st.metric("Años de duración", "20.00")
 
         # Gráfica INDEXADA VP
-        fig_ind = go.Figure()
-        fig_ind.add_trace(go.Scatter(
-            x=list(range(1, meses_retiro+1)),
-            y=saldos_ind_ppr_vp,
-            name="PPR indexado (VP)",
-            line=dict(color="purple")
-        ))
-        fig_ind.add_trace(go.Scatter(
-            x=list(range(1, meses_retiro+1)),
-            y=saldos_ind_cet_vp,
-            name="CETES indexado (VP)",
-            line=dict(color="teal")
-        ))
-        fig_ind.update_layout(
+        graf_ind = Grafica()
+        graf_ind.linea(range(1, meses_retiro+1), saldos_ind_ppr_vp, "PPR indexado (VP)",
+                        line=dict(color="purple"))
+        graf_ind.linea(range(1, meses_retiro+1), saldos_ind_cet_vp, "CETES indexado (VP)",
+                        line=dict(color="teal"))
+        fig_ind = graf_ind.figura(
             title="Evolución INDEXADA del saldo (VP)",
             xaxis_title="Mes",
             yaxis_title="Saldo (VP)",
             height=380
         )
-        st.plotly_chart(fig_ind, use_container_width=True)
+        mostrar_grafica(graf_ind, fig_ind, "retiro_indexado.csv")
 
         df_ind = tabla_retiro_completa(
             saldos_ppr_vf=saldos_ind_ppr_vf,
@@ -678,24 +742,53 @@ with tab2:
         st.subheader("📄 Tabla INDEXADA (VP)")
         st.dataframe(df_ind, use_container_width=True)
 
+    st.caption(
+        "Simulaciones por búsqueda de retiro óptimo (Brent): "
+        "nominal PPR {}, nominal CETES {}, indexado PPR {}, indexado CETES {}".format(*iteraciones_retiro)
+    )
+
+    # Monte Carlo en un fragmento: sus controles solo vuelven a correr esta sección
+    mostrar_montecarlo(
+        flujo_ppr=np.add(aportes, sat_inyectado),
+        meses_retiro=meses_retiro,
+        tasa_cetes_anual=tasa_cetes_anual,
+        ret_nom_ppr=ret_nom_ppr,
+        ret_ind_ppr=ret_ind_ppr,
+        factor_descuento=factor_descuento
+    )
+
 # ================================================================
 #                     TAB 3 — TABLAS COMPLETAS
 # ================================================================
 
-with tab3:
+else:
     st.header("📑 Tablas reales tal cual Excel")
-
-    st.subheader("📄 Saldo Inicial (0–18 meses, pero simulado todo el plazo)")
-    st.dataframe(df_inicial, use_container_width=True)
-
-    st.subheader("📄 Saldo Comprometido (19 → final) — SIN SAT")
-    st.dataframe(df_comp_sin_sat, use_container_width=True)
-
-    st.subheader("📄 Saldo Comprometido (19 → final) — CON SAT dentro del PPR")
-    st.dataframe(df_comp_con_sat, use_container_width=True)
-
-    st.subheader("📄 Bono de Fidelidad")
-    st.dataframe(df_bono, use_container_width=True)
-
-    st.subheader("📄 Total Allianz + SAT (vista resumen)")
-    st.dataframe(df_total, use_container_width=True)
\ No newline at end of file
+    st.caption("Resumen por año: suma de aportes, intereses y cargos, y saldo al cierre. "
+               "El detalle mes a mes se muestra al activarlo, por páginas.")
+
+    # Las tablas de arriba ya vienen por año (detalle="anual"); el detalle
+    # mes a mes corre en un grafo aparte y solo si se activa.
+    if "pipeline_detalle_mensual" not in st.session_state:
+        st.session_state["pipeline_detalle_mensual"] = grafo_acumulacion()
+
+    def tabla_mensual(etapa, indice=None):
+        def armar():
+            valor = st.session_state["pipeline_detalle_mensual"].ejecutar(
+                {**entradas, "detalle": True}
+            )[etapa]
+            return valor if indice is None else valor[indice]
+        return armar
+
+    for clave, titulo, df_anual, mensual in [
+        ("inicial", "📄 Saldo Inicial (0–18 meses, pero simulado todo el plazo)", df_inicial,
+         tabla_mensual("saldo_inicial")),
+        ("comprometido_sin_sat", "📄 Saldo Comprometido (19 → final) — SIN SAT", df_comp_sin_sat,
+         tabla_mensual("comprometido", 0)),
+        ("comprometido_con_sat", "📄 Saldo Comprometido (19 → final) — CON SAT dentro del PPR",
+         df_comp_con_sat, tabla_mensual("comprometido", 1)),
+        ("bono", "📄 Bono de Fidelidad", df_bono, tabla_mensual("bono")),
+        ("total", "📄 Total Allianz + SAT (vista resumen)", df_total, tabla_mensual("total")),
+    ]:
+        st.subheader(titulo)
+        st.dataframe(df_anual, use_container_width=True, hide_index=True)
+        mostrar_detalle_mensual(mensual, clave=f"tabla_{clave}")
@@ -1,6 +1,9 @@
 import pandas as pd
 import math
 
+from analitico import anualidad_nominal, retiro_simple_analitico
+from solver_retiro import resolver_retiro
+
 # ================================================================
 #                    🔵 Funciones de Valor Presente
 # ================================================================
@@ -38,6 +41,8 @@ def simular_retiro_ppr(
     udi_inicial,
     meses,
     retiro_mensual,
+    detalle=True,
+    sin_piso=False,
 ):
     """
     Simula el retiro dejando el dinero dentro del PPR:
@@ -45,6 +50,11 @@ def simular_retiro_ppr(
     - Cobra 0.1% mensual + IVA sobre el saldo
     - Genera rendimiento mensual tasa_anual
     - Retiro fijo 'retiro_mensual'
+
+    Con detalle=False regresa (saldo_final, total_retirado, mes_agotado) sin
+    guardar la serie, igual que los simuladores indexados; total_retirado
+    cuenta todo el plazo.
+    Con sin_piso=True el saldo puede quedar negativo (lo usa el solver).
     """
     tasa_mensual = (1 + tasa_anual) ** (1/12) - 1
     saldo = capital_inicial
@@ -54,9 +64,10 @@ def simular_retiro_ppr(
     mes_agotado = None
 
     for mes in range(1, meses + 1):
-        if saldo <= 0 and mes_agotado is None:
+        if saldo <= 0 and mes_agotado is None and not sin_piso:
             mes_agotado = mes - 1
-            saldos.append(0.0)
+            if detalle:
+                saldos.append(0.0)
             continue
 
         # rendimiento del mes
@@ -72,10 +83,11 @@ def simular_retiro_ppr(
         cargo_gestion = base * 0.001 * 1.16
         saldo = base - cargo_gestion
 
-        if saldo < 0:
+        if saldo < 0 and not sin_piso:
             saldo = 0.0
 
-        saldos.append(saldo)
+        if detalle:
+            saldos.append(saldo)
 
         if mes % 12 == 0:
             udi_actual *= (1 + inflacion_anual)
@@ -86,6 +98,9 @@ def simular_retiro_ppr(
     if mes_agotado is None:
         mes_agotado = meses
 
+    if not detalle:
+        return (saldo if sin_piso else max(saldo, 0.0)), retiro_mensual * meses, mes_agotado
+
     return saldos, mes_agotado
 
 
@@ -94,13 +109,25 @@ def simular_retiro_simple(
     tasa_anual,
     meses,
     retiro_mensual,
+    detalle=True,
+    sin_piso=False,
 ):
     """
     Simula el retiro si sacas TODO y lo metes a CETES / renta fija:
     - Sin comisiones
     - Rendimiento tasa_anual
     - Retiro fijo 'retiro_mensual'
+
+    Con detalle=False regresa (saldo_final, total_retirado, mes_agotado) sin
+    guardar la serie (se calcula con la fórmula cerrada de analitico.py).
+    Con sin_piso=True el saldo puede quedar negativo (lo usa el solver).
     """
+    if not detalle and retiro_mensual >= 0:
+        saldo_final, mes_agotado, total_retirado = retiro_simple_analitico(
+            capital_inicial, tasa_anual, meses, retiro_mensual, sin_piso=sin_piso
+        )
+        return saldo_final, total_retirado, mes_agotado
+
     tasa_mensual = (1 + tasa_anual) ** (1/12) - 1
     saldo = capital_inicial
 
@@ -108,17 +135,19 @@ def simular_retiro_simple(
     mes_agotado = None
 
     for mes in range(1, meses + 1):
-        if saldo <= 0 and mes_agotado is None:
+        if saldo <= 0 and mes_agotado is None and not sin_piso:
             mes_agotado = mes - 1
-            saldos.append(0.0)
+            if detalle:
+                saldos.append(0.0)
             continue
 
         saldo = saldo * (1 + tasa_mensual) - retiro_mensual
 
-        if saldo < 0:
+        if saldo < 0 and not sin_piso:
             saldo = 0.0
 
-        saldos.append(saldo)
+        if detalle:
+            saldos.append(saldo)
 
         if saldo <= 0 and mes_agotado is None:
             mes_agotado = mes
@@ -126,38 +155,67 @@ def simular_retiro_simple(
     if mes_agotado is None:
         mes_agotado = meses
 
+    if not detalle:
+        return (saldo if sin_piso else max(saldo, 0.0)), retiro_mensual * meses, mes_agotado
+
     return saldos, mes_agotado
 
 
-def buscar_retiro_optimo(capital_inicial, meses, simulador):
+def buscar_retiro_optimo_nominal(
+    capital_inicial,
+    meses,
+    inflacion_anual,
+    tasa_anual,
+    udi_inicial,
+    cetes=False,
+    tol_pesos=0.01,
+    con_iteraciones=False
+):
     """
-    Binary search para encontrar el retiro mensual máximo
-    que deja el saldo ~0 al final de 'meses'.
-    simulador(capital_inicial, meses, retiro_mensual) -> (saldos, mes_agotado)
+    Retiro mensual fijo máximo que agota el capital en 'meses', usando
+    el solver de Brent de solver_retiro.py.
+
+    Si cetes=True usa simular_retiro_simple
+    Si cetes=False usa simular_retiro_ppr
+
+    Regresa (retiro, saldos, mes_agotado): saldos es la serie mes a mes
+    con ese retiro.
+    Con con_iteraciones=True agrega al final el número de simulaciones.
     """
-    low = 0.0
-    high = capital_inicial / meses * 2  # cota superior burda
-    mejor_retiro = 0.0
-    mejor_saldos = None
-    mejor_mes = None
-
-    for _ in range(40):
-        mid = (low + high) / 2
-        saldos, mes_agotado = simulador(capital_inicial, meses, mid)
-        saldo_final = saldos[-1]
-
-        mejor_retiro = mid
-        mejor_saldos = saldos
-        mejor_mes = mes_agotado
-
-        if saldo_final > 0:
-            # sobró dinero → podemos retirar más
-            low = mid
-        else:
-            # nos quedamos cortos / llegamos a 0 antes → hay que bajar el retiro
-            high = mid
+    if cetes:
+        simulador = lambda r, detalle=True, sin_piso=False: simular_retiro_simple(
+            capital_inicial=capital_inicial,
+            tasa_anual=tasa_anual,
+            meses=meses,
+            retiro_mensual=r,
+            detalle=detalle,
+            sin_piso=sin_piso
+        )
+    else:
+        simulador = lambda r, detalle=True, sin_piso=False: simular_retiro_ppr(
+            capital_inicial=capital_inicial,
+            tasa_anual=tasa_anual,
+            inflacion_anual=inflacion_anual,
+            udi_inicial=udi_inicial,
+            meses=meses,
+            retiro_mensual=r,
+            detalle=detalle,
+            sin_piso=sin_piso
+        )
 
-    return mejor_retiro, mejor_saldos, mejor_mes
+    tasa_mensual = (1 + tasa_anual) ** (1/12) - 1
+
+    retiro, iteraciones = resolver_retiro(
+        saldo_final=lambda r: simulador(r, detalle=False, sin_piso=True)[0],
+        semilla=anualidad_nominal(capital_inicial, tasa_mensual, meses),
+        cota_superior=capital_inicial / meses * 2,  # cota superior burda
+        tol_pesos=tol_pesos
+    )
+
+    saldos, mes_agotado = simulador(retiro)
+    if con_iteraciones:
+        return retiro, saldos, mes_agotado, iteraciones
+    return retiro, saldos, mes_agotado
 
 
 def simular_allianz_simple(
@@ -166,7 +224,8 @@ def simular_allianz_simple(
     rendimiento_anual: float,
     valor_udi_inicial: float,
     usar_bono: bool,
-    bono_monto: float
+    bono_monto: float,
+    detalle: bool = True
 ):
     """
     Versión simple MEJORADA de la simulación Allianz:
@@ -178,6 +237,8 @@ def simular_allianz_simple(
     ✔ Cargo de gestión: 0.1% mensual sobre el saldo
     ✔ Cargo administrativo: 0.9% cada 3 meses
     ✔ UDI aumenta con la inflación anual
+
+    Con detalle=False no arma el DataFrame: regresa (saldo, resumen).
     """
 
     meses = len(aportes)
@@ -208,17 +269,21 @@ def simular_allianz_simple(
             saldo -= saldo * 0.009  # 0.9%
 
         # Guardar registro
-        historial.append({
-            "Mes": m,
-            "Aporte": aporte,
-            "UDI": valor_udi,
-            "Saldo": saldo
-        })
+        if detalle:
+            historial.append({
+                "Mes": m,
+                "Aporte": aporte,
+                "UDI": valor_udi,
+                "Saldo": saldo
+            })
 
         # 6) UDI crece anual
         if (m + 1) % 12 == 0:
             valor_udi *= (1 + inflacion_anual)
 
+    if not detalle:
+        return saldo, {"Aportes totales": sum(aportes), "UDI final": valor_udi}
+
     df = pd.DataFrame(historial)
     return saldo, df
 
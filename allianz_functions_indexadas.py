@@ -1,5 +1,7 @@
 import pandas as pd
 from allianz_functions import serie_vp
+from analitico import anualidad_indexada, retiro_simple_analitico
+from solver_retiro import resolver_retiro
 
 
 def simular_retiro_ppr_indexado(
@@ -9,11 +11,17 @@ def simular_retiro_ppr_indexado(
     udi_inicial,
     meses,
     retiro_mensual_inicial,
+    detalle=True,
+    sin_piso=False,
 ):
     """
     Simula retiro REAL (indexado), PPR:
     - Retiro inicial crece 1 vez por año a inflación
     - Comisiones iguales al simulador nominal
+
+    Con detalle=False regresa (saldo_final, total_retirado, mes_agotado)
+    sin guardar las series.
+    Con sin_piso=True el saldo puede quedar negativo (lo usa el solver).
     """
     tasa_mensual = (1 + tasa_anual) ** (1/12) - 1
     saldo = capital_inicial
@@ -23,6 +31,7 @@ def simular_retiro_ppr_indexado(
 
     saldos = []
     mensualidades = []
+    total_retirado = 0.0
     mes_agotado = None
 
     for mes in range(1, meses + 1):
@@ -40,11 +49,14 @@ def simular_retiro_ppr_indexado(
         cargo_gestion = base * 0.001 * 1.16
         saldo = base - cargo_gestion
 
-        if saldo < 0:
+        if saldo < 0 and not sin_piso:
             saldo = 0.0
 
-        saldos.append(saldo)
-        mensualidades.append(retiro_actual)
+        if detalle:
+            saldos.append(saldo)
+            mensualidades.append(retiro_actual)
+        else:
+            total_retirado += retiro_actual
 
         # Actualizar cada año
         if mes % 12 == 0:
@@ -58,6 +70,9 @@ def simular_retiro_ppr_indexado(
     if mes_agotado is None:
         mes_agotado = meses
 
+    if not detalle:
+        return (saldo if sin_piso else max(saldo, 0.0)), total_retirado, mes_agotado
+
     return saldos, mensualidades, mes_agotado
 
 def simular_retiro_simple_indexado(
@@ -66,23 +81,43 @@ def simular_retiro_simple_indexado(
     inflacion_anual,
     meses,
     retiro_mensual_inicial,
+    detalle=True,
+    sin_piso=False,
 ):
+    """
+    Simula retiro indexado sacando todo a CETES / renta fija (sin comisiones).
+
+    Con detalle=False regresa (saldo_final, total_retirado, mes_agotado)
+    sin guardar las series (fórmula cerrada de analitico.py).
+    Con sin_piso=True el saldo puede quedar negativo (lo usa el solver).
+    """
+    if not detalle and retiro_mensual_inicial >= 0:
+        saldo_final, mes_agotado, total_retirado = retiro_simple_analitico(
+            capital_inicial, tasa_anual, meses, retiro_mensual_inicial,
+            inflacion_anual=inflacion_anual, indexado=True, sin_piso=sin_piso
+        )
+        return saldo_final, total_retirado, mes_agotado
+
     tasa_mensual = (1 + tasa_anual) ** (1/12) - 1
     saldo = capital_inicial
     retiro_actual = retiro_mensual_inicial
 
     saldos = []
     mensualidades = []
+    total_retirado = 0.0
     mes_agotado = None
 
     for mes in range(1, meses + 1):
 
         saldo = saldo * (1 + tasa_mensual) - retiro_actual
-        if saldo < 0:
+        if saldo < 0 and not sin_piso:
             saldo = 0.0
 
-        saldos.append(saldo)
-        mensualidades.append(retiro_actual)
+        if detalle:
+            saldos.append(saldo)
+            mensualidades.append(retiro_actual)
+        else:
+            total_retirado += retiro_actual
 
         if mes % 12 == 0:
             retiro_actual *= (1 + inflacion_anual)
@@ -93,6 +128,9 @@ def simular_retiro_simple_indexado(
     if mes_agotado is None:
         mes_agotado = meses
 
+    if not detalle:
+        return (saldo if sin_piso else max(saldo, 0.0)), total_retirado, mes_agotado
+
     return saldos, mensualidades, mes_agotado
 
 def buscar_retiro_optimo_indexado(
@@ -101,7 +139,9 @@ def buscar_retiro_optimo_indexado(
     inflacion_anual,
     tasa_anual,
     udi_inicial,
-    cetes=False
+    cetes=False,
+    tol_pesos=0.01,
+    con_iteraciones=False
 ):
     """
     Encuentra el retiro mensual inicial máximo (indexado)
@@ -109,56 +149,51 @@ def buscar_retiro_optimo_indexado(
 
     Si cetes=True usa simular_retiro_simple_indexado
     Si cetes=False usa simular_retiro_ppr_indexado
+
+    Usa el solver de Brent (solver_retiro.py) sembrado con la anualidad
+    indexada y se detiene cuando el retiro está a 'tol_pesos' pesos.
+
+    Regresa (retiro, saldos, mensualidades, mes_agotado). Con
+    con_iteraciones=True agrega al final el número de simulaciones.
     """
 
     # Elegir simulador correcto
     if cetes:
-        simulador = lambda cap, months, r: simular_retiro_simple_indexado(
-            capital_inicial=cap,
+        simulador = lambda r, detalle=True, sin_piso=False: simular_retiro_simple_indexado(
+            capital_inicial=capital_inicial,
             tasa_anual=tasa_anual,
             inflacion_anual=inflacion_anual,
-            meses=months,
-            retiro_mensual_inicial=r
+            meses=meses,
+            retiro_mensual_inicial=r,
+            detalle=detalle,
+            sin_piso=sin_piso
         )
     else:
-        simulador = lambda cap, months, r: simular_retiro_ppr_indexado(
-            capital_inicial=cap,
+        simulador = lambda r, detalle=True, sin_piso=False: simular_retiro_ppr_indexado(
+            capital_inicial=capital_inicial,
             tasa_anual=tasa_anual,
             inflacion_anual=inflacion_anual,
             udi_inicial=udi_inicial,
-            meses=months,
-            retiro_mensual_inicial=r
+            meses=meses,
+            retiro_mensual_inicial=r,
+            detalle=detalle,
+            sin_piso=sin_piso
         )
 
-    # búsqueda binaria
-    low = 0.0
-    high = capital_inicial / meses * 2
-
-    mejor_r = 0
-    mejor_saldos = None
-    mejor_mens = None
-    mejor_mes = None
-
-    for _ in range(40):
-        mid = (low + high) / 2
-        saldos, mensualidades, mes_agotado = simulador(
-            capital_inicial,
-            meses,
-            mid
-        )
-
-        saldo_final = saldos[-1]
+    tasa_mensual = (1 + tasa_anual) ** (1/12) - 1
 
-        mejor_r = mid
-        mejor_saldos = saldos
-        mejor_mens = mensualidades
-        mejor_mes = mes_agotado
+    mejor_r, iteraciones = resolver_retiro(
+        saldo_final=lambda r: simulador(r, detalle=False, sin_piso=True)[0],
+        semilla=anualidad_indexada(capital_inicial, tasa_mensual, inflacion_anual, meses),
+        cota_superior=capital_inicial / meses * 2,
+        tol_pesos=tol_pesos
+    )
 
-        if saldo_final > 0:
-            low = mid
-        else:
-            high = mid
+    # Una sola corrida completa con el retiro encontrado
+    mejor_saldos, mejor_mens, mejor_mes = simulador(mejor_r)
 
+    if con_iteraciones:
+        return mejor_r, mejor_saldos, mejor_mens, mejor_mes, iteraciones
     return mejor_r, mejor_saldos, mejor_mens, mejor_mes
 
 
@@ -0,0 +1,261 @@
+import math
+
+# ================================================================
+#   📐 Fórmulas cerradas para los modelos SIN comisiones
+# ================================================================
+#
+# CETES / renta fija, el ETF ideal y la acumulación simple son series
+# geométricas (o anualidades crecientes). No hace falta simularlas mes
+# a mes si solo se necesita el resultado final:
+# - Retiro nominal: O(1)
+# - Retiro indexado / aportes que suben cada año: O(años)
+#
+# Los modelos PPR (15 UDIs, gestión, IVA) sí se simulan mes a mes.
+
+
+def _factor_acumulado(tasa_mensual, meses):
+    """
+    Suma de (1 + i)^j para j = 0..meses-1  →  ((1 + i)^meses - 1) / i
+    """
+    if abs(tasa_mensual) < 1e-12:
+        return float(meses)
+    return ((1 + tasa_mensual) ** meses - 1) / tasa_mensual
+
+
+# ---------------------------------------------------------------
+#   Anualidades (retiro máximo)
+# ---------------------------------------------------------------
+
+def anualidad_nominal(capital, tasa_mensual, meses):
+    """
+    Retiro mensual fijo que agota 'capital' en 'meses' (sin comisiones).
+    """
+    if meses <= 0:
+        return 0.0
+    if abs(tasa_mensual) < 1e-12:
+        return capital / meses
+    return capital * tasa_mensual / (1 - (1 + tasa_mensual) ** -meses)
+
+
+def anualidad_indexada(capital, tasa_mensual, inflacion_anual, meses):
+    """
+    Retiro mensual inicial que agota 'capital' en 'meses' si el retiro
+    sube una vez al año con la inflación (sin comisiones).
+    """
+    if meses <= 0:
+        return 0.0
+
+    v = 1 / (1 + tasa_mensual)
+    factor = 0.0
+    for año in range(math.ceil(meses / 12)):
+        meses_año = min(12, meses - año * 12)
+        if abs(tasa_mensual) < 1e-12:
+            anualidad = meses_año
+        else:
+            anualidad = (1 - v ** meses_año) / tasa_mensual
+        factor += (1 + inflacion_anual) ** año * v ** (12 * año) * anualidad
+
+    return capital / factor
+
+
+# ---------------------------------------------------------------
+#   Retiro CETES / renta fija (simular_retiro_simple[_indexado])
+# ---------------------------------------------------------------
+
+def _mes_agotado_en_bloque(saldo, retiro, tasa_mensual, meses):
+    """
+    Primer mes j (1..meses) en el que saldo*(1+i)^j - retiro*s_j <= 0,
+    o None si el saldo aguanta todo el bloque.
+    """
+    def saldo_en(j):
+        return saldo * (1 + tasa_mensual) ** j - retiro * _factor_acumulado(tasa_mensual, j)
+
+    if saldo_en(meses) > 0:
+        return None
+
+    # Estimación con logaritmos y ajuste fino contra la misma fórmula
+    if saldo <= 0 or retiro <= 0:
+        j = 1
+    elif abs(tasa_mensual) < 1e-12 or retiro <= saldo * tasa_mensual:
+        j = math.ceil(saldo / retiro)
+    else:
+        j = math.ceil(
+            math.log(retiro / (retiro - saldo * tasa_mensual)) / math.log(1 + tasa_mensual)
+        )
+    j = min(max(j, 1), meses)
+
+    while j > 1 and saldo_en(j - 1) <= 0:
+        j -= 1
+    while saldo_en(j) > 0:
+        j += 1
+    return j
+
+
+def retiro_simple_analitico(
+    capital_inicial,
+    tasa_anual,
+    meses,
+    retiro_mensual,
+    inflacion_anual=0.0,
+    indexado=False,
+    sin_piso=False
+):
+    """
+    Resultado final del retiro en CETES sin simular mes a mes.
+
+    Regresa (saldo_final, mes_agotado, total_retirado), con las mismas
+    reglas que simular_retiro_simple (nominal) y
+    simular_retiro_simple_indexado (indexado=True).
+    """
+    tasa_mensual = (1 + tasa_anual) ** (1/12) - 1
+
+    # Total retirado: en los simuladores se cuenta todo el plazo
+    if indexado:
+        total_retirado = sum(
+            retiro_mensual * (1 + inflacion_anual) ** año * min(12, meses - año * 12)
+            for año in range(math.ceil(meses / 12))
+        )
+    else:
+        total_retirado = retiro_mensual * meses
+
+    # El nominal revisa el saldo antes de empezar (capital <= 0 → mes 0)
+    if not indexado and capital_inicial <= 0 and not sin_piso:
+        return 0.0, 0, total_retirado
+
+    bloque = 12 if indexado else max(meses, 1)
+    saldo = capital_inicial
+    retiro = retiro_mensual
+    mes_agotado = None
+    mes = 0
+
+    while mes < meses:
+        k = min(bloque, meses - mes)
+
+        if mes_agotado is None:
+            j = _mes_agotado_en_bloque(saldo, retiro, tasa_mensual, k)
+            if j is not None:
+                mes_agotado = mes + j
+                if not sin_piso:
+                    return 0.0, mes_agotado, total_retirado
+
+        saldo = saldo * (1 + tasa_mensual) ** k - retiro * _factor_acumulado(tasa_mensual, k)
+        retiro *= (1 + inflacion_anual) if indexado else 1
+        mes += k
+
+    if mes_agotado is None:
+        mes_agotado = meses
+
+    return saldo, mes_agotado, total_retirado
+
+
+# ---------------------------------------------------------------
+#   Acumulación sin comisiones (ETF ideal)
+# ---------------------------------------------------------------
+
+def acumulacion_analitica(años, inflacion_anual, rendimiento_anual, aporte_inicial, aportes_crecen):
+    """
+    Mismo resultado que simula_acumulacion (simulation.py) en O(años).
+    Regresa (saldo_final, aportes_totales).
+
+    Ojo: en simula_acumulacion el primer aumento ocurre después del mes 12,
+    así que el primer bloque tiene 13 meses y los demás 12.
+    """
+    meses = años * 12
+    r_m = (1 + rendimiento_anual) ** (1 / 12) - 1
+
+    saldo = 0.0
+    aportes_totales = 0.0
+    aporte = aporte_inicial
+    mes = 0
+
+    while mes < meses:
+        k = min(13 if mes == 0 else 12, meses - mes)
+
+        # aporte al inicio del mes y luego rendimiento
+        saldo = saldo * (1 + r_m) ** k + aporte * (1 + r_m) * _factor_acumulado(r_m, k)
+        aportes_totales += aporte * k
+
+        if aportes_crecen:
+            aporte *= (1 + inflacion_anual)
+        mes += k
+
+    return saldo, aportes_totales
+
+
+def saldo_aportes_analitico(aportes, rendimiento_anual):
+    """
+    Saldo final de una lista arbitraria de aportes (aporte y luego
+    rendimiento, sin comisiones): suma de aporte_m * (1 + r)^(n - m).
+    """
+    r_m = (1 + rendimiento_anual) ** (1 / 12) - 1
+    n = len(aportes)
+    return sum(a * (1 + r_m) ** (n - m) for m, a in enumerate(aportes))
+
+
+def serie_aportes_analitica(aportes, rendimiento_anual):
+    """
+    Saldo mes a mes de una lista de aportes (mismo orden que el ETF ideal
+    de allianz.py), calculado con NumPy en lugar de un ciclo de Python.
+    """
+    import numpy as np
+
+    r_m = (1 + rendimiento_anual) ** (1 / 12) - 1
+    crecimiento = (1 + r_m) ** np.arange(1, len(aportes) + 1)
+    return crecimiento * np.cumsum(np.asarray(aportes, dtype=float) / crecimiento * (1 + r_m))
+
+
+# ---------------------------------------------------------------
+#   Retiro con pensión que sube cada mes (simula_retiro_mes_a_mes)
+# ---------------------------------------------------------------
+
+def retiro_mes_a_mes_analitico(capital_inicial, años_retiro, inflacion_anual, rendimiento_anual,
+                               pension_mensual_inicial):
+    """
+    Mismo resultado final que simula_retiro_mes_a_mes sin simular.
+    Regresa (saldo_final, mes_final) con mes_final en base 0.
+
+    Después del retiro del mes m el saldo vale
+        (1 + i)^m * (C - P * (1 + x + ... + x^m)),   x = (1 + g) / (1 + i)
+    que cambia de signo una sola vez, así que el mes de agotamiento se
+    despeja con logaritmos.
+    """
+    meses = años_retiro * 12
+    i = (1 + rendimiento_anual) ** (1 / 12) - 1
+    g = (1 + inflacion_anual) ** (1 / 12) - 1
+    x = (1 + g) / (1 + i)
+    C = capital_inicial
+    P = pension_mensual_inicial
+
+    if meses <= 0:
+        return C, None
+
+    def suma_x(m):
+        if abs(x - 1) < 1e-12:
+            return m + 1
+        return (1 - x ** (m + 1)) / (1 - x)
+
+    def despues_de_retiro(m):
+        return C - P * suma_x(m)
+
+    # Primer mes con saldo <= 0 después del retiro
+    if P <= 0:
+        agotado = 0 if despues_de_retiro(0) <= 0 else None
+    elif despues_de_retiro(meses - 1) > 0:
+        agotado = None
+    else:
+        objetivo = 1 - C * (1 - x) / P
+        if abs(x - 1) < 1e-12 or objetivo <= 0:
+            m = math.ceil(C / P) - 1
+        else:
+            m = math.ceil(math.log(objetivo) / math.log(x)) - 1
+        m = min(max(m, 0), meses - 1)
+        while m > 0 and despues_de_retiro(m - 1) <= 0:
+            m -= 1
+        while despues_de_retiro(m) > 0:
+            m += 1
+        agotado = m
+
+    if agotado is not None:
+        return 0, agotado
+
+    return (1 + i) ** meses * despues_de_retiro(meses - 1), meses - 1
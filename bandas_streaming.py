@@ -0,0 +1,114 @@
+import numpy as np
+
+# ================================================================
+#   📊 Percentiles en streaming (memoria constante)
+# ================================================================
+#
+# Para bandas P5/P50/P95 de millones de trayectorias no se puede guardar
+# la matriz meses × trayectorias. Cada fila (un mes, o una métrica) lleva
+# un histograma fijo de 'n_bins' casillas sobre asinh(valor / escala):
+# casi logarítmico para saldos grandes (colas largas) y lineal cerca de 0
+# (saldos agotados, pensiones en 0).
+# - La malla de la fila se define con el primer bloque que llega
+#   (mín–máx ampliado por 'margen' de cada lado; escala = mediana de |valor|).
+# - Si un bloque posterior cae fuera de la malla, la malla se duplica hacia
+#   ese lado (casillas del doble de ancho, juntando los conteos de dos en
+#   dos) hasta cubrirlo; nada se recorta a la orilla.
+# - El percentil se interpola dentro de su casilla.
+#
+# La memoria es n_filas × n_bins sin importar cuántas trayectorias se
+# procesen, y el error es de a lo más una casilla de la malla final
+# ('ampliaciones' cuenta cuántas veces se duplicó cada fila).
+
+
+class BandasPercentiles:
+    """
+    Acumulador de percentiles por fila con memoria constante.
+
+    Uso:
+        bandas = BandasPercentiles(n_filas=meses)
+        bandas.agregar(mes, saldos_del_bloque)   # por cada bloque
+        bandas.percentiles((5, 50, 95))          # matriz (3 × meses)
+    """
+
+    def __init__(self, n_filas, n_bins=4096, margen=0.5):
+        self.n_bins = n_bins
+        self.margen = margen
+        self.conteos = np.zeros((n_filas, n_bins), dtype=np.int64)
+        self.inicio = np.full(n_filas, np.nan)
+        self.ancho = np.full(n_filas, np.nan)
+        self.escala = np.ones(n_filas)
+        self.minimo = np.full(n_filas, np.inf)
+        self.maximo = np.full(n_filas, -np.inf)
+        self.n = np.zeros(n_filas, dtype=np.int64)
+        self.ampliaciones = np.zeros(n_filas, dtype=np.int64)
+
+    def agregar(self, fila, valores):
+        """
+        Suma un bloque de valores (arreglo 1D) a la fila indicada.
+        """
+        valores = np.asarray(valores, dtype=float).ravel()
+        if valores.size == 0:
+            return
+
+        v_min, v_max = valores.min(), valores.max()
+
+        if np.isnan(self.inicio[fila]):
+            self.escala[fila] = max(float(np.median(np.abs(valores))), 1e-9)
+            t = np.arcsinh(valores / self.escala[fila])
+            rango = max(t.max() - t.min(), 1e-9)
+            self.inicio[fila] = t.min() - self.margen * rango
+            self.ancho[fila] = rango * (1 + 2 * self.margen) / self.n_bins
+        else:
+            t = np.arcsinh(valores / self.escala[fila])
+            while t.min() < self.inicio[fila]:
+                self._ampliar(fila, hacia_abajo=True)
+            while t.max() >= self.inicio[fila] + self.n_bins * self.ancho[fila]:
+                self._ampliar(fila, hacia_abajo=False)
+
+        casilla = np.floor((t - self.inicio[fila]) / self.ancho[fila]).astype(np.int64)
+        np.clip(casilla, 0, self.n_bins - 1, out=casilla)
+
+        self.conteos[fila] += np.bincount(casilla, minlength=self.n_bins)
+        self.minimo[fila] = min(self.minimo[fila], v_min)
+        self.maximo[fila] = max(self.maximo[fila], v_max)
+        self.n[fila] += valores.size
+
+    def _ampliar(self, fila, hacia_abajo):
+        """
+        Duplica el ancho de las casillas de la fila. La malla crece hacia
+        abajo (el inicio baja n_bins casillas viejas) o hacia arriba; las
+        orillas viejas coinciden con orillas nuevas, así que los conteos
+        se juntan de dos en dos sin perder exactitud.
+        """
+        desplazamiento = self.n_bins if hacia_abajo else 0
+        destino = (np.arange(self.n_bins) + desplazamiento) // 2
+        nuevos = np.zeros(self.n_bins, dtype=np.int64)
+        np.add.at(nuevos, destino, self.conteos[fila])
+        self.conteos[fila] = nuevos
+
+        if hacia_abajo:
+            self.inicio[fila] -= self.n_bins * self.ancho[fila]
+        self.ancho[fila] *= 2
+        self.ampliaciones[fila] += 1
+
+    def percentiles(self, percentiles=(5, 50, 95)):
+        """
+        Regresa una matriz (len(percentiles) × n_filas).
+        Las filas sin datos quedan en NaN.
+        """
+        acumulado = np.cumsum(self.conteos, axis=1)
+        filas = np.arange(self.conteos.shape[0])
+        salida = np.full((len(percentiles), len(filas)), np.nan)
+
+        for k, p in enumerate(percentiles):
+            objetivo = p / 100 * self.n
+            casilla = np.minimum((acumulado < objetivo[:, None]).sum(axis=1), self.n_bins - 1)
+            previo = np.where(casilla > 0, acumulado[filas, casilla - 1], 0)
+            en_casilla = np.maximum(self.conteos[filas, casilla], 1)
+            fraccion = np.clip((objetivo - previo) / en_casilla, 0.0, 1.0)
+
+            valor = self.escala * np.sinh(self.inicio + (casilla + fraccion) * self.ancho)
+            salida[k] = np.where(self.n > 0, np.clip(valor, self.minimo, self.maximo), np.nan)
+
+        return salida
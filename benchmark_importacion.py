@@ -0,0 +1,117 @@
+import json
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+# ================================================================
+#   ⏱️ Benchmark de importación del núcleo de simulación
+# ================================================================
+#
+# Importa cada módulo en un proceso nuevo (arranque en frío, sin módulos
+# ya cargados) varias veces y reporta el tiempo de importación. También
+# revisa que no se haya colado ninguna librería de interfaz.
+#
+# Con --perfil reporta el arranque en frío desglosado por paquete
+# (python -X importtime), p. ej. para ver cuánto cuesta cada dependencia
+# al cargar una de las apps.
+#
+# Uso:
+#   python benchmark_importacion.py                       # nucleo_simulacion
+#   python benchmark_importacion.py nucleo_simulacion montecarlo -n 20
+#   python benchmark_importacion.py --perfil simulation allianz
+
+PESADOS = ("streamlit", "plotly", "altair", "pandas", "xlsxwriter")
+
+_CODIGO = """
+import json, sys, time
+inicio = time.perf_counter()
+import {modulo}
+segundos = time.perf_counter() - inicio
+pesados = sorted({{m.split(".")[0] for m in sys.modules}} & set({pesados!r}))
+print(json.dumps({{"segundos": segundos, "pesados": pesados}}))
+"""
+
+
+def medir_importacion(modulo, repeticiones=10):
+    """
+    Importa 'modulo' en 'repeticiones' procesos nuevos.
+    Regresa {"modulo", "mediana_ms", "min_ms", "max_ms", "pesados"}.
+    """
+    tiempos, pesados = [], set()
+    for _ in range(repeticiones):
+        salida = subprocess.run(
+            [sys.executable, "-c", _CODIGO.format(modulo=modulo, pesados=PESADOS)],
+            capture_output=True, text=True, check=True
+        )
+        datos = json.loads(salida.stdout.strip().splitlines()[-1])
+        tiempos.append(datos["segundos"] * 1000)
+        pesados.update(datos["pesados"])
+
+    return {
+        "modulo": modulo,
+        "mediana_ms": statistics.median(tiempos),
+        "min_ms": min(tiempos),
+        "max_ms": max(tiempos),
+        "pesados": sorted(pesados),
+    }
+
+
+def perfil_arranque(modulo, top=15):
+    """
+    Arranque en frío de 'modulo' (un proceso nuevo con -X importtime),
+    con el tiempo propio de cada import sumado por paquete raíz.
+    Regresa (total_ms, [(paquete, ms), ...]) con los 'top' más caros.
+
+    Importar allianz.py o simulation.py ejecuta el script completo (en
+    modo "bare" de Streamlit), así que su tiempo propio es el del script.
+    """
+    salida = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+        capture_output=True, text=True, check=True
+    )
+
+    por_paquete = defaultdict(float)
+    for linea in salida.stderr.splitlines():
+        if not linea.startswith("import time:") or "self [us]" in linea:
+            continue
+        propio, _acumulado, nombre = linea[len("import time:"):].split("|")
+        por_paquete[nombre.strip().split(".")[0]] += int(propio) / 1000
+
+    total = sum(por_paquete.values())
+    ranking = sorted(por_paquete.items(), key=lambda par: par[1], reverse=True)
+    return total, ranking[:top]
+
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    repeticiones = 10
+    if "-n" in argv:
+        i = argv.index("-n")
+        repeticiones = int(argv[i + 1])
+        del argv[i:i + 2]
+    perfil = "--perfil" in argv
+    if perfil:
+        argv.remove("--perfil")
+    modulos = argv or ["nucleo_simulacion"]
+
+    if perfil:
+        for modulo in modulos:
+            total, ranking = perfil_arranque(modulo)
+            print(f"{modulo}: arranque en frío {total:.0f} ms")
+            for paquete, ms in ranking:
+                print(f"  {paquete:<28} {ms:8.1f} ms  {ms / total:6.1%}")
+        return 0
+
+    ok = True
+    for modulo in modulos:
+        r = medir_importacion(modulo, repeticiones)
+        pesados = ", ".join(r["pesados"]) if r["pesados"] else "ninguna"
+        print(f"{r['modulo']:<24} mediana {r['mediana_ms']:7.1f} ms "
+              f"(min {r['min_ms']:.1f}, max {r['max_ms']:.1f})  librerías pesadas: {pesados}")
+        ok = ok and not r["pesados"]
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
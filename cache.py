@@ -0,0 +1,167 @@
+import functools
+import hashlib
+import inspect
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# ================================================================
+#   🗃️ Caché por parámetros para las etapas del simulador
+# ================================================================
+#
+# Cada rerun de Streamlit vuelve a ejecutar todo el script. Las etapas
+# pesadas (tablas, SAT, búsquedas de retiro, Monte Carlo) se envuelven con
+# @cache_etapa: la llave es un hash canónico de sus argumentos, así que
+# una etapa cuyos insumos no cambiaron regresa al instante.
+#
+# - Hash canónico: 5, 5.0 y np.float64(5) dan la misma llave; listas,
+#   tuplas, dicts, arreglos de NumPy y DataFrames se recorren por valor.
+# - Tamaño acotado (LRU) y expiración por TTL.
+# - Un solo caché por proceso, compartido por todas las sesiones y
+#   protegido con un lock.
+# - Se regresa una copia de DataFrames / arreglos / listas para que quien
+#   llama pueda modificarlos sin dañar el caché.
+
+
+def _alimentar(h, valor):
+    if valor is None:
+        h.update(b"N")
+    elif isinstance(valor, (bool, np.bool_)):
+        h.update(b"B1" if valor else b"B0")
+    elif isinstance(valor, (int, float, np.integer, np.floating)):
+        h.update(b"F" + struct.pack("<d", float(valor)))
+    elif isinstance(valor, str):
+        datos = valor.encode("utf-8")
+        h.update(b"S" + struct.pack("<q", len(datos)) + datos)
+    elif isinstance(valor, (list, tuple)):
+        h.update(b"L" + struct.pack("<q", len(valor)))
+        for v in valor:
+            _alimentar(h, v)
+    elif isinstance(valor, dict):
+        h.update(b"D" + struct.pack("<q", len(valor)))
+        for k in sorted(valor, key=repr):
+            _alimentar(h, k)
+            _alimentar(h, valor[k])
+    elif isinstance(valor, np.ndarray):
+        arreglo = np.ascontiguousarray(valor)
+        if arreglo.dtype.kind in "iuf":
+            arreglo = arreglo.astype(float)
+        h.update(b"A" + str(arreglo.dtype).encode() + str(arreglo.shape).encode())
+        h.update(arreglo.tobytes())
+    elif isinstance(valor, (pd.DataFrame, pd.Series)):
+        h.update(b"P")
+        columnas = valor.columns if isinstance(valor, pd.DataFrame) else [valor.name]
+        _alimentar(h, [str(c) for c in columnas])
+        h.update(pd.util.hash_pandas_object(valor, index=True).to_numpy().tobytes())
+    else:
+        raise TypeError(f"No se puede generar una llave de caché para {type(valor).__name__}")
+
+
+def clave_canonica(*args, **kwargs):
+    """
+    Hash canónico (sha256 en hex) de los argumentos posicionales y por nombre.
+    """
+    h = hashlib.sha256()
+    _alimentar(h, list(args))
+    _alimentar(h, kwargs)
+    return h.hexdigest()
+
+
+def copia(valor):
+    """
+    Copia de DataFrames, Series y arreglos (también dentro de listas,
+    tuplas y dicts), para que quien recibe un valor guardado no lo dañe.
+    """
+    if isinstance(valor, (pd.DataFrame, pd.Series, np.ndarray)):
+        return valor.copy()
+    if isinstance(valor, list):
+        return [copia(v) for v in valor]
+    if isinstance(valor, tuple):
+        return tuple(copia(v) for v in valor)
+    if isinstance(valor, dict):
+        return {k: copia(v) for k, v in valor.items()}
+    return valor
+
+
+class CacheEtapas:
+    """
+    Diccionario LRU con expiración por TTL (segundos) y estadísticas.
+    """
+
+    def __init__(self, max_entradas=128, ttl=600):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave):
+        """
+        Regresa (encontrado, valor).
+        """
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is not None:
+                guardado, valor = entrada
+                if self.ttl is None or time.monotonic() - guardado <= self.ttl:
+                    self._datos.move_to_end(clave)
+                    self.aciertos += 1
+                    return True, valor
+                del self._datos[clave]
+            self.fallos += 1
+            return False, None
+
+    def guardar(self, clave, valor):
+        with self._lock:
+            self._datos[clave] = (time.monotonic(), valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+            self.aciertos = self.fallos = 0
+
+    def __len__(self):
+        return len(self._datos)
+
+
+def cache_etapa(max_entradas=128, ttl=600, ignorar=("avance",)):
+    """
+    Decorador: guarda el resultado de la función por hash canónico de sus
+    argumentos. El caché queda disponible en 'funcion.cache'.
+
+    Los argumentos por nombre en 'ignorar' (p. ej. el callback de progreso
+    de ejecutor.py) se pasan a la función pero no forman parte de la llave.
+    """
+    def decorador(funcion):
+        cache = CacheEtapas(max_entradas=max_entradas, ttl=ttl)
+        firma = inspect.signature(funcion)
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            extras = {k: kwargs.pop(k) for k in ignorar if k in kwargs}
+
+            # Misma llave sin importar si el argumento llega por posición,
+            # por nombre o por default
+            argumentos = firma.bind(*args, **kwargs)
+            argumentos.apply_defaults()
+            clave = clave_canonica(**{
+                k: v for k, v in argumentos.arguments.items() if k not in ignorar
+            })
+            encontrado, valor = cache.obtener(clave)
+            if not encontrado:
+                valor = funcion(*args, **kwargs, **extras)
+                cache.guardar(clave, valor)
+            return copia(valor)
+
+        envoltura.cache = cache
+        return envoltura
+
+    return decorador
@@ -0,0 +1,355 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# ================================================================
+#   🏢 Proyección de la cartera por mes calendario
+# ================================================================
+#
+# Vista de la firma: flujos de todos los clientes sumados por mes del
+# calendario (aportaciones, devoluciones del SAT, comisiones cobradas por
+# la aseguradora, saldos proyectados y retiros).
+#
+# - Cada cliente empieza en su 'fecha_inicio' y tiene su propio plazo:
+#   su mes 1 se alinea al mes calendario de esa fecha.
+# - Los clientes se procesan en bloques con los motores vectorizados
+#   (tablas_vectorizadas.py y retiro_vectorizado.py): cada bloque es una
+#   matriz (meses × clientes) que se suma al calendario con np.bincount y
+#   se descarta. La memoria depende del tamaño del bloque, no del número
+#   de clientes, y nunca se arma un DataFrame por cliente.
+# - La acumulación es la de allianz.py (saldo inicial + comprometido con
+#   SAT + bono); al terminar el plazo, el saldo se retira con el retiro
+#   óptimo PPR (nominal o indexado) durante 'años_retiro'.
+#
+# Perfiles: las columnas de pipeline_allianz.PERFIL_BASE más fecha_inicio.
+#
+# Uso:
+#   python cartera.py clientes.csv cartera.parquet
+#   python cartera.py clientes.parquet cartera.csv --anual --retiro indexado
+
+BLOQUE = 250   # clientes por bloque (≈30 MB de matrices con plazos de 25 años)
+
+COLUMNAS = (
+    "Clientes acumulando",
+    "Clientes en retiro",
+    "Aportaciones",
+    "Devolución SAT",
+    "Comisiones",
+    "Saldo acumulación",
+    "Saldo retiro",
+    "Retiros",
+)
+FLUJOS = ("Aportaciones", "Devolución SAT", "Comisiones", "Retiros")
+
+
+def _mes_calendario(fechas):
+    """
+    Índice de mes calendario (año * 12 + mes - 1) de cada fecha.
+    """
+    import pandas as pd
+
+    periodos = pd.to_datetime(pd.Series(fechas), errors="raise").dt.to_period("M")
+    return np.array([p.year * 12 + p.month - 1 for p in periodos], dtype=int)
+
+
+def _aportes_clientes(p):
+    """
+    Matriz (meses × clientes) de aportes, igual a etapa_aportes para cada
+    cliente (estrategia de 18 meses o early stop), con 0 después del plazo.
+    """
+    meses = p["plazo"] * 12
+    total = int(meses.max())
+    inflacion = p["inflacion_anual"]
+    estrategia = p["modo_estrategia"]
+
+    aporte = np.where(estrategia, p["aporte_temporal"], p["aportacion"]).astype(float)
+    aportes = np.empty((total, len(aporte)))
+    for m in range(total):
+        if m == 18:
+            aporte = np.where(estrategia, p["aportacion"] * (1 + inflacion), aporte)
+        aportes[m] = aporte
+        if m > 0 and m % 12 == 0:
+            aporte = np.where(p["incrementar"], aporte * (1 + inflacion), aporte)
+
+    if total > 18:
+        aportes[18] += np.where(estrategia, p["offset_manual"], 0.0)
+    mes = np.arange(total)[:, None]
+    aportes[(mes >= p["años_aportando"] * 12) & ~estrategia] = 0
+    aportes[mes >= meses] = 0
+    return aportes
+
+
+def _sat_clientes(aportes, p):
+    """
+    Matriz (meses × clientes) de devoluciones del SAT, igual a etapa_sat:
+    el deducible de cada año se deposita en el mes 13, 25, 37, ...
+    """
+    total, n = aportes.shape
+    plazo = p["plazo"]
+    sat = np.zeros((total, n))
+    salario = p["salario_anual"].astype(float)
+    limite_uma = p["uma_inicial"] * 365 * 5
+
+    for year in range(int(plazo.max())):
+        vigente = year < plazo
+        a_anual = aportes[year * 12:(year + 1) * 12].sum(axis=0)
+        deducible = np.minimum(np.minimum(a_anual, salario * 0.10), limite_uma)
+        mes_inyeccion = year * 12 + 13
+        if mes_inyeccion <= total:
+            sat[mes_inyeccion - 1] = np.where(vigente & (mes_inyeccion <= plazo * 12),
+                                              deducible * p["tasa_marginal_isr"], 0.0)
+        salario = salario * (1 + p["inflacion_anual"])
+    return sat
+
+
+def _sumar_al_calendario(acumulado, columna, matriz, inicio):
+    """
+    Suma cada columna (cliente) de 'matriz' al calendario a partir de su
+    mes 'inicio' (índice en el arreglo acumulado). Los NaN (meses después
+    del plazo de cada cliente) cuentan como 0.
+    """
+    meses, n = matriz.shape
+    largo = acumulado[columna].size
+    indices = inicio[None, :] + np.arange(meses)[:, None]
+    suma = np.bincount(indices.ravel(), weights=np.nan_to_num(matriz).ravel(), minlength=largo)
+    # Lo que cae después del calendario es relleno de clientes con plazos más cortos
+    acumulado[columna] += suma[:largo]
+
+
+def _proyectar_bloque(perfiles, inicio, largo, modalidad_retiro):
+    """
+    Trabajo de un bloque: perfiles completos (dict de arreglos), mes de
+    inicio de cada cliente relativo al calendario y largo del calendario.
+    Regresa un dict columna → arreglo (largo,) con las sumas del bloque.
+    """
+    from retiro_vectorizado import buscar_retiro_optimo_lote, simular_retiro_vectorizado
+    from tablas_vectorizadas import (
+        simular_bono_vectorizado,
+        simular_saldo_comprometido_vectorizado,
+        simular_saldo_inicial_vectorizado,
+    )
+
+    p = perfiles
+    meses = p["plazo"] * 12
+    acumulado = {c: np.zeros(largo) for c in COLUMNAS}
+
+    aportes = _aportes_clientes(p)
+    sat = _sat_clientes(aportes, p)
+
+    inicial = simular_saldo_inicial_vectorizado(
+        aporte_inicial=aportes[0],
+        tasa_anual=p["rendimiento_anual"],
+        inflacion_anual=p["inflacion_anual"],
+        meses_totales=meses,
+        meses_aportando=18,
+        cargo_fijo_inicial=-500,
+        incrementar=p["incrementar"],
+        detalle=True
+    )
+    comprometido = simular_saldo_comprometido_vectorizado(
+        aportes=aportes,
+        inflacion=p["inflacion_anual"],
+        udi_inicial=p["udi_inicial"],
+        tasa_anual=p["rendimiento_anual"],
+        meses=meses,
+        offset=18,
+        sat_inyectado=sat,
+        detalle=True
+    )
+    bono = simular_bono_vectorizado(
+        aporte_mensual=np.where(p["usar_bono"], p["aportacion"], 0),
+        plazo_anios=p["plazo"],
+        tasa_anual_bono=0.09,
+        detalle=True
+    )
+
+    saldo = inicial["Saldo Final"] + comprometido["Saldo Final"] + bono["Saldo Final"]
+    comisiones = -(
+        np.nan_to_num(inicial["Cargo Fijo"]) + np.nan_to_num(inicial["Cargo Administrativo"])
+        + np.nan_to_num(inicial["Cargo Gestión Inversión"])
+        + np.nan_to_num(comprometido["Cargo Fijo"]) + np.nan_to_num(comprometido["Cargo Gestión Inversión"])
+        + np.nan_to_num(bono["Cargo Administrativo"]) + np.nan_to_num(bono["Cargo Gestión Inversión"])
+    )
+    activo = np.arange(aportes.shape[0])[:, None] < meses[None, :]
+
+    _sumar_al_calendario(acumulado, "Clientes acumulando", activo.astype(float), inicio)
+    _sumar_al_calendario(acumulado, "Aportaciones",
+                         np.nan_to_num(inicial["Aportación"]) + np.nan_to_num(comprometido["Aportación"]), inicio)
+    _sumar_al_calendario(acumulado, "Devolución SAT", sat, inicio)
+    _sumar_al_calendario(acumulado, "Comisiones", np.where(activo, comisiones, 0.0), inicio)
+    _sumar_al_calendario(acumulado, "Saldo acumulación", saldo, inicio)
+    del inicial, comprometido, bono, sat, aportes
+
+    # === Retiro: saldo al final del plazo, retiro óptimo PPR ===
+    capital = saldo[meses - 1, np.arange(len(meses))]
+    meses_retiro = p["años_retiro"] * 12
+    indexado = modalidad_retiro == "indexado"
+    retiro_optimo, _mes_agotado, _iteraciones = buscar_retiro_optimo_lote(
+        capital_inicial=capital,
+        meses=meses_retiro,
+        tasa_anual=p["rendimiento_anual"],
+        inflacion_anual=p["inflacion_anual"],
+        udi_inicial=p["udi_inicial"],
+        cetes=False,
+        indexado=indexado
+    )
+    _saldo, _mes, retiro = simular_retiro_vectorizado(
+        capital_inicial=capital,
+        tasa_anual=p["rendimiento_anual"],
+        inflacion_anual=p["inflacion_anual"],
+        udi_inicial=p["udi_inicial"],
+        meses=meses_retiro,
+        retiro_mensual=retiro_optimo,
+        cetes=False,
+        indexado=indexado,
+        detalle=True
+    )
+    inicio_retiro = inicio + meses
+    en_retiro = ~np.isnan(retiro["Saldo Final"])
+    _sumar_al_calendario(acumulado, "Clientes en retiro", en_retiro.astype(float), inicio_retiro)
+    _sumar_al_calendario(acumulado, "Saldo retiro", retiro["Saldo Final"], inicio_retiro)
+    _sumar_al_calendario(acumulado, "Retiros", retiro["Retiro"], inicio_retiro)
+    _sumar_al_calendario(acumulado, "Comisiones", retiro["Comisiones"], inicio_retiro)
+    return acumulado
+
+
+def _preparar_perfiles(df):
+    """
+    perfil_completo de cada fila. Regresa (perfiles válidos como dict de
+    arreglos, mes calendario de inicio, errores [(índice, mensaje)]).
+    """
+    from pipeline_allianz import PERFIL_BASE, perfil_completo
+
+    if "fecha_inicio" not in df.columns:
+        raise ValueError("Falta la columna 'fecha_inicio' (fecha del primer aporte de cada cliente)")
+
+    validos, indices, errores = [], [], []
+    for indice, fila in zip(df.index, df.to_dict("records")):
+        try:
+            validos.append(perfil_completo(fila))
+            indices.append(indice)
+        except Exception as e:
+            errores.append((indice, f"{type(e).__name__}: {e}"))
+
+    perfiles = {campo: np.array([v[campo] for v in validos]) for campo in PERFIL_BASE}
+    inicio = _mes_calendario(df.loc[indices, "fecha_inicio"]) if indices else np.array([], dtype=int)
+    return perfiles, inicio, errores
+
+
+def proyeccion_cartera(df, bloque=BLOQUE, modalidad_retiro="nominal", procesos=1, avance=None):
+    """
+    Proyección mensual de toda la cartera.
+
+    'df': una fila por cliente (PERFIL_BASE + fecha_inicio).
+    Regresa (df_mensual, errores): df_mensual con una fila por mes
+    calendario ("Mes", periodo mensual) y las COLUMNAS; errores es la lista
+    de (índice, mensaje) de los clientes que no se pudieron simular.
+    'avance(fraccion, mensaje)' se llama al terminar cada bloque.
+    """
+    import pandas as pd
+
+    if modalidad_retiro not in ("nominal", "indexado"):
+        raise ValueError(f"Modalidad de retiro desconocida: {modalidad_retiro}")
+
+    perfiles, inicio, errores = _preparar_perfiles(df)
+    n = len(inicio)
+    if n == 0:
+        return pd.DataFrame(columns=["Mes", *COLUMNAS]), errores
+
+    # Calendario completo: del primer inicio al último mes de retiro
+    primero = int(inicio.min())
+    largo = int((inicio + (perfiles["plazo"] + perfiles["años_retiro"]) * 12).max()) - primero
+    relativo = inicio - primero
+
+    # Bloques ordenados por plazo: menos meses de relleno (NaN) por bloque
+    orden = np.argsort(perfiles["plazo"] + perfiles["años_retiro"], kind="stable")
+    trozos = [orden[i:i + bloque] for i in range(0, n, bloque)]
+    argumentos = [
+        ({campo: valores[trozo] for campo, valores in perfiles.items()}, relativo[trozo], largo, modalidad_retiro)
+        for trozo in trozos
+    ]
+
+    total = {c: np.zeros(largo) for c in COLUMNAS}
+    hechos = 0
+
+    def sumar(parcial, tamano):
+        nonlocal hechos
+        for columna in COLUMNAS:
+            total[columna] += parcial[columna]
+        hechos += tamano
+        if avance is not None:
+            avance(hechos / n, f"{hechos}/{n} clientes")
+
+    if procesos == 1:
+        for args, trozo in zip(argumentos, trozos):
+            sumar(_proyectar_bloque(*args), len(trozo))
+    else:
+        with ProcessPoolExecutor(max_workers=procesos or os.cpu_count()) as pool:
+            futuros = [pool.submit(_proyectar_bloque, *args) for args in argumentos]
+            for futuro, trozo in zip(futuros, trozos):
+                sumar(futuro.result(), len(trozo))
+
+    df_mensual = pd.DataFrame(total)
+    for columna in ("Clientes acumulando", "Clientes en retiro"):
+        df_mensual[columna] = df_mensual[columna].round().astype(int)
+    df_mensual.insert(0, "Mes", pd.period_range(
+        pd.Period(year=primero // 12, month=primero % 12 + 1, freq="M"), periods=largo, freq="M"
+    ))
+    df_mensual["Saldo total"] = df_mensual["Saldo acumulación"] + df_mensual["Saldo retiro"]
+    return df_mensual, errores
+
+
+def resumen_anual_cartera(df_mensual):
+    """
+    Por año calendario: flujos sumados, saldos y clientes al cierre del año.
+    """
+    anual = df_mensual.groupby(df_mensual["Mes"].dt.year)
+    resultado = anual[list(FLUJOS)].sum()
+    cierre = [c for c in df_mensual.columns if c not in FLUJOS and c != "Mes"]
+    resultado[cierre] = anual[cierre].last()
+    return resultado[[c for c in df_mensual.columns if c != "Mes"]].rename_axis("Año").reset_index()
+
+
+def main(argv=None):
+    from lote_clientes import leer_clientes
+
+    parser = argparse.ArgumentParser(description="Proyección de la cartera por mes calendario.")
+    parser.add_argument("entrada", help="Perfiles con fecha_inicio (.csv o .parquet)")
+    parser.add_argument("salida", help="Resultado (.parquet o .csv)")
+    parser.add_argument("--anual", action="store_true", help="Resumir por año calendario")
+    parser.add_argument("--retiro", choices=("nominal", "indexado"), default="nominal",
+                        help="Modalidad del retiro óptimo PPR (default: nominal)")
+    parser.add_argument("--bloque", type=int, default=BLOQUE, help=f"Clientes por bloque (default: {BLOQUE})")
+    parser.add_argument("--procesos", type=int, default=1, help="Procesos (0 = uno por núcleo)")
+    args = parser.parse_args(argv)
+
+    df = leer_clientes(args.entrada)
+    inicio = time.perf_counter()
+
+    def avance(_fraccion, mensaje):
+        print(f"\r{mensaje}", end="", file=sys.stderr, flush=True)
+
+    df_mensual, errores = proyeccion_cartera(df, args.bloque, args.retiro, args.procesos or None, avance)
+    segundos = time.perf_counter() - inicio
+
+    resultado = resumen_anual_cartera(df_mensual) if args.anual else df_mensual
+    if args.salida.lower().endswith(".csv"):
+        resultado.to_csv(args.salida, index=False)
+    else:
+        if not args.anual:
+            resultado = resultado.assign(Mes=resultado["Mes"].astype(str))
+        resultado.to_parquet(args.salida, index=False)
+
+    print(f"\n{len(df) - len(errores)} clientes en {segundos:.1f} s → {args.salida}"
+          f" ({len(errores)} con error)", file=sys.stderr)
+    for indice, mensaje in errores[:10]:
+        print(f"  fila {indice}: {mensaje}", file=sys.stderr)
+    return 0 if not errores else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
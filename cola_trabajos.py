@@ -0,0 +1,481 @@
+import argparse
+import importlib
+import json
+import os
+import pickle
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import traceback
+
+from cache import clave_canonica
+from ejecutor import TrabajoCancelado
+
+# ================================================================
+#   📬 Cola de trabajos persistente (SQLite)
+# ================================================================
+#
+# Barridos grandes, Monte Carlo con muchas trayectorias y lotes de
+# clientes tardan demasiado para un rerun de Streamlit. Aquí se encolan
+# en un archivo SQLite y los corren procesos trabajadores aparte:
+#
+# - Estados: pendiente → corriendo → terminado | fallido | cancelado.
+# - Un trabajo que falla se reintenta hasta 'max_intentos' veces.
+# - Los trabajadores mandan un latido; si uno muere (o se reinicia), su
+#   trabajo vuelve a la cola cuando el latido se vence.
+# - Parámetros y resultado se guardan como blobs (pickle) en la base.
+# - Enviar el mismo trabajo (mismo tipo e insumos, llave canónica de
+#   cache.py) regresa el que ya existe: tras recargar la página, la UI
+#   vuelve a "enviar" y recoge el trabajo en curso o su resultado. Si un
+#   insumo es un archivo, su fecha y tamaño también cuentan.
+#
+# Las funciones de cada tipo siguen la convención de ejecutor.py:
+# reciben 'avance(fraccion, mensaje)' y lo llaman de vez en cuando.
+#
+# Uso:
+#   python cola_trabajos.py trabajador --procesos 2
+#   python cola_trabajos.py enviar lote_clientes entrada=clientes.csv salida=proyecciones.parquet
+#   python cola_trabajos.py estado
+
+RUTA_POR_DEFECTO = os.environ.get("PPR_COLA_TRABAJOS", "trabajos.sqlite3")
+
+LATIDO = 5            # segundos entre latidos de un trabajador
+LATIDO_VENCIDO = 30   # sin latido por más de esto, el trabajador se da por muerto
+MAX_INTENTOS = 3
+
+# Tipo de trabajo → "modulo:funcion" (se importa en el trabajador)
+TIPOS = {
+    "montecarlo": "pipeline_allianz:etapa_montecarlo",
+    "barrido_edades": "nucleo_simulacion:barrido_edades_retiro",
+    "lote_clientes": "lote_clientes:procesar_archivo",
+}
+
+# Parámetros de cada tipo que son rutas de archivos de entrada: su fecha
+# de modificación y tamaño entran en la llave, así que editar el archivo
+# y volver a enviar corre el trabajo otra vez en lugar de reutilizarlo.
+ARCHIVOS_DE_ENTRADA = {
+    "lote_clientes": ("entrada",),
+}
+
+ACTIVOS = ("pendiente", "corriendo")
+REUTILIZABLES = ("pendiente", "corriendo", "terminado")
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS trabajos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tipo TEXT NOT NULL,
+    clave TEXT NOT NULL,
+    parametros BLOB NOT NULL,
+    estado TEXT NOT NULL DEFAULT 'pendiente',
+    intentos INTEGER NOT NULL DEFAULT 0,
+    max_intentos INTEGER NOT NULL,
+    progreso REAL NOT NULL DEFAULT 0,
+    mensaje TEXT NOT NULL DEFAULT '',
+    resultado BLOB,
+    error TEXT,
+    trabajador TEXT,
+    latido REAL,
+    creado REAL NOT NULL,
+    actualizado REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS trabajos_estado ON trabajos (estado, id);
+CREATE INDEX IF NOT EXISTS trabajos_clave ON trabajos (clave);
+CREATE TABLE IF NOT EXISTS trabajadores (
+    nombre TEXT PRIMARY KEY,
+    pid INTEGER NOT NULL,
+    latido REAL NOT NULL
+);
+"""
+
+_COLUMNAS_ESTADO = ("id", "tipo", "estado", "intentos", "max_intentos", "progreso", "mensaje",
+                    "error", "trabajador", "creado", "actualizado")
+
+
+def _huella_entradas(tipo, parametros):
+    """
+    (parámetro, mtime_ns, tamaño) de cada archivo de entrada de 'tipo';
+    (parámetro, None, None) si el archivo no existe (el trabajo fallará).
+    """
+    huella = []
+    for nombre in ARCHIVOS_DE_ENTRADA.get(tipo, ()):
+        try:
+            info = os.stat(parametros[nombre])
+            huella.append((nombre, info.st_mtime_ns, info.st_size))
+        except (KeyError, TypeError, OSError):
+            huella.append((nombre, None, None))
+    return huella
+
+
+def clave_trabajo(tipo, **parametros):
+    """
+    Llave canónica de un trabajo: tipo, parámetros y huella de sus
+    archivos de entrada.
+    """
+    return clave_canonica(tipo, _huella_entradas(tipo, parametros), **parametros)
+
+
+class TrabajoFallido(Exception):
+    """
+    El trabajo agotó sus intentos; el mensaje trae el último error.
+    """
+
+
+class ColaTrabajos:
+    """
+    Acceso a la cola en 'ruta'. Cada operación abre su propia conexión,
+    así que una instancia se puede usar desde varios hilos y procesos.
+    """
+
+    def __init__(self, ruta=RUTA_POR_DEFECTO):
+        self.ruta = ruta
+        with self._conexion() as con:
+            con.executescript(_ESQUEMA)
+
+    def _conexion(self):
+        con = sqlite3.connect(self.ruta, timeout=30, isolation_level=None)
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("PRAGMA busy_timeout=30000")
+        return _Cerrar(con)
+
+    # ---------------- Lado de la UI / clientes ----------------
+
+    def enviar(self, tipo, max_intentos=MAX_INTENTOS, nuevo=False, **parametros):
+        """
+        Encola 'tipo' con sus parámetros y regresa el id. Si ya hay un
+        trabajo igual pendiente, corriendo o terminado, regresa ese
+        (salvo con nuevo=True). Para los tipos de ARCHIVOS_DE_ENTRADA,
+        "igual" incluye que el archivo no haya cambiado.
+        """
+        if tipo not in TIPOS:
+            raise ValueError(f"Tipo de trabajo desconocido: {tipo}")
+        clave = clave_trabajo(tipo, **parametros)
+        ahora = time.time()
+        with self._conexion() as con:
+            con.execute("BEGIN IMMEDIATE")
+            if not nuevo:
+                fila = con.execute(
+                    f"SELECT id FROM trabajos WHERE clave = ? AND estado IN {REUTILIZABLES} "
+                    "ORDER BY id DESC LIMIT 1", (clave,)
+                ).fetchone()
+                if fila is not None:
+                    con.execute("COMMIT")
+                    return fila[0]
+            id_trabajo = con.execute(
+                "INSERT INTO trabajos (tipo, clave, parametros, max_intentos, creado, actualizado) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (tipo, clave, pickle.dumps(parametros), max_intentos, ahora, ahora)
+            ).lastrowid
+            con.execute("COMMIT")
+        return id_trabajo
+
+    def estado(self, id_trabajo):
+        """
+        Dict con estado, intentos, progreso, mensaje y error (sin blobs),
+        o None si el id no existe.
+        """
+        with self._conexion() as con:
+            fila = con.execute(
+                f"SELECT {', '.join(_COLUMNAS_ESTADO)} FROM trabajos WHERE id = ?", (id_trabajo,)
+            ).fetchone()
+        return None if fila is None else dict(zip(_COLUMNAS_ESTADO, fila))
+
+    def listar(self, limite=50):
+        with self._conexion() as con:
+            filas = con.execute(
+                f"SELECT {', '.join(_COLUMNAS_ESTADO)} FROM trabajos ORDER BY id DESC LIMIT ?", (limite,)
+            ).fetchall()
+        return [dict(zip(_COLUMNAS_ESTADO, fila)) for fila in filas]
+
+    def resultado(self, id_trabajo):
+        """
+        Resultado de un trabajo terminado. Lanza TrabajoFallido o
+        TrabajoCancelado según el estado, y ValueError si aún no termina.
+        """
+        with self._conexion() as con:
+            fila = con.execute(
+                "SELECT estado, resultado, error FROM trabajos WHERE id = ?", (id_trabajo,)
+            ).fetchone()
+        if fila is None:
+            raise KeyError(id_trabajo)
+        estado, blob, error = fila
+        if estado == "terminado":
+            return pickle.loads(blob)
+        if estado == "fallido":
+            raise TrabajoFallido(error)
+        if estado == "cancelado":
+            raise TrabajoCancelado()
+        raise ValueError(f"El trabajo {id_trabajo} sigue {estado}")
+
+    def cancelar(self, id_trabajo):
+        """
+        Cancela un trabajo pendiente o en curso (el trabajador lo nota en
+        su siguiente avance).
+        """
+        with self._conexion() as con:
+            con.execute(
+                f"UPDATE trabajos SET estado = 'cancelado', actualizado = ? "
+                f"WHERE id = ? AND estado IN {ACTIVOS}", (time.time(), id_trabajo)
+            )
+
+    def trabajadores_vivos(self):
+        with self._conexion() as con:
+            return con.execute(
+                "SELECT COUNT(*) FROM trabajadores WHERE latido > ?", (time.time() - LATIDO_VENCIDO,)
+            ).fetchone()[0]
+
+    # ---------------- Lado del trabajador ----------------
+
+    def tomar(self, trabajador):
+        """
+        Reclama el trabajo pendiente más viejo. Antes regresa a la cola
+        (o da por fallidos) los trabajos de trabajadores sin latido.
+        Regresa (id, tipo, parametros) o None.
+        """
+        ahora = time.time()
+        with self._conexion() as con:
+            con.execute("BEGIN IMMEDIATE")
+            con.execute(
+                "UPDATE trabajos SET "
+                "estado = CASE WHEN intentos >= max_intentos THEN 'fallido' ELSE 'pendiente' END, "
+                "error = 'El trabajador dejó de responder', trabajador = NULL, actualizado = ? "
+                "WHERE estado = 'corriendo' AND latido < ?", (ahora, ahora - LATIDO_VENCIDO)
+            )
+            fila = con.execute(
+                "SELECT id, tipo, parametros FROM trabajos WHERE estado = 'pendiente' ORDER BY id LIMIT 1"
+            ).fetchone()
+            if fila is not None:
+                con.execute(
+                    "UPDATE trabajos SET estado = 'corriendo', intentos = intentos + 1, trabajador = ?, "
+                    "latido = ?, progreso = 0, mensaje = '', actualizado = ? WHERE id = ?",
+                    (trabajador, ahora, ahora, fila[0])
+                )
+            con.execute("COMMIT")
+        if fila is None:
+            return None
+        return fila[0], fila[1], pickle.loads(fila[2])
+
+    def latir(self, trabajador, id_trabajo=None):
+        ahora = time.time()
+        with self._conexion() as con:
+            con.execute("INSERT OR REPLACE INTO trabajadores (nombre, pid, latido) VALUES (?, ?, ?)",
+                        (trabajador, os.getpid(), ahora))
+            if id_trabajo is not None:
+                con.execute("UPDATE trabajos SET latido = ? WHERE id = ? AND trabajador = ?",
+                            (ahora, id_trabajo, trabajador))
+
+    def reportar_avance(self, id_trabajo, trabajador, fraccion, mensaje):
+        """
+        Guarda el progreso. Regresa False si el trabajo ya no es de este
+        trabajador (cancelado o reasignado).
+        """
+        with self._conexion() as con:
+            cambios = con.execute(
+                "UPDATE trabajos SET progreso = ?, mensaje = ?, latido = ?, actualizado = ? "
+                "WHERE id = ? AND trabajador = ? AND estado = 'corriendo'",
+                (min(max(float(fraccion), 0.0), 1.0), mensaje, time.time(), time.time(),
+                 id_trabajo, trabajador)
+            ).rowcount
+        return cambios == 1
+
+    def terminar(self, id_trabajo, trabajador, resultado):
+        with self._conexion() as con:
+            con.execute(
+                "UPDATE trabajos SET estado = 'terminado', resultado = ?, progreso = 1, error = NULL, "
+                "actualizado = ? WHERE id = ? AND trabajador = ? AND estado = 'corriendo'",
+                (pickle.dumps(resultado), time.time(), id_trabajo, trabajador)
+            )
+
+    def fallar(self, id_trabajo, trabajador, error):
+        """
+        Registra el error: el trabajo vuelve a la cola si le quedan
+        intentos, si no queda como fallido.
+        """
+        with self._conexion() as con:
+            con.execute(
+                "UPDATE trabajos SET "
+                "estado = CASE WHEN intentos >= max_intentos THEN 'fallido' ELSE 'pendiente' END, "
+                "error = ?, trabajador = NULL, actualizado = ? "
+                "WHERE id = ? AND trabajador = ? AND estado = 'corriendo'",
+                (error, time.time(), id_trabajo, trabajador)
+            )
+
+
+class _Cerrar:
+    """
+    'with' que cierra la conexión al salir (sqlite3 solo hace commit/rollback).
+    """
+
+    def __init__(self, con):
+        self.con = con
+
+    def __enter__(self):
+        return self.con
+
+    def __exit__(self, *_exc):
+        self.con.close()
+
+
+def _funcion_de(tipo):
+    modulo, nombre = TIPOS[tipo].split(":")
+    return getattr(importlib.import_module(modulo), nombre)
+
+
+def trabajar(ruta=RUTA_POR_DEFECTO, ocioso=None, intervalo=1.0):
+    """
+    Bucle de un trabajador: toma trabajos y los corre uno por uno.
+    Con 'ocioso' (segundos) termina si pasa ese tiempo sin trabajo.
+    """
+    cola = ColaTrabajos(ruta)
+    nombre = f"{socket.gethostname()}:{os.getpid()}"
+    actual = {"id": None}
+    vivo = threading.Event()
+
+    def latido():
+        while not vivo.wait(LATIDO):
+            cola.latir(nombre, actual["id"])
+
+    cola.latir(nombre)
+    threading.Thread(target=latido, name="latido", daemon=True).start()
+
+    ultimo_trabajo = time.monotonic()
+    try:
+        while True:
+            tomado = cola.tomar(nombre)
+            if tomado is None:
+                if ocioso is not None and time.monotonic() - ultimo_trabajo > ocioso:
+                    return
+                time.sleep(intervalo)
+                continue
+
+            id_trabajo, tipo, parametros = tomado
+            actual["id"] = id_trabajo
+            ultimo_reporte = [0.0]
+
+            def avance(fraccion, mensaje=""):
+                # Como mucho dos escrituras por segundo; cada una revisa si lo cancelaron
+                if time.monotonic() - ultimo_reporte[0] < 0.5:
+                    return
+                ultimo_reporte[0] = time.monotonic()
+                if not cola.reportar_avance(id_trabajo, nombre, fraccion, mensaje):
+                    raise TrabajoCancelado()
+
+            try:
+                resultado = _funcion_de(tipo)(**parametros, avance=avance)
+                cola.terminar(id_trabajo, nombre, resultado)
+            except TrabajoCancelado:
+                pass
+            except Exception:
+                cola.fallar(id_trabajo, nombre, traceback.format_exc())
+            actual["id"] = None
+            ultimo_trabajo = time.monotonic()
+    finally:
+        vivo.set()
+
+
+def asegurar_trabajador(cola, ocioso=600):
+    """
+    Si ningún trabajador ha dado señales de vida, arranca uno en un
+    proceso independiente (sobrevive a la sesión de Streamlit y termina
+    solo tras 'ocioso' segundos sin trabajo).
+    """
+    if cola.trabajadores_vivos():
+        return
+    subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--ruta", os.path.abspath(cola.ruta),
+         "trabajador", "--ocioso", str(ocioso)],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        start_new_session=True
+    )
+    # Se registra ya, para que otros reruns no arranquen otro mientras carga
+    cola.latir(f"arrancando:{os.getpid()}")
+
+
+def esperar_en_cola(cola, id_trabajo, texto="Calculando…", intervalo=0.5):
+    """
+    Igual que ejecutor.esperar_en_streamlit, pero para un trabajo de la
+    cola: barra de progreso hasta que termine y regresa su resultado
+    (o lanza TrabajoFallido / TrabajoCancelado).
+
+    Si el usuario recarga o mueve otro widget, la espera se interrumpe
+    pero el trabajo sigue en su trabajador.
+    """
+    import streamlit as st
+
+    estado = cola.estado(id_trabajo)
+    if estado["estado"] in ACTIVOS:
+        barra = st.progress(0.0, text=texto)
+        while estado["estado"] in ACTIVOS:
+            if estado["estado"] == "pendiente":
+                detalle = " (en cola)" if estado["intentos"] == 0 else " (reintentando)"
+            else:
+                detalle = f" {estado['mensaje']}" if estado["mensaje"] else ""
+            barra.progress(estado["progreso"], text=f"{texto}{detalle}")
+            time.sleep(intervalo)
+            estado = cola.estado(id_trabajo)
+        barra.empty()
+    return cola.resultado(id_trabajo)
+
+
+def _valor(texto):
+    try:
+        return json.loads(texto)
+    except ValueError:
+        return texto
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cola de trabajos del simulador PPR.")
+    parser.add_argument("--ruta", default=RUTA_POR_DEFECTO, help=f"Base SQLite (default: {RUTA_POR_DEFECTO})")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p_trab = sub.add_parser("trabajador", help="Corre trabajos de la cola")
+    p_trab.add_argument("--procesos", type=int, default=1, help="Trabajadores en paralelo")
+    p_trab.add_argument("--ocioso", type=float, default=None, help="Termina tras N segundos sin trabajo")
+
+    p_env = sub.add_parser("enviar", help="Encola un trabajo")
+    p_env.add_argument("tipo", choices=sorted(TIPOS))
+    p_env.add_argument("parametros", nargs="*", help="nombre=valor (el valor se lee como JSON si se puede)")
+
+    p_est = sub.add_parser("estado", help="Lista los trabajos recientes")
+    p_est.add_argument("id", nargs="?", type=int)
+
+    args = parser.parse_args(argv)
+
+    if args.comando == "trabajador":
+        if args.procesos == 1:
+            trabajar(args.ruta, args.ocioso)
+            return 0
+        import multiprocessing
+
+        procesos = [multiprocessing.Process(target=trabajar, args=(args.ruta, args.ocioso))
+                    for _ in range(args.procesos)]
+        for p in procesos:
+            p.start()
+        for p in procesos:
+            p.join()
+        return 0
+
+    cola = ColaTrabajos(args.ruta)
+    if args.comando == "enviar":
+        parametros = dict(par.split("=", 1) for par in args.parametros)
+        print(cola.enviar(args.tipo, **{k: _valor(v) for k, v in parametros.items()}))
+        return 0
+
+    trabajos = [cola.estado(args.id)] if args.id is not None else cola.listar()
+    for t in trabajos:
+        if t is None:
+            print("No existe ese trabajo", file=sys.stderr)
+            return 1
+        print(f"{t['id']:>5}  {t['tipo']:<15} {t['estado']:<10} {t['progreso']:6.1%}  "
+              f"intentos {t['intentos']}/{t['max_intentos']}  {t['mensaje']}")
+        if t["error"] and args.id is not None:
+            print(t["error"])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+import time
+
+from cache import copia, clave_canonica
+
+# ================================================================
+#   🕸️ Pipeline como grafo de etapas (DAG)
+# ================================================================
+#
+# Cada etapa declara su nombre, su función y sus entradas (nombres de
+# datos de entrada o de otras etapas). Al ejecutar:
+# - Solo se recalculan las etapas río abajo de una entrada que cambió;
+#   las demás conservan el valor de la corrida anterior.
+# - Las etapas sucias corren una tras otra en orden topológico. Son
+#   ciclos de Python puro (tablas.py) que no sueltan el GIL, así que un
+#   pool de hilos no las aceleraría.
+# - Se guarda el tiempo de cada etapa para el reporte.
+
+
+class Etapa:
+    """
+    Nodo del grafo: funcion(*[valor de cada entrada]).
+    """
+
+    def __init__(self, nombre, funcion, entradas):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.entradas = tuple(entradas)
+
+
+class Pipeline:
+    """
+    Grafo de etapas con recálculo incremental (en orden topológico).
+
+    Uso:
+        pipeline = Pipeline([Etapa("a", f, ["x"]), Etapa("b", g, ["a", "y"])])
+        resultados = pipeline.ejecutar({"x": 1, "y": 2})
+        pipeline.reporte()   # tiempos por etapa
+    """
+
+    def __init__(self, etapas):
+        self.etapas = {e.nombre: e for e in etapas}
+        self._orden = self._orden_topologico()
+        self._firmas = {}      # firma de cada entrada de la corrida anterior
+        self._valores = {}     # valor de cada etapa de la corrida anterior
+        self._tiempos = {}
+
+    def _orden_topologico(self):
+        orden, visitando, listo = [], set(), set()
+
+        def visitar(nombre):
+            if nombre in listo or nombre not in self.etapas:
+                return
+            if nombre in visitando:
+                raise ValueError(f"Ciclo en el pipeline en la etapa '{nombre}'")
+            visitando.add(nombre)
+            for entrada in self.etapas[nombre].entradas:
+                visitar(entrada)
+            visitando.discard(nombre)
+            listo.add(nombre)
+            orden.append(nombre)
+
+        for nombre in self.etapas:
+            visitar(nombre)
+        return orden
+
+    def ejecutar(self, entradas):
+        """
+        Corre el grafo con las 'entradas' dadas (dict) y regresa un dict
+        con el valor de cada etapa.
+        """
+        faltantes = {
+            e for etapa in self.etapas.values() for e in etapa.entradas
+            if e not in self.etapas and e not in entradas
+        }
+        if faltantes:
+            raise KeyError(f"Faltan entradas del pipeline: {sorted(faltantes)}")
+
+        # 1) Entradas que cambiaron respecto a la corrida anterior
+        firmas = {nombre: clave_canonica(valor) for nombre, valor in entradas.items()}
+        cambiadas = {n for n, f in firmas.items() if self._firmas.get(n) != f}
+        self._firmas = firmas
+
+        # 2) Etapas sucias: las que dependen (directa o indirectamente) de un cambio
+        sucias = set()
+        for nombre in self._orden:
+            etapa = self.etapas[nombre]
+            if (nombre not in self._valores
+                    or any(e in cambiadas or e in sucias for e in etapa.entradas)):
+                sucias.add(nombre)
+
+        self._tiempos = {n: (0.0, False) for n in self._orden if n not in sucias}
+
+        # 3) Ejecutar las sucias en orden topológico
+        valores = dict(entradas)
+        valores.update({n: v for n, v in self._valores.items() if n not in sucias})
+
+        try:
+            for nombre in self._orden:
+                if nombre not in sucias:
+                    continue
+                etapa = self.etapas[nombre]
+                args = [valores[e] for e in etapa.entradas]
+                valores[nombre], segundos = self._cronometrar(etapa, args)
+                self._tiempos[nombre] = (segundos, True)
+        except Exception:
+            # Sin firmas, la siguiente corrida recalcula todo
+            self._firmas = {}
+            raise
+
+        self._valores = {n: valores[n] for n in self._orden}
+        # Copia: quien llama puede modificar sin dañar la siguiente corrida
+        return {n: copia(v) for n, v in self._valores.items()}
+
+    @staticmethod
+    def _cronometrar(etapa, args):
+        inicio = time.perf_counter()
+        valor = etapa.funcion(*args)
+        return valor, time.perf_counter() - inicio
+
+    def reporte(self):
+        """
+        Tiempos de la última corrida, en orden topológico:
+        lista de dicts {"Etapa", "Segundos", "Recalculada"}.
+        """
+        return [
+            {"Etapa": n, "Segundos": self._tiempos[n][0], "Recalculada": self._tiempos[n][1]}
+            for n in self._orden if n in self._tiempos
+        ]
@@ -0,0 +1,131 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import clave_canonica
+
+# ================================================================
+#   ⚙️ Trabajos en segundo plano con progreso y cancelación
+# ================================================================
+#
+# Los cálculos largos (búsquedas de retiro, Monte Carlo, barrido de
+# edades) corren en un pool de hilos compartido por todo el proceso, no
+# en el hilo del script de Streamlit.
+#
+# - La función del trabajo recibe 'avance(fraccion, mensaje)' y lo llama
+#   de vez en cuando; si el trabajo fue cancelado, 'avance' lanza
+#   TrabajoCancelado y el cálculo se detiene ahí.
+# - Cada sesión tiene un Despachador: un trabajo por nombre. Si los
+#   insumos cambian (otra llave canónica) el trabajo viejo se cancela y se
+#   reemplaza; si son los mismos, se reutiliza el que ya está corriendo.
+#   Así los cambios rápidos de un slider no se acumulan como CPU perdida.
+
+_POOL = ThreadPoolExecutor(max_workers=max(2, (os.cpu_count() or 2)), thread_name_prefix="trabajo")
+
+
+class TrabajoCancelado(Exception):
+    """
+    Se lanza dentro del trabajo cuando alguien lo canceló.
+    """
+
+
+class Trabajo:
+    """
+    Un cálculo enviado al pool, con su progreso (0–1) y un mensaje.
+    """
+
+    def __init__(self, clave, funcion, args, kwargs):
+        self.clave = clave
+        self.progreso = 0.0
+        self.mensaje = ""
+        self._cancelado = threading.Event()
+        self._futuro = _POOL.submit(funcion, *args, avance=self._avance, **kwargs)
+
+    def _avance(self, fraccion, mensaje=""):
+        if self._cancelado.is_set():
+            raise TrabajoCancelado()
+        self.progreso = min(max(float(fraccion), 0.0), 1.0)
+        self.mensaje = mensaje
+
+    def cancelar(self):
+        self._cancelado.set()
+        self._futuro.cancel()
+
+    @property
+    def cancelado(self):
+        return self._cancelado.is_set()
+
+    def listo(self):
+        return self._futuro.done()
+
+    def resultado(self, timeout=None):
+        """
+        Espera y regresa el resultado (o vuelve a lanzar el error del trabajo).
+        """
+        return self._futuro.result(timeout)
+
+
+class Despachador:
+    """
+    Trabajos de una sesión, uno por nombre.
+    """
+
+    def __init__(self):
+        self._trabajos = {}
+        self._lock = threading.Lock()
+
+    def enviar(self, nombre, funcion, *args, **kwargs):
+        """
+        Lanza 'funcion(*args, avance=..., **kwargs)' en segundo plano y
+        regresa su Trabajo. Si ya hay uno con el mismo nombre e insumos se
+        reutiliza; si los insumos cambiaron, el anterior se cancela.
+        """
+        clave = clave_canonica(*args, **kwargs)
+        with self._lock:
+            actual = self._trabajos.get(nombre)
+            if actual is not None and actual.clave == clave and not actual.cancelado:
+                return actual
+            if actual is not None:
+                actual.cancelar()
+            trabajo = Trabajo(clave, funcion, args, kwargs)
+            self._trabajos[nombre] = trabajo
+            return trabajo
+
+    def cancelar(self, nombre):
+        with self._lock:
+            trabajo = self._trabajos.pop(nombre, None)
+        if trabajo is not None:
+            trabajo.cancelar()
+
+
+def despachador_de_sesion():
+    """
+    Despachador guardado en st.session_state (uno por sesión de Streamlit).
+    """
+    import streamlit as st
+
+    if "despachador" not in st.session_state:
+        st.session_state["despachador"] = Despachador()
+    return st.session_state["despachador"]
+
+
+def esperar_en_streamlit(trabajo, texto="Calculando…", intervalo=0.1):
+    """
+    Dibuja una barra de progreso hasta que el trabajo termine y regresa
+    su resultado.
+
+    Si el usuario mueve otro widget, Streamlit interrumpe esta espera en
+    la siguiente actualización de la barra; el trabajo sigue vivo y el
+    siguiente rerun lo reutiliza o lo reemplaza.
+    """
+    import streamlit as st
+
+    if not trabajo.listo():
+        barra = st.progress(0.0, text=texto)
+        while not trabajo.listo():
+            detalle = f" {trabajo.mensaje}" if trabajo.mensaje else ""
+            barra.progress(trabajo.progreso, text=f"{texto}{detalle}")
+            time.sleep(intervalo)
+        barra.empty()
+    return trabajo.resultado()
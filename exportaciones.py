@@ -0,0 +1,100 @@
+from cache import cache_etapa, clave_canonica
+from nucleo_simulacion import export_df_to_csv, export_df_to_excel, export_excel_completo
+
+# ================================================================
+#   📤 Exportaciones bajo demanda
+# ================================================================
+#
+# Antes, cada rerun de la pestaña de exportación serializaba todos los
+# CSV y los Excel (xlsxwriter) solo para llenar los botones de descarga.
+# Ahora cada archivo se genera cuando el usuario lo pide:
+# - El clic en "Preparar" guarda la huella de los datos pedidos y lanza la
+#   serialización en el pool de ejecutor.py, fuera del hilo del script.
+# - El script no espera: mientras el archivo se genera, un fragmento
+#   (st.fragment con run_every) revisa el trabajo y, al terminar, vuelve a
+#   correr la página para cambiar el aviso por el botón de descarga.
+# - Si los datos cambian, la huella ya no coincide y el botón regresa a
+#   "Preparar": nada se vuelve a serializar sin que el usuario lo pida.
+# - Los bytes se guardan por huella de los datos (cache.py): volver a
+#   pedir los mismos datos da el botón de descarga al instante.
+
+INTERVALO_SONDEO = 0.5   # segundos entre revisiones del trabajo pendiente
+
+MIMES = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "excel_completo": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+_GENERADORES = {
+    "csv": export_df_to_csv,
+    "xlsx": export_df_to_excel,
+    "excel_completo": export_excel_completo,
+}
+
+
+@cache_etapa(max_entradas=32)
+def generar_archivo(tipo, avance=None, **datos):
+    """
+    Bytes del archivo 'tipo' ("csv", "xlsx" o "excel_completo") con los
+    datos dados (df=... o las tablas de export_excel_completo).
+    """
+    if avance is not None:
+        avance(0.0, "serializando")
+    return _GENERADORES[tipo](**datos)
+
+
+def boton_descarga(etiqueta, archivo, tipo, clave, contenedor=None, **datos):
+    """
+    Botón "Preparar" que, al pulsarse, genera el archivo en segundo plano
+    y lo cambia por el botón de descarga. Lo pedido es la huella de los
+    datos: si cambian, el botón vuelve a "Preparar".
+    """
+    import streamlit as st
+    from ejecutor import despachador_de_sesion
+
+    destino = contenedor if contenedor is not None else st
+    pedido = f"exportar_{clave}"
+    huella = clave_canonica(tipo, **datos)
+
+    if st.session_state.get(pedido) != huella:
+        if pedido in st.session_state:
+            # Pedido con datos viejos: ya no se quiere
+            despachador_de_sesion().cancelar(pedido)
+            del st.session_state[pedido]
+        if not destino.button(f"⚙️ Preparar: {etiqueta}", key=f"{pedido}_preparar"):
+            return
+        st.session_state[pedido] = huella
+
+    trabajo = despachador_de_sesion().enviar(pedido, generar_archivo, tipo, **datos)
+
+    if not trabajo.listo():
+        sondeo = st.fragment(run_every=INTERVALO_SONDEO)(_esperar_archivo)
+        if contenedor is not None:
+            with contenedor:
+                sondeo(trabajo, archivo)
+        else:
+            sondeo(trabajo, archivo)
+        return
+
+    destino.download_button(
+        etiqueta,
+        trabajo.resultado(),
+        file_name=archivo,
+        mime=MIMES[tipo],
+        on_click="ignore",
+        key=f"{pedido}_descargar"
+    )
+
+
+def _esperar_archivo(trabajo, archivo):
+    """
+    Cuerpo del fragmento que sondea un archivo pendiente. Al terminar el
+    trabajo vuelve a correr la página, que ya dibuja el botón de descarga.
+    """
+    import streamlit as st
+
+    if trabajo.listo():
+        st.rerun()
+    detalle = f" {trabajo.mensaje}" if trabajo.mensaje else ""
+    st.progress(trabajo.progreso, text=f"Generando {archivo}…{detalle}")
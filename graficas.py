@@ -0,0 +1,312 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from cache import CacheEtapas, clave_canonica
+
+# ================================================================
+#   📉 Gráficas de series largas (reducción de puntos + WebGL)
+# ================================================================
+#
+# Una gráfica no puede mostrar más puntos que píxeles: con horizontes de
+# 60 años, bandas de percentiles y varias curvas, mandar cada mes al
+# navegador solo agranda el payload y hace lento el SVG.
+#
+# - Cada serie se reduce a un presupuesto de puntos con LTTB (conserva la
+#   forma visual) o con mínimo/máximo por cubeta (conserva los extremos).
+# - Si la figura todavía dibuja muchos puntos, se usa Scattergl (WebGL).
+# - La serie exacta se conserva en la Grafica: grafica.datos() regresa
+#   todos los meses para exportar.
+#
+# Las figuras terminadas se guardan por huella de sus datos y opciones:
+# si las series no cambiaron, el rerun reutiliza la misma go.Figure (sin
+# reducir, validar ni armar trazos otra vez) y Streamlit solo la
+# serializa. Las figuras del caché se comparten entre sesiones: no se
+# deben modificar después de pedirlas.
+
+PRESUPUESTO_PUNTOS = 600   # ≈ ancho en píxeles de una gráfica en columna
+UMBRAL_WEBGL = 2000        # puntos dibujados a partir de los cuales se usa Scattergl
+
+_FIGURAS = CacheEtapas(max_entradas=64, ttl=600)
+
+
+def lttb(x, y, n_puntos):
+    """
+    Largest-Triangle-Three-Buckets: índices de los 'n_puntos' que mejor
+    conservan la forma de la curva (incluye el primero y el último).
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n_puntos >= n or n_puntos < 3:
+        return np.arange(n)
+
+    # n_puntos - 2 cubetas entre el primer y el último punto
+    bordes = np.linspace(1, n - 1, n_puntos - 1).astype(int)
+    indices = np.empty(n_puntos, dtype=int)
+    indices[0], indices[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_puntos - 2):
+        ini, fin = bordes[i], bordes[i + 1]
+        sig_fin = bordes[i + 2] if i + 2 < len(bordes) else n
+
+        # Vértice C: promedio de la cubeta siguiente
+        x_c = x[fin:sig_fin].mean()
+        y_c = y[fin:sig_fin].mean()
+
+        # Punto de la cubeta que forma el triángulo más grande con A y C
+        area = np.abs((x[a] - x_c) * (y[ini:fin] - y[a]) - (x[a] - x[ini:fin]) * (y_c - y[a]))
+        a = ini + int(np.argmax(area))
+        indices[i + 1] = a
+
+    return indices
+
+
+def minmax(y, n_puntos):
+    """
+    Índices del mínimo y el máximo de cada cubeta (n_puntos / 2 cubetas),
+    más el primero y el último. Conserva picos y valles exactos.
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n_puntos >= n or n_puntos < 4:
+        return np.arange(n)
+
+    bordes = np.linspace(0, n, n_puntos // 2 + 1).astype(int)
+    indices = [0, n - 1]
+    for ini, fin in zip(bordes[:-1], bordes[1:]):
+        if fin > ini:
+            indices += [ini + int(np.argmin(y[ini:fin])), ini + int(np.argmax(y[ini:fin]))]
+    return np.unique(indices)
+
+
+class Grafica:
+    """
+    Figura de líneas con reducción de puntos y datos exactos para exportar.
+
+    Uso:
+        g = Grafica()
+        g.linea(meses, saldo, "Saldo", line=dict(color="red"))
+        fig = g.figura(title="...", height=380)
+        g.datos()   # DataFrame con todos los meses
+    """
+
+    def __init__(self, eje_x="Mes", presupuesto=PRESUPUESTO_PUNTOS, umbral_webgl=UMBRAL_WEBGL,
+                 metodo="lttb"):
+        if metodo not in ("lttb", "minmax"):
+            raise ValueError(f"Método de reducción desconocido: {metodo}")
+        self.eje_x = eje_x
+        self.presupuesto = presupuesto
+        self.umbral_webgl = umbral_webgl
+        self.metodo = metodo
+        self._trazos = []     # ("linea" | "banda", x, ys, estilo) exactos, en orden de dibujo
+        self._exactos = {}    # columna → (x, y) completos
+
+    def _reducir(self, x, y):
+        if self.presupuesto is None:
+            return np.arange(len(y))
+        if self.metodo == "minmax":
+            return minmax(y, self.presupuesto)
+        return lttb(x, y, self.presupuesto)
+
+    def linea(self, x, y, name, **estilo):
+        """
+        Agrega una curva. 'estilo' se pasa tal cual a go.Scatter.
+        """
+        x, y = np.asarray(x), np.asarray(y, dtype=float)
+        self._exactos[name] = (x, y)
+        self._trazos.append(("linea", x, (y,), dict(name=name, **estilo)))
+        return self
+
+    def banda(self, x, inferior, superior, name, nombres=("Inferior", "Superior"),
+              fillcolor="rgba(128,0,128,0.2)"):
+        """
+        Área sombreada entre dos curvas (p. ej. P5–P95). Ambas se reducen
+        con los mismos meses para que el relleno no se cruce.
+        'nombres' son las columnas de las dos curvas en datos().
+        """
+        x = np.asarray(x)
+        inferior = np.asarray(inferior, dtype=float)
+        superior = np.asarray(superior, dtype=float)
+        self._exactos[nombres[0]] = (x, inferior)
+        self._exactos[nombres[1]] = (x, superior)
+        self._trazos.append(("banda", x, (inferior, superior), dict(
+            name=name, nombres=list(nombres), fillcolor=fillcolor
+        )))
+        return self
+
+    def huella(self):
+        """
+        Hash canónico de las series exactas, estilos y opciones de reducción.
+        """
+        return clave_canonica(
+            self.eje_x, self.presupuesto, self.umbral_webgl, self.metodo,
+            [[tipo, x, list(ys), estilo] for tipo, x, ys, estilo in self._trazos]
+        )
+
+    def _trazos_reducidos(self):
+        transparente = dict(color="rgba(0,0,0,0)")
+        for tipo, x, ys, estilo in self._trazos:
+            if tipo == "linea":
+                (y,) = ys
+                indices = self._reducir(x, y)
+                yield x[indices], y[indices], estilo
+            else:
+                inferior, superior = ys
+                indices = np.union1d(self._reducir(x, inferior), self._reducir(x, superior))
+                yield x[indices], superior[indices], dict(name=estilo["nombres"][1], line=transparente)
+                yield x[indices], inferior[indices], dict(
+                    name=estilo["name"], fill="tonexty", fillcolor=estilo["fillcolor"], line=transparente
+                )
+
+    def trazos(self):
+        """
+        Curvas reducidas como dicts de plotly ("scatter", o "scattergl" si
+        los puntos dibujados superan el umbral), sin pasar por go.Figure.
+        """
+        reducidos = list(self._trazos_reducidos())
+        puntos = sum(len(x) for x, _y, _estilo in reducidos)
+        tipo = "scattergl" if puntos > self.umbral_webgl else "scatter"
+        return [dict(type=tipo, x=x, y=y, **estilo) for x, y, estilo in reducidos]
+
+    def figura(self, **layout):
+        """
+        go.Figure con las curvas reducidas (trazos()). Se reutiliza del
+        caché si la huella y el layout no cambiaron.
+        """
+        clave = clave_canonica(self.huella(), layout)
+        encontrado, fig = _FIGURAS.obtener(clave)
+        if encontrado:
+            return fig
+
+        fig = go.Figure(self.trazos())
+        fig.update_layout(**layout)
+        _FIGURAS.guardar(clave, fig)
+        return fig
+
+    def datos(self):
+        """
+        DataFrame con las series exactas (sin reducir), una columna por curva.
+        """
+        df = pd.DataFrame({
+            nombre: pd.Series(y, index=x) for nombre, (x, y) in self._exactos.items()
+        })
+        df.index.name = self.eje_x
+        return df.reset_index()
+
+
+def _huella_codigo(code):
+    """
+    Hash del bytecode, constantes y nombres de una función (y de las
+    funciones anidadas, p. ej. comprensiones), estable entre reruns.
+    """
+    h = hashlib.sha256(code.co_code + repr(code.co_names).encode())
+    for constante in code.co_consts:
+        if hasattr(constante, "co_code"):
+            h.update(_huella_codigo(constante).encode())
+        else:
+            h.update(repr(constante).encode())
+    return h.hexdigest()
+
+
+def figura_cacheada(constructor, **insumos):
+    """
+    constructor(**insumos) guardado por huella de los insumos, para
+    figuras que no son series (barras, comparaciones finales).
+
+    La llave usa el nombre y el código del constructor, así que sirve
+    aunque la función se vuelva a definir en cada rerun del script; el
+    constructor debe depender solo de 'insumos'.
+    """
+    clave = clave_canonica(constructor.__module__, constructor.__qualname__,
+                           _huella_codigo(constructor.__code__), **insumos)
+    encontrado, fig = _FIGURAS.obtener(clave)
+    if not encontrado:
+        fig = constructor(**insumos)
+        _FIGURAS.guardar(clave, fig)
+    return fig
+
+
+def grafica_acumulacion(meses, colchon, etf_ideal, allianz_sin_sat, allianz_con_sat):
+    """
+    Gráfica 1 de la pestaña de acumulación (allianz.py y reportes.py):
+    colchón vs ETF ideal vs Allianz real sin SAT y con SAT reinvertido.
+    """
+    grafica = Grafica()
+    grafica.linea(meses, colchon, "Colchón", line=dict(color="gray", dash="dash"))
+    grafica.linea(meses, etf_ideal, "ETF ideal", line=dict(color="green"))
+    grafica.linea(meses, allianz_sin_sat, "Allianz Real (sin SAT)", line=dict(color="red", width=3))
+    grafica.linea(meses, allianz_con_sat, "Allianz + SAT reinvertido",
+                  line=dict(color="orange", width=3, dash="dot"))
+    return grafica
+
+
+LAYOUT_ACUMULACION = dict(
+    title="Comparación: Colchón vs ETF ideal vs Allianz Real (+SAT)",
+    xaxis_title="Mes",
+    yaxis_title="Saldo",
+    height=480
+)
+
+
+LAYOUT_COMPARACION = dict(
+    barmode="stack",
+    title="Allianz vs SAT vs Faltante/Excedente frente a ETF Neto",
+    yaxis_title="Pesos"
+)
+
+
+def trazos_comparacion(sin_sat, sat_reinvertido, faltante, excedente):
+    """
+    Gráfica 2 de la pestaña de acumulación como dicts de plotly: barra
+    apilada de Allianz sin SAT, SAT reinvertido y el faltante/excedente
+    frente al ETF neto.
+    """
+    barra = dict(type="bar", x=["Comparación Final"])
+    trazos = [
+        dict(barra, name="Allianz sin SAT", y=[sin_sat], marker=dict(color="blue")),
+        dict(barra, name="SAT reinvertido", y=[sat_reinvertido], marker=dict(color="gray")),
+    ]
+    if faltante > 0:
+        trazos.append(dict(barra, name="Faltante vs ETF Neto", y=[faltante], marker=dict(color="red")))
+    else:
+        trazos.append(dict(barra, name="Excedente sobre ETF Neto", y=[excedente], marker=dict(color="green")))
+    return trazos
+
+
+def figura_comparacion(sin_sat, sat_reinvertido, faltante, excedente):
+    """
+    go.Figure de trazos_comparacion con LAYOUT_COMPARACION.
+    """
+    fig = go.Figure(trazos_comparacion(sin_sat, sat_reinvertido, faltante, excedente))
+    fig.update_layout(**LAYOUT_COMPARACION)
+    return fig
+
+
+def mostrar_grafica(grafica, figura, archivo, contenedor=None):
+    """
+    Dibuja la figura en Streamlit con un botón para descargar los datos
+    exactos (CSV) de la Grafica.
+    """
+    import streamlit as st
+
+    destino = contenedor if contenedor is not None else st
+    destino.plotly_chart(figura, use_container_width=True)
+
+    clave = clave_canonica("csv", grafica.huella())
+    encontrado, csv = _FIGURAS.obtener(clave)
+    if not encontrado:
+        csv = grafica.datos().to_csv(index=False).encode("utf-8")
+        _FIGURAS.guardar(clave, csv)
+
+    destino.download_button(
+        "⬇️ Datos exactos (CSV)",
+        csv,
+        file_name=archivo,
+        mime="text/csv",
+        on_click="ignore",
+        key=f"datos_{archivo}"
+    )
@@ -0,0 +1,103 @@
+from functools import lru_cache
+
+import numpy as np
+
+# ================================================================
+#   📏 Kernel lineal del saldo comprometido
+# ================================================================
+#
+# Sin el redondeo del Excel, cada mes del saldo comprometido es
+#
+#     saldo_m = k * (saldo_{m-1} + aporte_m) + c_m
+#
+# con k = (1 + tasa) * (1 - 0.1% * IVA) y c_m el cargo fijo de 15 UDIs
+# (ya descontada su gestión). Por eso el saldo final es
+#
+#     saldo_final = pesos · aportes + cargos
+#
+# donde pesos[m] = k^(meses - m) es el crecimiento del aporte del mes m
+# hasta el final del plazo. El kernel depende solo de
+# (tasa, inflación, UDI, plazo, offset) y se guarda en caché: evaluar un
+# nuevo calendario de aportes (early stop, estrategia de 18 meses,
+# inyecciones del SAT) es un solo producto punto.
+#
+# Nota: al no redondear cada paso, el resultado difiere de
+# simular_saldo_comprometido_excel. El redondeo de hasta 1.5 pesos por mes
+# crece con el saldo: decenas de pesos a 25 años y miles a 60 años, pero
+# siempre menos de 0.01% del saldo final.
+
+GESTION_CON_IVA = 0.001 * 1.16
+
+
+@lru_cache(maxsize=256)
+def _kernel_comprometido(tasa_anual, inflacion, udi_inicial, meses, offset):
+    tasa_mensual = round((1 + tasa_anual) ** (1 / 12) - 1, 3)
+    k = (1 + tasa_mensual) * (1 - GESTION_CON_IVA)
+
+    mes = np.arange(1, meses + 1)
+    aportando = mes > offset
+
+    # UDI vigente en cada mes (sube después de cada mes múltiplo de 12)
+    udi = udi_inicial * (1 + inflacion) ** ((mes - 1) // 12)
+    cargo_fijo = - 15 * udi * (1 + inflacion) * 1.16
+    cargo_neto = cargo_fijo * (1 - GESTION_CON_IVA)
+
+    pesos = np.where(aportando, k ** (meses - mes + 1), 0.0)
+    cargos = float(np.sum(np.where(aportando, k ** (meses - mes) * cargo_neto, 0.0)))
+
+    pesos.setflags(write=False)
+    return pesos, cargos
+
+
+def kernel_comprometido(tasa_anual, inflacion, udi_inicial, meses=25*12, offset=18):
+    """
+    Regresa (pesos, cargos) del saldo comprometido:
+    - pesos: arreglo (meses,) con el factor de crecimiento de cada aporte
+    - cargos: efecto total (negativo) de los cargos fijos al final del plazo
+
+    El resultado se guarda en caché por parámetros.
+    """
+    return _kernel_comprometido(
+        float(tasa_anual), float(inflacion), float(udi_inicial), int(meses), int(offset)
+    )
+
+
+def saldo_comprometido_lineal(
+    aportes,
+    inflacion,
+    udi_inicial,
+    tasa_anual,
+    meses=25*12,
+    offset=18,
+    sat_inyectado=None
+):
+    """
+    Saldo final del comprometido (sin redondeo) como producto punto.
+
+    'aportes' puede ser una lista (meses,) o una matriz (meses × calendarios)
+    para evaluar muchos calendarios de aportes a la vez.
+    """
+    pesos, cargos = kernel_comprometido(tasa_anual, inflacion, udi_inicial, meses, offset)
+
+    aportes = np.asarray(aportes, dtype=float)[:meses]
+    if sat_inyectado is not None:
+        sat = np.asarray(sat_inyectado, dtype=float)[:meses]
+        aportes = aportes + (sat if aportes.ndim == sat.ndim else sat[:, None])
+
+    return pesos @ aportes + cargos
+
+
+def kernel_crecimiento(rendimiento_anual, meses):
+    """
+    Kernel del ETF ideal / aportes personalizados (sin comisiones):
+    pesos[m] = (1 + r)^(meses - m), con m en base 0.
+    """
+    return _kernel_crecimiento(float(rendimiento_anual), int(meses))
+
+
+@lru_cache(maxsize=256)
+def _kernel_crecimiento(rendimiento_anual, meses):
+    r_m = (1 + rendimiento_anual) ** (1 / 12) - 1
+    pesos = (1 + r_m) ** (meses - np.arange(meses))
+    pesos.setflags(write=False)
+    return pesos
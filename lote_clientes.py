@@ -0,0 +1,122 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# ================================================================
+#   🗂️ Proyecciones por lote (CSV/Parquet → Parquet)
+# ================================================================
+#
+# Corre el pipeline completo de allianz.py (saldo inicial, comprometido
+# sin/con SAT, bono, benchmark ETF y retiros óptimos nominal/indexado)
+# para cada cliente de un archivo, sin Streamlit.
+#
+# - Los clientes se reparten en bloques entre un pool de procesos: cada
+#   proceso reutiliza su grafo de acumulación y sus cachés entre clientes,
+#   y resuelve los retiros óptimos de todo el bloque en una sola búsqueda
+#   vectorizada (pipeline_allianz.simular_clientes).
+# - Un cliente con datos inválidos no detiene el lote: su fila sale con
+#   la columna "error" llena y las métricas vacías.
+# - Columnas reconocidas: las de pipeline_allianz.PERFIL_BASE (tasas en
+#   fracción); las faltantes o vacías toman el valor por defecto. El resto
+#   de columnas (id, nombre, asesor…) se copian tal cual a la salida.
+#
+# Uso:
+#   python lote_clientes.py clientes.csv proyecciones.parquet
+#   python lote_clientes.py clientes.parquet salida.parquet --procesos 8 --bloque 128
+
+BLOQUE = 64
+
+
+def leer_clientes(ruta):
+    """
+    DataFrame de perfiles desde un .csv o .parquet.
+    """
+    import pandas as pd
+
+    extension = os.path.splitext(ruta)[1].lower()
+    if extension == ".csv":
+        return pd.read_csv(ruta)
+    if extension in (".parquet", ".pq"):
+        return pd.read_parquet(ruta)
+    raise ValueError(f"Formato no soportado: {ruta} (se espera .csv o .parquet)")
+
+
+def _simular_bloque(inicio, perfiles):
+    """
+    Trabajo de un proceso: simula los perfiles del bloque (los retiros
+    óptimos del bloque en una sola búsqueda vectorizada).
+    Regresa (inicio, [dict de resultados por cliente]).
+    """
+    from pipeline_allianz import pipeline_del_proceso, simular_clientes
+
+    return inicio, simular_clientes(perfiles, pipeline=pipeline_del_proceso())
+
+
+def procesar_lote(df, procesos=None, bloque=BLOQUE, avance=None):
+    """
+    Simula cada fila de 'df' en un pool de 'procesos' (por defecto uno
+    por núcleo) en bloques de 'bloque' clientes.
+    Regresa 'df' con las columnas de resultados agregadas, en el mismo orden.
+    'avance(fraccion, mensaje)' se llama al terminar cada bloque.
+    """
+    import pandas as pd
+
+    perfiles = df.to_dict("records")
+    bloques = [(i, perfiles[i:i + bloque]) for i in range(0, len(perfiles), bloque)]
+    resultados = [None] * len(perfiles)
+
+    with ProcessPoolExecutor(max_workers=procesos or os.cpu_count()) as pool:
+        futuros = [pool.submit(_simular_bloque, inicio, parte) for inicio, parte in bloques]
+        hechos = 0
+        for futuro in as_completed(futuros):
+            inicio, parte = futuro.result()
+            resultados[inicio:inicio + len(parte)] = parte
+            hechos += len(parte)
+            if avance is not None:
+                avance(hechos / len(perfiles), f"{hechos}/{len(perfiles)} clientes")
+
+    metricas = pd.DataFrame.from_records(resultados, index=df.index)
+    return pd.concat([df, metricas.drop(columns=df.columns, errors="ignore")], axis=1)
+
+
+def procesar_archivo(entrada, salida, procesos=None, bloque=BLOQUE, avance=None):
+    """
+    leer_clientes(entrada) → procesar_lote → Parquet en 'salida'.
+    Regresa {"clientes", "errores", "segundos", "salida"}.
+    También es el trabajo "lote_clientes" de cola_trabajos.py.
+    """
+    df = leer_clientes(entrada)
+    inicio = time.perf_counter()
+    resultado = procesar_lote(df, procesos, bloque, avance)
+    segundos = time.perf_counter() - inicio
+    resultado.to_parquet(salida, index=False)
+
+    return {
+        "clientes": len(resultado),
+        "errores": int(resultado["error"].notna().sum()),
+        "segundos": segundos,
+        "salida": salida,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Proyecciones Allianz PPR por lote de clientes.")
+    parser.add_argument("entrada", help="Perfiles de clientes (.csv o .parquet)")
+    parser.add_argument("salida", help="Archivo .parquet de resultados")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos del pool (default: núcleos)")
+    parser.add_argument("--bloque", type=int, default=BLOQUE, help=f"Clientes por bloque (default: {BLOQUE})")
+    args = parser.parse_args(argv)
+
+    def avance(_fraccion, mensaje):
+        print(f"\r{mensaje}", end="", file=sys.stderr, flush=True)
+
+    r = procesar_archivo(args.entrada, args.salida, args.procesos, args.bloque, avance)
+    print(f"\n{r['clientes']} clientes en {r['segundos']:.1f} s → {r['salida']}"
+          f" ({r['errores']} con error)", file=sys.stderr)
+    return 0 if r["errores"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,273 @@
+import math
+
+import numpy as np
+
+from bandas_streaming import BandasPercentiles
+from muestreo import choques_rendimiento, normales
+
+# ================================================================
+#   🎲 Monte Carlo: acumulación + retiro con comisiones Allianz
+# ================================================================
+#
+# Cada trayectoria tiene:
+# - Rendimientos mensuales lognormales: la mediana anual es
+#   'rendimiento_anual' y la volatilidad anual 'volatilidad_anual'.
+# - Inflación anual normal (media 'inflacion_anual'), que mueve la UDI
+#   una vez al año y, en el retiro indexado, la mensualidad.
+#
+# Comisiones (mismas reglas que las tablas, sin el redondeo del Excel):
+# - 15 UDIs * (1 + inflación) * IVA cada mes
+# - Gestión 0.1% + IVA mensual
+# - Administración trimestral opcional (cargo_admin=0.009 → 0.9% + IVA)
+#
+# El retiro se resuelve en una sola pasada: el saldo final es lineal en
+# la mensualidad (F(R) = F(0) + R * dF/dR), así que para cada trayectoria
+# la pensión sostenible es -F(0) / (dF/dR) y hay ruina si R la supera.
+#
+# Las trayectorias se simulan en bloques de 'tamano_bloque': cada bloque
+# avanza mes a mes como vectores y sus resultados se acumulan en
+# histogramas (bandas_streaming.py). La memoria no depende del número
+# total de trayectorias. Sin 'tamano_bloque' se parte 'n_trayectorias' en
+# BLOQUES_POR_DEFECTO bloques (de a lo más TAMANO_BLOQUE_MAX), para que el
+# intervalo de confianza y la 'tolerancia' funcionen con los defaults.
+#
+# Reducción de varianza (muestreo.py):
+# - muestreo="halton": cuasi Monte Carlo sobre el puente browniano
+# - antiteticas=True: pares Z / -Z
+# - Números aleatorios comunes: PPR y CETES, nominal e indexado se
+#   evalúan sobre las MISMAS trayectorias (una sola pasada), y dos llamadas
+#   con la misma 'semilla' y los mismos plazos usan los mismos choques.
+# - tolerancia: se detiene en cuanto el intervalo de confianza del 95% de
+#   la probabilidad de ruina (medido entre bloques) es menor a la tolerancia.
+
+GESTION_CON_IVA = 0.001 * 1.16
+MIN_BLOQUES_IC = 4
+BLOQUES_POR_DEFECTO = 10
+TAMANO_BLOQUE_MAX = 10_000
+
+
+def _rendimientos(z, rendimiento_anual, volatilidad_anual):
+    mu = np.log1p(rendimiento_anual) / 12
+    sigma = volatilidad_anual / np.sqrt(12)
+    return np.expm1(mu + sigma * z)
+
+
+def _simular_bloque(
+    rng,
+    n,
+    aportes,
+    meses_retiro,
+    rendimiento_anual,
+    inflacion_anual,
+    udi_inicial,
+    tasa_cetes_anual,
+    volatilidad_anual,
+    volatilidad_inflacion,
+    volatilidad_cetes,
+    cargo_admin,
+    muestreo,
+    antiteticas,
+    bandas
+):
+    """
+    Simula un bloque de 'n' trayectorias, suma el saldo de cada mes de
+    acumulación a 'bandas' y regresa (capital, pensiones), con 'pensiones'
+    un dict de la pensión sostenible por trayectoria para
+    ppr / cetes / ppr_indexada / cetes_indexada.
+    """
+    meses_acum = len(aportes)
+    meses_total = meses_acum + meses_retiro
+
+    # Todos los choques del bloque de una vez (meses × n)
+    z_rend = choques_rendimiento(rng, meses_total, n, muestreo, antiteticas)
+    z_cetes = normales(rng, meses_retiro, n, antiteticas)
+    z_infl = normales(rng, meses_total // 12 + 1, n, antiteticas)
+
+    saldo = np.zeros(n)
+    udi = np.full(n, float(udi_inicial))
+    año = 0
+    inflacion = inflacion_anual + volatilidad_inflacion * z_infl[año]
+
+    # ---------------------------
+    # 1) Acumulación
+    # ---------------------------
+    for mes in range(1, meses_acum + 1):
+        r_m = _rendimientos(z_rend[mes - 1], rendimiento_anual, volatilidad_anual)
+
+        base_interes = saldo + aportes[mes - 1]
+        cargo_fijo = - 15 * udi * (1 + inflacion) * 1.16
+        base_gestion = base_interes * (1 + r_m) + cargo_fijo
+
+        cargo_adm = - base_interes * cargo_admin * 1.16 if mes % 3 == 0 else 0.0
+        saldo = base_gestion + cargo_adm - base_gestion * GESTION_CON_IVA
+
+        bandas.agregar(mes - 1, saldo)
+
+        if mes % 12 == 0:
+            udi = udi * (1 + inflacion)
+            año += 1
+            inflacion = inflacion_anual + volatilidad_inflacion * z_infl[año]
+
+    capital = saldo
+
+    # ---------------------------
+    # 2) Retiro: F(0) y dF/dR en una sola pasada,
+    #    para retiro nominal e indexado
+    # ---------------------------
+    saldo_ppr, saldo_cet = capital.copy(), capital.copy()
+    deriv = {k: np.zeros(n) for k in ("ppr", "cetes", "ppr_indexada", "cetes_indexada")}
+    factor_indexado = np.ones(n)
+
+    for mes in range(1, meses_retiro + 1):
+        r_m = _rendimientos(z_rend[meses_acum + mes - 1], rendimiento_anual, volatilidad_anual)
+        c_m = _rendimientos(z_cetes[mes - 1], tasa_cetes_anual, volatilidad_cetes)
+
+        # PPR: rendimiento, 15 UDIs + IVA, retiro y gestión
+        cargo_fijo = 15 * udi * (1 + inflacion) * 1.16
+        saldo_ppr = (saldo_ppr * (1 + r_m) - cargo_fijo) * (1 - GESTION_CON_IVA)
+        deriv["ppr"] = (deriv["ppr"] * (1 + r_m) - 1) * (1 - GESTION_CON_IVA)
+        deriv["ppr_indexada"] = (
+            (deriv["ppr_indexada"] * (1 + r_m) - factor_indexado) * (1 - GESTION_CON_IVA)
+        )
+
+        # CETES: sin comisiones
+        saldo_cet = saldo_cet * (1 + c_m)
+        deriv["cetes"] = deriv["cetes"] * (1 + c_m) - 1
+        deriv["cetes_indexada"] = deriv["cetes_indexada"] * (1 + c_m) - factor_indexado
+
+        if mes % 12 == 0:
+            udi = udi * (1 + inflacion)
+            factor_indexado = factor_indexado * (1 + inflacion)
+            año += 1
+            inflacion = inflacion_anual + volatilidad_inflacion * z_infl[año]
+
+    pensiones = {
+        k: np.maximum(-(saldo_cet if k.startswith("cetes") else saldo_ppr) / d, 0.0)
+        for k, d in deriv.items()
+    }
+    return capital, pensiones
+
+
+def simular_montecarlo(
+    aportes,
+    meses_retiro,
+    rendimiento_anual,
+    inflacion_anual,
+    udi_inicial,
+    tasa_cetes_anual,
+    volatilidad_anual=0.15,
+    volatilidad_inflacion=0.01,
+    volatilidad_cetes=0.0,
+    retiro_mensual=None,
+    retiro_indexado=None,
+    cargo_admin=0.0,
+    n_trayectorias=10_000,
+    percentiles=(5, 50, 95),
+    semilla=None,
+    tamano_bloque=None,
+    muestreo="pseudo",
+    antiteticas=False,
+    tolerancia=None,
+    metrica="prob_ruina_ppr",
+    avance=None
+):
+    """
+    Simula hasta 'n_trayectorias' caminos de acumulación (con la lista de
+    'aportes' mensuales) seguidos de 'meses_retiro' meses de retiro, tanto
+    dejando el dinero en el PPR como pasándolo a CETES, con retiro nominal
+    e indexado sobre las mismas trayectorias.
+
+    - retiro_mensual / retiro_indexado (inicial): planes a evaluar; dan la
+      probabilidad de ruina nominal / indexada.
+    - muestreo: "pseudo" o "halton"; antiteticas: pares Z / -Z.
+    - tolerancia: si se da, se detiene cuando la mitad del intervalo de
+      confianza del 95% de 'metrica' (una probabilidad de ruina) es menor;
+      'n_trayectorias' queda como máximo. Necesita al menos MIN_BLOQUES_IC
+      bloques (ValueError si 'tamano_bloque' no los deja).
+    - tamano_bloque: None → n_trayectorias / BLOQUES_POR_DEFECTO, hasta
+      TAMANO_BLOQUE_MAX.
+    - avance(fraccion, mensaje): se llama después de cada bloque (ejecutor.py).
+
+    Las trayectorias se procesan en bloques de 'tamano_bloque'; los
+    percentiles salen de histogramas en streaming (bandas_streaming.py).
+
+    Regresa un dict con:
+    - "saldo_retiro": percentiles del capital al retiro
+    - "pension_ppr", "pension_cetes", "pension_ppr_indexada",
+      "pension_cetes_indexada": percentiles de la pensión sostenible
+    - "prob_ruina_*": fracción de trayectorias que se quedan sin dinero
+      antes del final (None sin el retiro correspondiente)
+    - "bandas_acumulacion": matriz (percentiles × meses) del saldo
+    - "trayectorias": trayectorias simuladas
+    - "ic_95": mitad del intervalo de confianza de 'metrica' (None con
+      menos de MIN_BLOQUES_IC bloques)
+    """
+    rng = np.random.default_rng(semilla)
+    aportes = np.asarray(aportes, dtype=float)
+
+    planes = {
+        "ppr": retiro_mensual,
+        "cetes": retiro_mensual,
+        "ppr_indexada": retiro_indexado,
+        "cetes_indexada": retiro_indexado,
+    }
+    clave_metrica = metrica.removeprefix("prob_ruina_")
+    if tolerancia is not None and planes.get(clave_metrica) is None:
+        raise ValueError(f"'{metrica}' necesita el retiro correspondiente para la tolerancia")
+
+    if tamano_bloque is None:
+        tamano_bloque = max(1, min(TAMANO_BLOQUE_MAX, math.ceil(n_trayectorias / BLOQUES_POR_DEFECTO)))
+    if tolerancia is not None and math.ceil(n_trayectorias / tamano_bloque) < MIN_BLOQUES_IC:
+        raise ValueError(
+            f"la tolerancia necesita al menos {MIN_BLOQUES_IC} bloques: "
+            f"{n_trayectorias:,} trayectorias en bloques de {tamano_bloque:,}"
+        )
+
+    bandas = BandasPercentiles(n_filas=len(aportes))
+    resultados = BandasPercentiles(n_filas=1 + len(planes))  # capital + pensiones
+    ruinas = dict.fromkeys(planes, 0)
+    ruina_por_bloque = []
+
+    simuladas = 0
+    ic_95 = None
+    while simuladas < n_trayectorias:
+        n = min(tamano_bloque, n_trayectorias - simuladas)
+        simuladas += n
+
+        capital, pensiones = _simular_bloque(
+            rng, n, aportes, meses_retiro, rendimiento_anual, inflacion_anual,
+            udi_inicial, tasa_cetes_anual, volatilidad_anual, volatilidad_inflacion,
+            volatilidad_cetes, cargo_admin, muestreo, antiteticas, bandas
+        )
+
+        resultados.agregar(0, capital)
+        for fila, (clave, pension) in enumerate(pensiones.items(), start=1):
+            resultados.agregar(fila, pension)
+            if planes[clave] is not None:
+                en_ruina = int(np.count_nonzero(planes[clave] > pension))
+                ruinas[clave] += en_ruina
+                if clave == clave_metrica:
+                    ruina_por_bloque.append(en_ruina / n)
+
+        # Intervalo de confianza entre bloques (cada bloque es independiente)
+        if len(ruina_por_bloque) >= MIN_BLOQUES_IC:
+            ic_95 = 1.96 * np.std(ruina_por_bloque, ddof=1) / np.sqrt(len(ruina_por_bloque))
+            if tolerancia is not None and ic_95 < tolerancia:
+                break
+
+        if avance is not None:
+            avance(simuladas / n_trayectorias, f"{simuladas:,} trayectorias")
+
+    salida = {"percentiles": list(percentiles)}
+
+    tabla = resultados.percentiles(percentiles).T
+    salida["saldo_retiro"] = tabla[0]
+    for fila, clave in enumerate(planes, start=1):
+        salida[f"pension_{clave}"] = tabla[fila]
+    for clave, retiro in planes.items():
+        salida[f"prob_ruina_{clave}"] = None if retiro is None else ruinas[clave] / simuladas
+
+    salida["bandas_acumulacion"] = bandas.percentiles(percentiles)
+    salida["trayectorias"] = simuladas
+    salida["ic_95"] = ic_95
+    return salida
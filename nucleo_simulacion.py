@@ -0,0 +1,495 @@
+import io
+
+from analitico import (
+    acumulacion_analitica,
+    saldo_aportes_analitico,
+    retiro_mes_a_mes_analitico
+)
+
+# ================================================================
+#   🧮 Núcleo financiero de simulation.py (sin interfaz)
+# ================================================================
+#
+# Funciones puras del simulador de retiro: acumulación, pensión
+# alcanzable, capital necesario, Allianz con SAT, estrategias de aportes
+# y exportadores. Se importa sin Streamlit, Plotly ni Altair, así que los
+# procesos por lotes no cargan la interfaz.
+#
+# pandas solo se importa dentro de las funciones que arman DataFrames o
+# archivos (detalle=True y exportadores); con detalle=False todo es
+# aritmética pura.
+
+def export_excel_completo(
+    df_acum=None,
+    df_resumen=None,
+    df_ret=None,
+    df_sens=None,
+    df_adv=None,
+    df_retiro=None,
+    params=None
+):
+    import pandas as pd
+
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine="xlsxwriter") as writer:
+
+        if df_acum is not None:
+            df_acum.to_excel(writer, sheet_name="Acumulación", index=False)
+
+        if df_resumen is not None:
+            df_resumen.to_excel(writer, sheet_name="Valor Presente", index=False)
+
+        if df_ret is not None:
+            df_ret.to_excel(writer, sheet_name="Edades Retiro", index=False)
+
+        if df_sens is not None:
+            df_sens.to_excel(writer, sheet_name="Sensibilidad", index=False)
+
+        if df_adv is not None:
+            df_adv.to_excel(writer, sheet_name="Estrategia Avanzada", index=False)
+
+        if df_retiro is not None:
+            df_retiro.to_excel(writer, sheet_name="Retiro Mes a Mes", index=False)
+
+        if params is not None:
+            pd.DataFrame(params.items(), columns=["Parámetro", "Valor"]).to_excel(
+                writer, sheet_name="Parámetros", index=False
+            )
+
+    return buffer.getvalue()
+
+
+def export_df_to_csv(df):
+    return df.to_csv(index=False).encode("utf-8")
+
+def export_df_to_excel(df):
+    import pandas as pd
+
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine="xlsxwriter") as writer:
+        df.to_excel(writer, index=False, sheet_name="Hoja1")
+    return buffer.getvalue()
+
+def parametros_actuales_json(
+        edad_actual, edad_retiro, edad_final,
+        pension_hoy, inflacion, rendimiento,
+        aporte_inicial, aportes_crecen
+):
+    return {
+        "edad_actual": edad_actual,
+        "edad_retiro": edad_retiro,
+        "edad_final": edad_final,
+        "pension_hoy": pension_hoy,
+        "inflacion": inflacion,
+        "rendimiento": rendimiento,
+        "aporte_inicial": aporte_inicial,
+        "aportes_crecen": aportes_crecen,
+    }
+
+
+def resumen_pension(
+        edad_actual, edad_retiro, edad_final,
+        pension_hoy, inflacion, rendimiento,
+        aporte_inicial, aportes_crecen
+):
+    """
+    Métricas de la parte superior de simulation.py (capital objetivo,
+    saldo al retiro, pensión objetivo y alcanzada, nominal y en pesos de
+    hoy) con los mismos parámetros que parametros_actuales_json.
+    Sin tablas: todo con las fórmulas cerradas.
+    """
+    años_a_retiro = edad_retiro - edad_actual
+    años_retiro = edad_final - edad_retiro
+
+    capital_obj, pension_retiro = capital_necesario_para_pension(
+        pension_hoy, años_a_retiro, años_retiro, inflacion, rendimiento
+    )
+    saldo, resumen = simula_acumulacion(
+        años_a_retiro, inflacion, rendimiento, aporte_inicial, aportes_crecen, detalle=False
+    )
+    pension_alcanzada = pension_alcanzable_desde_capital(saldo, años_retiro, inflacion, rendimiento)
+
+    return {
+        "capital_objetivo": capital_obj,
+        "saldo_al_retiro": saldo,
+        "aportes_totales": resumen["Aportes totales"],
+        "pension_objetivo": pension_retiro,
+        "pension_alcanzada": pension_alcanzada,
+        "pension_objetivo_hoy": valor_presente(pension_retiro, inflacion, años_a_retiro),
+        "pension_alcanzada_hoy": valor_presente(pension_alcanzada, inflacion, años_a_retiro),
+    }
+
+def simula_retiro_mes_a_mes(capital_inicial, años_retiro, inflacion_anual, rendimiento_anual, pension_mensual_inicial,
+                            detalle=True):
+    """
+    Simula mes a mes el periodo de retiro:
+    - saldo
+    - pensión que sube con inflación
+    - intereses mensuales
+
+    Con detalle=False regresa solo (saldo_final, mes_final), calculado con
+    la fórmula cerrada de analitico.py.
+    """
+    if not detalle:
+        return retiro_mes_a_mes_analitico(
+            capital_inicial, años_retiro, inflacion_anual, rendimiento_anual, pension_mensual_inicial
+        )
+
+    meses = años_retiro * 12
+    infl_m = tasa_mensual(inflacion_anual)
+    rend_m = tasa_mensual(rendimiento_anual)
+
+    saldo = capital_inicial
+    pension = pension_mensual_inicial
+
+    registros = []
+
+    for m in range(meses):
+        saldo_inicial = saldo
+
+        # Retiro del mes
+        saldo -= pension
+
+        # Si ya no queda saldo → límite
+        if saldo <= 0:
+            registros.append((m, saldo_inicial, pension, 0, 0))
+            saldo = 0
+            break
+
+        # Rendimiento del mes
+        interes = saldo * rend_m
+        saldo += interes
+
+        registros.append((m, saldo_inicial, pension, interes, saldo))
+
+        # Aumenta la pensión según inflación mensual
+        pension *= (1 + infl_m)
+
+    import pandas as pd
+
+    df = pd.DataFrame(registros, columns=[
+        "Mes", "Saldo inicial", "Pensión mensual", "Interés ganado", "Saldo final"
+    ])
+
+    return df
+
+
+def aplica_crecimiento_inflacion_back(aportes, inflacion_anual, activar):
+    """
+    Toma una lista de aportes definidos en pesos de HOY y, si 'activar' es True,
+    los ajusta por inflación acumulada mes a mes.
+    Es decir: aporte_real[m] = aporte_base[m] * (1 + infl_m)^m
+    """
+    if not activar:
+        return aportes
+
+    infl_m = tasa_mensual(inflacion_anual)
+    aportes_ajustados = [
+        aporte * ((1 + infl_m) ** i)
+        for i, aporte in enumerate(aportes)
+    ]
+    return aportes_ajustados
+
+def aplica_crecimiento_inflacion(aportes, inflacion_anual, activar):
+    if not activar:
+        return aportes
+
+    lista = []
+    for m, aporte in enumerate(aportes):
+        años_transcurridos = m // 12
+        aporte_real = aporte * ((1 + inflacion_anual) ** años_transcurridos)
+        lista.append(aporte_real)
+
+    return lista
+
+def estrategia_front_loaded(años_a_retiro, aporte_normal, aporte_alto, años_front):
+    meses = años_a_retiro * 12
+    lista = []
+    for m in range(meses):
+        if m < años_front * 12:
+            lista.append(aporte_alto)
+        else:
+            lista.append(aporte_normal)
+    return lista
+
+def estrategia_back_loaded(años_a_retiro, aporte_bajo, aporte_alto, años_bajo):
+    meses = años_a_retiro * 12
+    lista = []
+    for m in range(meses):
+        if m < años_bajo * 12:
+            lista.append(aporte_bajo)
+        else:
+            lista.append(aporte_alto)
+    return lista
+
+def estrategia_crecimiento_salarial(años_a_retiro, aporte_inicial, crecimiento_anual, inflacion_anual=None):
+    meses = años_a_retiro * 12
+    lista = []
+    aporte = aporte_inicial
+    g_m = tasa_mensual(crecimiento_anual)
+    infl_m = tasa_mensual(inflacion_anual) if inflacion_anual else 0
+
+    for m in range(meses):
+        lista.append(aporte)
+        aporte *= (1 + g_m + infl_m)
+
+    return lista
+
+def simula_aportes_personalizados(aportes, inflacion_anual, rendimiento_anual, detalle=True):
+    if not detalle:
+        return saldo_aportes_analitico(aportes, rendimiento_anual), {"Aportes totales": sum(aportes)}
+
+    saldo = 0
+    r_m = tasa_mensual(rendimiento_anual)
+
+    registros = []
+    for m, aporte in enumerate(aportes):
+        saldo += aporte
+        saldo *= (1 + r_m)
+        registros.append((m, saldo, aporte))
+
+    import pandas as pd
+
+    return saldo, pd.DataFrame(registros, columns=["Mes", "Saldo", "Aporte"])
+
+
+def calcula_pension_scenario(años_a, años_r, infl, rend, aporte_mensual, aportes_crecen):
+    """
+    Helper para calcular pensión alcanzable en un escenario dado.
+    Regresa: saldo_al_retiro, pension_mensual_nominal, pension_mensual_valor_presente
+    """
+    if años_a <= 0 or años_r <= 0:
+        return None, None, None
+
+    saldo_s, _resumen = simula_acumulacion(años_a, infl, rend, aporte_mensual, aportes_crecen, detalle=False)
+    pension_alc_s = pension_alcanzable_desde_capital(saldo_s, años_r, infl, rend)
+    vp_alc_s = valor_presente(pension_alc_s, infl, años_a)
+    return saldo_s, pension_alc_s, vp_alc_s
+
+def valor_presente(valor_futuro, inflacion_anual, años):
+    return valor_futuro / ((1 + inflacion_anual) ** años)
+
+def pension_alcanzable_desde_capital(K, años_retiro, inflacion_anual, rendimiento_anual):
+    r = rendimiento_anual
+    g = inflacion_anual
+    N = años_retiro
+
+    if abs(r - g) < 1e-8:
+        P0_anual = K * (r) / N
+    else:
+        P0_anual = K * (r - g) / (1 - ((1 + g) / (1 + r)) ** N)
+
+    return P0_anual / 12
+
+def tasa_mensual(tasa_anual):
+    return (1 + tasa_anual) ** (1 / 12) - 1
+
+def capital_necesario_para_pension(
+        pension_mensual_hoy,
+        años_a_retiro,
+        años_retiro,
+        inflacion_anual,
+        rendimiento_anual
+):
+    pension_mensual_retiro = pension_mensual_hoy * (1 + inflacion_anual) ** años_a_retiro
+    P0 = pension_mensual_retiro * 12
+    g = inflacion_anual
+    r = rendimiento_anual
+    N = años_retiro
+
+    if abs(r - g) < 1e-8:
+        K = P0 * N / (1 + r)
+    else:
+        K = P0 * (1 - ((1 + g) / (1 + r)) ** N) / (r - g)
+
+    return K, pension_mensual_retiro
+
+def simula_acumulacion(años, inflacion_anual, rendimiento_anual, aporte_inicial, aportes_crecen, detalle=True):
+    """
+    Acumulación mes a mes sin comisiones.
+    Con detalle=False no arma el DataFrame: regresa (saldo, resumen),
+    usando la fórmula cerrada de analitico.py.
+    """
+    if not detalle:
+        saldo, aportes_totales = acumulacion_analitica(
+            años, inflacion_anual, rendimiento_anual, aporte_inicial, aportes_crecen
+        )
+        return saldo, {"Aportes totales": aportes_totales}
+
+    meses = años * 12
+    r_m = tasa_mensual(rendimiento_anual)
+    g_m = tasa_mensual(inflacion_anual)
+
+    saldo = 0.0
+    aporte = aporte_inicial
+    registros = []
+
+    for m in range(meses):
+        saldo += aporte
+        saldo *= (1 + r_m)
+
+        registros.append((m, saldo, aporte))
+
+        # Solo incrementar aportes una vez por AÑO, no por mes
+        if aportes_crecen:
+            # si estamos en el primer mes de cada año (m % 12 == 0 y m > 0)
+            if m > 0 and m % 12 == 0:
+                aporte *= (1 + inflacion_anual)
+
+    import pandas as pd
+
+    df = pd.DataFrame(registros, columns=["Mes", "Saldo", "Aporte"])
+    return saldo, df
+
+def simula_acumulacion_allianz(años, inflacion_anual, rendimiento_anual, aporte_inicial, aportes_crecen, precio_actual_udi,
+                               detalle=True):
+    meses = años * 12
+    r_m = tasa_mensual(rendimiento_anual)
+    g_m = tasa_mensual(inflacion_anual)
+
+    saldo = 0.0
+    aporte = aporte_inicial
+    aportes_totales = 0.0
+    registros = []
+
+    for m in range(meses):
+        saldo += aporte
+        saldo *= (1 + r_m)
+        saldo = saldo - precio_actual_udi * 15  # costo mensual del seguro de vida
+        if detalle:
+            registros.append((m, saldo, aporte))
+        else:
+            aportes_totales += aporte
+
+        # Solo incrementar aportes una vez por AÑO, no por mes
+        if aportes_crecen:
+            # si estamos en el primer mes de cada año (m % 12 == 0 y m > 0)
+            if m > 0 and m % 12 == 0:
+                aporte *= (1 + inflacion_anual)
+        if m > 0 and m % 12 == 0:
+            precio_actual_udi  *= (1 + inflacion_anual)
+
+    if not detalle:
+        return saldo, {"Aportes totales": aportes_totales}
+
+    import pandas as pd
+
+    df = pd.DataFrame(registros, columns=["Mes", "Saldo", "Aporte"])
+    return saldo, df
+
+
+def simula_allianz_con_sat(
+    años,
+    inflacion_anual,
+    rendimiento_anual,
+    aporte_inicial,
+    aportes_crecen,
+    precio_actual_udi,
+    tasa_marginal_isr,
+    reinvertir_sat,
+    detalle=True
+):
+    """
+    Allianz simple + devolución anual del SAT.
+    Con detalle=False no arma el DataFrame: regresa (saldo, resumen).
+    """
+    meses = años * 12
+    r_m = tasa_mensual(rendimiento_anual)
+
+    saldo = 0.0
+    aporte = aporte_inicial
+    precio_udi = precio_actual_udi
+    devolucion_acumulada = 0.0  # solo para gráfica individual del SAT
+
+    registros = []
+
+    for m in range(meses):
+        # ---- Aporte mensual ----
+        saldo += aporte
+
+        # ---- Rendimiento mensual ----
+        saldo *= (1 + r_m)
+
+        # ---- Comisión mensual de 15 UDIS ----
+        saldo -= precio_udi * 15
+
+        # ---- Cada año ocurre esto ----
+        if (m + 1) % 12 == 0:
+            # Aumento del aporte
+            if aportes_crecen:
+                aporte *= (1 + inflacion_anual)
+
+            # Aumento del precio UDI
+            precio_udi *= (1 + inflacion_anual)
+
+            # Cálculo de devolución SAT anual
+            devolucion_anual = aporte_inicial * 12 * tasa_marginal_isr
+            devolucion_acumulada += devolucion_anual
+
+            # Reinvertir o no la devolución
+            if reinvertir_sat:
+                saldo += devolucion_anual
+
+        if detalle:
+            registros.append((m, saldo, devolucion_acumulada))
+
+    if not detalle:
+        return saldo, {"SAT_Acumulado": devolucion_acumulada}
+
+    import pandas as pd
+
+    df = pd.DataFrame(
+        registros,
+        columns=["Mes", "Saldo_Allianz_SAT", "SAT_Acumulado"]
+    )
+
+    return saldo, df
+
+
+def barrido_edades_retiro(edades, edad_actual, edad_final, inflacion, rendimiento, aporte_inicial,
+                          aportes_crecen, pension_hoy, avance=None):
+    """
+    Pensión alcanzada vs objetivo para cada edad de retiro (tab 3).
+    Regresa una lista de dicts (una fila por edad).
+    avance(fraccion, mensaje) se llama en cada edad (ejecutor.py).
+    """
+    resultados = []
+
+    for i, retiro_ed in enumerate(edades):
+        if avance is not None:
+            avance(i / len(edades), f"edad {retiro_ed}")
+
+        años_a = retiro_ed - edad_actual
+        años_r = edad_final - retiro_ed
+
+        if años_a <= 0:
+            continue
+
+        # Simular acumulación para esta edad
+        saldo_temp, _resumen = simula_acumulacion(
+            años_a, inflacion, rendimiento, aporte_inicial, aportes_crecen, detalle=False
+        )
+
+        # Pensión objetivo y alcanzada
+        cap_obj_temp, pension_ret_temp = capital_necesario_para_pension(
+            pension_hoy, años_a, años_r, inflacion, rendimiento
+        )
+
+        pension_alc_temp = pension_alcanzable_desde_capital(saldo_temp, años_r, inflacion, rendimiento)
+
+        # Valor presente
+        vp_obj_temp = valor_presente(pension_ret_temp, inflacion, años_a)
+        vp_alc_temp = valor_presente(pension_alc_temp, inflacion, años_a)
+
+        resultados.append({
+            "Edad de retiro": retiro_ed,
+            "% objetivo nominal": pension_alc_temp / pension_ret_temp * 100,
+            "Pensión alcanzada (nominal)": pension_alc_temp,
+            "Pensión objetivo (nominal)": pension_ret_temp,
+            "Saldo acumulado": saldo_temp,
+            "% objetivo en valor presente": vp_alc_temp / vp_obj_temp * 100,
+            "Pensión alcanzada (hoy)": vp_alc_temp,
+            "Pensión objetivo (hoy)": vp_obj_temp,
+        })
+
+    return resultados
@@ -0,0 +1,53 @@
+import math
+
+# ================================================================
+#   📄 Detalle mensual bajo demanda y por páginas
+# ================================================================
+#
+# Las tablas mes a mes (300–720 filas, varias por pestaña) se mandaban
+# completas al navegador en cada rerun. Ahora la vista por defecto es el
+# resumen anual (tablas.resumen_anual) y el detalle mensual solo se
+# manda si el usuario lo pide, una página a la vez.
+
+FILAS_POR_PAGINA = 60   # cinco años por página
+
+
+def pagina(df, numero, filas=FILAS_POR_PAGINA):
+    """
+    Filas de la página 'numero' (desde 1) del DataFrame.
+    """
+    inicio = (numero - 1) * filas
+    return df.iloc[inicio:inicio + filas]
+
+
+def total_paginas(df, filas=FILAS_POR_PAGINA):
+    return max(1, math.ceil(len(df) / filas))
+
+
+def mostrar_detalle_mensual(df, clave, filas=FILAS_POR_PAGINA, etiqueta="Ver detalle mes a mes",
+                            contenedor=None):
+    """
+    Interruptor que, al activarse, muestra la tabla mensual paginada.
+    'df' puede ser una función sin argumentos que arma la tabla: solo se
+    llama con el interruptor activo.
+    'clave' debe ser única en la página (se usa en las llaves de los widgets).
+    """
+    import streamlit as st
+
+    destino = contenedor if contenedor is not None else st
+    if not destino.toggle(etiqueta, key=f"{clave}_detalle"):
+        return
+    if callable(df):
+        df = df()
+
+    paginas = total_paginas(df, filas)
+    numero = 1
+    if paginas > 1:
+        numero = destino.number_input(
+            f"Página (de {paginas})", min_value=1, max_value=paginas, value=1, step=1,
+            key=f"{clave}_pagina"
+        )
+
+    inicio = (numero - 1) * filas
+    destino.caption(f"Filas {inicio + 1}–{min(inicio + filas, len(df))} de {len(df)}")
+    destino.dataframe(pagina(df, numero, filas), use_container_width=True)
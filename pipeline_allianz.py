@@ -0,0 +1,581 @@
+import numpy as np
+import pandas as pd
+
+from cache import cache_etapa
+from dag import Etapa, Pipeline
+from tablas import (
+    simular_saldo_inicial_excel,
+    simular_saldo_comprometido_bifurcado,
+    simular_bono_excel
+)
+from allianz_functions import (
+    buscar_retiro_optimo_nominal,
+    simular_retiro_simple,
+    simular_retiro_ppr,
+    generar_aportes_con_offset,
+    generar_aportes_early_stop
+)
+from allianz_functions_indexadas import (
+    buscar_retiro_optimo_indexado,
+    simular_retiro_ppr_indexado,
+    simular_retiro_simple_indexado
+)
+from retiro_vectorizado import buscar_retiro_optimo_lote
+from analitico import serie_aportes_analitica
+from montecarlo import simular_montecarlo
+
+# ================================================================
+#   🧱 Etapas del simulador Allianz (con caché por parámetros)
+# ================================================================
+#
+# allianz.py solo lee los widgets y dibuja; los cálculos viven aquí como
+# etapas con insumos explícitos. Cada etapa pasa por @cache_etapa
+# (cache.py): si sus insumos no cambiaron, regresa al instante aunque el
+# rerun lo haya disparado otro widget (p. ej. "Años estimados de retiro"
+# ya no recalcula las tablas de la pestaña 1).
+
+
+@cache_etapa()
+def etapa_aportes(
+    aportacion,
+    meses,
+    inflacion_anual,
+    incrementar,
+    modo_estrategia,
+    aporte_temporal,
+    offset_manual,
+    meses_aportando
+):
+    """
+    Lista de aportes mensuales (con estrategia de 18 meses o early stop).
+    """
+    if modo_estrategia:
+        aportes = generar_aportes_con_offset(
+            aporte_inicial=aporte_temporal,
+            meses=meses,
+            inflacion_anual=inflacion_anual,
+            incrementar=incrementar,
+            offset=18,
+            nuevo_aporte=aportacion
+        )
+        aportes[18] += offset_manual
+        return aportes
+
+    return generar_aportes_early_stop(
+        aporte_inicial=aportacion,
+        meses=meses,
+        inflacion_anual=inflacion_anual,
+        incrementar=incrementar,
+        meses_aportando=meses_aportando
+    )
+
+
+@cache_etapa()
+def etapa_saldo_inicial(aporte_inicial, meses, tasa_anual, incrementar, inflacion_anual, detalle=True):
+    """
+    Saldo inicial (todo el plazo, aportando solo 18 meses).
+    detalle="anual" → una fila por año (tablas.FilasAnuales).
+    """
+    return simular_saldo_inicial_excel(
+        aporte_inicial=aporte_inicial,
+        meses_totales=meses,
+        meses_aportando=18,
+        tasa_anual=tasa_anual,
+        cargo_fijo_inicial=-500,
+        incrementar=incrementar,
+        inflacion_anual=inflacion_anual,
+        detalle=detalle
+    )
+
+
+@cache_etapa()
+def etapa_sat(aportes, plazo, salario_anual, inflacion_anual, uma_inicial, tasa_marginal_isr):
+    """
+    Devolución anual del SAT (reglas reales) y su serie mensual de
+    inyecciones (mes 13, 25, 37, ...).
+    Regresa (sat_por_anio, sat_inyectado).
+    """
+    meses = plazo * 12
+
+    # Aportes por año (con inflación)
+    aportes_por_anio = []
+    for year in range(plazo):
+        inicio = year * 12
+        fin = min((year + 1) * 12, len(aportes))
+        aportes_por_anio.append(sum(aportes[inicio:fin]))
+
+    # Salario que crece con la inflación
+    salarios_por_anio = []
+    salario_actual = salario_anual
+    for _ in range(plazo):
+        salarios_por_anio.append(salario_actual)
+        salario_actual *= (1 + inflacion_anual)
+
+    # SAT devuelto por año
+    sat_por_anio = []
+    for year, a_anual in enumerate(aportes_por_anio):
+        # Límite 1: 10% del salario anual
+        limite_salario = salarios_por_anio[year] * 0.10
+
+        # Límite 2: 5 UMA * 365 días
+        limite_uma = uma_inicial * 365 * 5
+
+        # Límite 3: tus aportes del año
+        limite_aporte = a_anual
+
+        deducible = min(limite_aporte, limite_salario, limite_uma)
+        sat_por_anio.append(deducible * tasa_marginal_isr)
+
+    # Serie mensual de inyecciones SAT
+    sat_inyectado = [0.0] * meses
+    for year, sat in enumerate(sat_por_anio):
+        mes_inyeccion = year * 12 + 13
+        if 1 <= mes_inyeccion <= meses:
+            sat_inyectado[mes_inyeccion - 1] = sat
+
+    return sat_por_anio, sat_inyectado
+
+
+@cache_etapa()
+def etapa_comprometido(aportes, sat_inyectado, inflacion_anual, udi_inicial, tasa_anual, meses,
+                       detalle=True):
+    """
+    Saldo comprometido SIN SAT y CON SAT dentro del PPR (tramo común
+    simulado una sola vez). Regresa (df_sin_sat, df_con_sat).
+    detalle="anual" → una fila por año.
+    """
+    return simular_saldo_comprometido_bifurcado(
+        aportes_lista=aportes,
+        sat_a=[0.0] * meses,
+        sat_b=sat_inyectado,
+        inflacion=inflacion_anual,
+        udi_inicial=udi_inicial,
+        tasa_anual=tasa_anual,
+        meses=meses,
+        offset=18,
+        detalle=detalle
+    )
+
+
+@cache_etapa()
+def etapa_bono(aporte_mensual, plazo, detalle=True):
+    """
+    Bono de fidelidad real. detalle="anual" → una fila por año.
+    """
+    return simular_bono_excel(
+        aporte_mensual=aporte_mensual,
+        plazo_anios=plazo,
+        tasa_anual_bono=0.09,
+        detalle=detalle
+    )
+
+
+@cache_etapa()
+def etapa_benchmark(aportes, rendimiento_anual):
+    """
+    ETF ideal sin comisiones: serie geométrica (analitico.py).
+    """
+    return serie_aportes_analitica(aportes, rendimiento_anual)
+
+
+def armar_df_total(df_inicial, df_comp_sin_sat, df_comp_con_sat, df_bono, sat_inyectado):
+    """
+    Tabla total (sin SAT y con SAT) a partir de las tablas de cada etapa.
+    Con tablas por año (columna "Año", detalle="anual") el SAT inyectado
+    se suma por año y la tabla total también queda por año.
+    """
+    periodo = "Año" if "Año" in df_inicial.columns else "Mes"
+    if periodo == "Año":
+        sat_inyectado = [sum(sat_inyectado[i:i + 12]) for i in range(0, len(sat_inyectado), 12)]
+
+    filas = len(sat_inyectado)
+    df_total = pd.DataFrame({
+        periodo: np.arange(1, filas + 1),
+        "Inicial": df_inicial["Saldo Final"].tolist(),
+        "Comprometido_sin_SAT": df_comp_sin_sat["Saldo Final"].tolist(),
+        "Comprometido_con_SAT": df_comp_con_sat["Saldo Final"].tolist(),
+        "Bono": df_bono["Saldo Final"].tolist(),
+        "SAT_inyectado": sat_inyectado,
+    })
+
+    # SAT acumulado aportado (solo la suma de depósitos)
+    df_total["SAT_Acumulado"] = np.cumsum(df_total["SAT_inyectado"])
+
+    df_total["Total Allianz sin SAT"] = (
+            df_total["Inicial"] + df_total["Comprometido_sin_SAT"] + df_total["Bono"]
+    )
+    df_total["Allianz + SAT"] = (
+            df_total["Inicial"] + df_total["Comprometido_con_SAT"] + df_total["Bono"]
+    )
+    return df_total
+
+
+# ---------------------------------------------------------------
+#   Grafo de la acumulación
+# ---------------------------------------------------------------
+
+def grafo_acumulacion():
+    """
+    Pipeline de la pestaña de acumulación (dag.py). Entradas:
+    aportacion, meses, plazo, inflacion_anual, rendimiento_anual,
+    incrementar, modo_estrategia, aporte_temporal, offset_manual,
+    meses_aportando, udi_inicial, salario_anual, uma_inicial,
+    tasa_marginal_isr, aporte_bono, detalle (True: tablas mes a mes;
+    "anual": una fila por año, sin armar los meses).
+
+    Saldo inicial, SAT, bono y ETF dependen solo de los aportes: cambiar
+    un dato de uno de ellos no recalcula los otros.
+    """
+    return Pipeline([
+        Etapa("aportes", etapa_aportes, [
+            "aportacion", "meses", "inflacion_anual", "incrementar", "modo_estrategia",
+            "aporte_temporal", "offset_manual", "meses_aportando",
+        ]),
+        Etapa("saldo_inicial", _nodo_saldo_inicial, [
+            "aportes", "meses", "rendimiento_anual", "incrementar", "inflacion_anual", "detalle",
+        ]),
+        Etapa("sat", etapa_sat, [
+            "aportes", "plazo", "salario_anual", "inflacion_anual", "uma_inicial",
+            "tasa_marginal_isr",
+        ]),
+        Etapa("comprometido", _nodo_comprometido, [
+            "aportes", "sat", "inflacion_anual", "udi_inicial", "rendimiento_anual", "meses",
+            "detalle",
+        ]),
+        Etapa("bono", etapa_bono, ["aporte_bono", "plazo", "detalle"]),
+        Etapa("benchmark", etapa_benchmark, ["aportes", "rendimiento_anual"]),
+        Etapa("total", _nodo_total, ["saldo_inicial", "comprometido", "bono", "sat"]),
+    ])
+
+
+def _nodo_saldo_inicial(aportes, meses, rendimiento_anual, incrementar, inflacion_anual, detalle):
+    # primera mensualidad REAL
+    return etapa_saldo_inicial(aportes[0], meses, rendimiento_anual, incrementar, inflacion_anual,
+                               detalle)
+
+
+def _nodo_comprometido(aportes, sat, inflacion_anual, udi_inicial, rendimiento_anual, meses,
+                       detalle):
+    _sat_por_anio, sat_inyectado = sat
+    return etapa_comprometido(aportes, sat_inyectado, inflacion_anual, udi_inicial,
+                              rendimiento_anual, meses, detalle)
+
+
+def _nodo_total(df_inicial, comprometido, df_bono, sat):
+    df_comp_sin_sat, df_comp_con_sat = comprometido
+    return armar_df_total(df_inicial, df_comp_sin_sat, df_comp_con_sat, df_bono, sat[1])
+
+
+def etf_neto_despues_de_isr(etf_bruto, total_aportado, isr=0.10):
+    """
+    Saldo del ETF ideal después del ISR sobre la ganancia (10%).
+    """
+    return etf_bruto - (etf_bruto - total_aportado) * isr
+
+
+@cache_etapa()
+def etapa_retiros_optimos(capital_base, meses_retiro, rendimiento_anual, tasa_cetes_anual,
+                          inflacion_anual, udi_inicial, avance=None):
+    """
+    Los cuatro retiros óptimos de la pestaña 2 con el solver de Brent
+    (unas 5 simulaciones cada uno): nominal PPR, nominal CETES,
+    indexado PPR, indexado CETES.
+    Regresa (retiros, iteraciones), con las simulaciones de cada búsqueda.
+
+    Para muchos clientes a la vez conviene _retiros_optimos_lote
+    (una sola bisección vectorizada).
+    """
+    busquedas = [
+        (buscar_retiro_optimo_nominal, rendimiento_anual, False),
+        (buscar_retiro_optimo_nominal, tasa_cetes_anual, True),
+        (buscar_retiro_optimo_indexado, rendimiento_anual, False),
+        (buscar_retiro_optimo_indexado, tasa_cetes_anual, True),
+    ]
+    retiros, iteraciones = [], []
+    for i, (buscar, tasa_anual, cetes) in enumerate(busquedas):
+        encontrado = buscar(
+            capital_inicial=capital_base,
+            meses=meses_retiro,
+            inflacion_anual=inflacion_anual,
+            tasa_anual=tasa_anual,
+            udi_inicial=udi_inicial,  # no se usa en CETES, pero no pasa nada
+            cetes=cetes,
+            con_iteraciones=True
+        )
+        retiros.append(encontrado[0])
+        iteraciones.append(encontrado[-1])
+        if avance is not None:
+            avance((i + 1) / len(busquedas), f"búsqueda {i + 1}/{len(busquedas)}")
+    return retiros, iteraciones
+
+
+@cache_etapa()
+def etapa_curvas_nominales(capital_base, meses_retiro, rendimiento_anual, tasa_cetes_anual,
+                           inflacion_anual, udi_inicial, ret_ppr, ret_cet):
+    """
+    Curvas completas del retiro nominal con los retiros óptimos.
+    Regresa (saldos_ppr, mes_ppr, saldos_cet, mes_cet).
+    """
+    saldos_ppr, mes_ppr = simular_retiro_ppr(
+        capital_inicial=capital_base,
+        tasa_anual=rendimiento_anual,
+        inflacion_anual=inflacion_anual,
+        udi_inicial=udi_inicial,
+        meses=meses_retiro,
+        retiro_mensual=ret_ppr,
+    )
+    saldos_cet, mes_cet = simular_retiro_simple(
+        capital_inicial=capital_base,
+        tasa_anual=tasa_cetes_anual,
+        meses=meses_retiro,
+        retiro_mensual=ret_cet,
+    )
+    return saldos_ppr, mes_ppr, saldos_cet, mes_cet
+
+
+@cache_etapa()
+def etapa_curvas_indexadas(capital_base, meses_retiro, rendimiento_anual, tasa_cetes_anual,
+                           inflacion_anual, udi_inicial, ret_ppr, ret_cet):
+    """
+    Curvas completas del retiro indexado con los retiros óptimos.
+    Regresa (saldos_ppr, mensualidades_ppr, saldos_cet, mensualidades_cet).
+    """
+    saldos_ppr, mensualidades_ppr, _ = simular_retiro_ppr_indexado(
+        capital_inicial=capital_base,
+        tasa_anual=rendimiento_anual,
+        inflacion_anual=inflacion_anual,
+        udi_inicial=udi_inicial,
+        meses=meses_retiro,
+        retiro_mensual_inicial=ret_ppr,
+    )
+    saldos_cet, mensualidades_cet, _ = simular_retiro_simple_indexado(
+        capital_inicial=capital_base,
+        tasa_anual=tasa_cetes_anual,
+        inflacion_anual=inflacion_anual,
+        meses=meses_retiro,
+        retiro_mensual_inicial=ret_cet,
+    )
+    return saldos_ppr, mensualidades_ppr, saldos_cet, mensualidades_cet
+
+
+@cache_etapa(max_entradas=32)
+def etapa_montecarlo(**parametros):
+    """
+    Monte Carlo (montecarlo.py) con caché: mismos parámetros y semilla,
+    mismo resultado.
+    """
+    return simular_montecarlo(**parametros)
+
+
+# ---------------------------------------------------------------
+#   Cliente completo sin interfaz (lotes, API, cola de trabajos)
+# ---------------------------------------------------------------
+
+# Valores por defecto de allianz.py; las tasas van en fracción (0.10 = 10%)
+PERFIL_BASE = {
+    "edad": 28,
+    "aportacion": 5000,
+    "plazo": 25,
+    "incrementar": True,
+    "años_aportando": None,        # None = todo el plazo (sin early stop)
+    "modo_estrategia": False,
+    "aporte_temporal": None,       # None = la misma aportación
+    "offset_manual": 0,
+    "rendimiento_anual": 0.10,
+    "inflacion_anual": 0.0499,
+    "udi_inicial": 6.84,
+    "uma_inicial": 108.57,
+    "salario_anual": 600_000,
+    "tasa_marginal_isr": 0.32,
+    "usar_bono": True,
+    "años_retiro": 20,
+    "tasa_cetes_anual": 0.075,
+}
+
+
+def perfil_completo(perfil):
+    """
+    PERFIL_BASE con los campos de 'perfil' encima. Los campos vacíos
+    (None o NaN, p. ej. celdas vacías de un CSV) toman el valor por defecto.
+    Los campos desconocidos se ignoran.
+    """
+    completo = dict(PERFIL_BASE)
+    for campo, valor in perfil.items():
+        if campo in completo and valor is not None and not (isinstance(valor, float) and np.isnan(valor)):
+            completo[campo] = valor
+
+    for campo in ("plazo", "años_retiro"):
+        completo[campo] = int(completo[campo])
+    for campo in ("incrementar", "modo_estrategia", "usar_bono"):
+        completo[campo] = bool(completo[campo])
+    if completo["años_aportando"] is None:
+        completo["años_aportando"] = completo["plazo"]
+    if completo["aporte_temporal"] is None:
+        completo["aporte_temporal"] = completo["aportacion"]
+
+    # Mismos límites que los widgets de allianz.py
+    if completo["aportacion"] < 0:
+        raise ValueError(f"aportacion no puede ser negativa: {completo['aportacion']}")
+    if not 1 <= completo["plazo"] <= 60:
+        raise ValueError(f"plazo fuera de rango (1–60 años): {completo['plazo']}")
+    if not 1 <= completo["años_aportando"] <= completo["plazo"]:
+        raise ValueError(f"años_aportando fuera de rango (1–plazo): {completo['años_aportando']}")
+    if completo["años_retiro"] < 1:
+        raise ValueError(f"años_retiro debe ser al menos 1: {completo['años_retiro']}")
+    return completo
+
+
+def entradas_acumulacion(p):
+    """
+    Entradas de grafo_acumulacion() a partir de un perfil completo,
+    igual que las arma allianz.py con los widgets.
+    """
+    return {
+        "aportacion": p["aportacion"],
+        "meses": p["plazo"] * 12,
+        "plazo": p["plazo"],
+        "inflacion_anual": p["inflacion_anual"],
+        "rendimiento_anual": p["rendimiento_anual"],
+        "incrementar": p["incrementar"],
+        "modo_estrategia": p["modo_estrategia"],
+        "aporte_temporal": p["aporte_temporal"] if p["modo_estrategia"] else p["aportacion"],
+        "offset_manual": p["offset_manual"] if p["modo_estrategia"] else 0,
+        "meses_aportando": int(p["años_aportando"]) * 12,
+        "udi_inicial": p["udi_inicial"],
+        "salario_anual": p["salario_anual"],
+        "uma_inicial": p["uma_inicial"],
+        "tasa_marginal_isr": p["tasa_marginal_isr"],
+        "aporte_bono": p["aportacion"] if p["usar_bono"] else 0,
+        "detalle": True,
+    }
+
+
+_PIPELINE_DEL_PROCESO = None
+
+
+def pipeline_del_proceso():
+    """
+    Grafo de acumulación compartido por todo el proceso (trabajadores de
+    lote_clientes.py y servidor_api.py), reutilizado entre llamadas.
+    """
+    global _PIPELINE_DEL_PROCESO
+    if _PIPELINE_DEL_PROCESO is None:
+        _PIPELINE_DEL_PROCESO = grafo_acumulacion()
+    return _PIPELINE_DEL_PROCESO
+
+
+def _acumulacion_cliente(p, pipeline):
+    """
+    Métricas de acumulación de un perfil completo. Regresa (resultado, df_total).
+    """
+    etapas = pipeline.ejecutar(entradas_acumulacion(p))
+
+    df_total = etapas["total"]
+    total_aportado = float(sum(etapas["aportes"]))
+    saldo_con_sat = float(df_total["Allianz + SAT"].iloc[-1])
+    etf_bruto = float(etapas["benchmark"][-1])
+    etf_neto = etf_neto_despues_de_isr(etf_bruto, total_aportado)
+
+    resultado = {
+        "total_aportado": total_aportado,
+        "saldo_inicial": float(df_total["Inicial"].iloc[-1]),
+        "comprometido_sin_sat": float(df_total["Comprometido_sin_SAT"].iloc[-1]),
+        "comprometido_con_sat": float(df_total["Comprometido_con_SAT"].iloc[-1]),
+        "bono": float(df_total["Bono"].iloc[-1]),
+        "sat_acumulado": float(df_total["SAT_Acumulado"].iloc[-1]),
+        "saldo_allianz_sin_sat": float(df_total["Total Allianz sin SAT"].iloc[-1]),
+        "saldo_allianz_con_sat": saldo_con_sat,
+        "etf_bruto": etf_bruto,
+        "etf_neto": etf_neto,
+        "diferencia_vs_etf_neto": saldo_con_sat - etf_neto,
+    }
+    return resultado, df_total
+
+
+def _agregar_retiros(resultado, p, retiros):
+    """
+    Agrega los cuatro retiros óptimos [nom PPR, nom CETES, ind PPR, ind CETES]
+    en VF y en VP (pesos de hoy).
+    """
+    factor_descuento = (1 + p["inflacion_anual"]) ** p["plazo"]
+    for nombre, retiro in zip(("nominal_ppr", "nominal_cetes", "indexado_ppr", "indexado_cetes"), retiros):
+        resultado[f"retiro_{nombre}"] = float(retiro)
+    for nombre in ("nominal_ppr", "nominal_cetes", "indexado_ppr", "indexado_cetes"):
+        resultado[f"retiro_{nombre}_vp"] = resultado[f"retiro_{nombre}"] / factor_descuento
+    return resultado
+
+
+def _retiros_optimos_lote(clientes):
+    """
+    Los cuatro retiros óptimos [nom PPR, nom CETES, ind PPR, ind CETES] de
+    cada (resultado, perfil) en UNA bisección vectorizada.
+    Regresa un arreglo de forma (clientes, 4).
+    """
+    retiros, _meses_agotado, _iteraciones = buscar_retiro_optimo_lote(
+        capital_inicial=np.repeat([r["saldo_allianz_con_sat"] for r, _p in clientes], 4),
+        meses=np.repeat([p["años_retiro"] * 12 for _r, p in clientes], 4),
+        tasa_anual=[t for _r, p in clientes
+                    for t in (p["rendimiento_anual"], p["tasa_cetes_anual"]) * 2],
+        inflacion_anual=np.repeat([p["inflacion_anual"] for _r, p in clientes], 4),
+        udi_inicial=np.repeat([p["udi_inicial"] for _r, p in clientes], 4),
+        cetes=[False, True, False, True] * len(clientes),
+        indexado=[False, False, True, True] * len(clientes)
+    )
+    return retiros.reshape(-1, 4)
+
+
+def simular_cliente(perfil, tablas=False, pipeline=None):
+    """
+    Pipeline completo de allianz.py para un cliente, sin Streamlit:
+    acumulación (saldo inicial, comprometido sin/con SAT, bono, ETF) y
+    los cuatro retiros óptimos (nominal/indexado, PPR/CETES).
+
+    Regresa un dict de métricas (montos en VF salvo los *_vp). Con
+    tablas=True agrega "tabla_mensual" (el df_total de allianz.py).
+    'pipeline' permite reutilizar un grafo entre clientes del mismo proceso.
+    """
+    p = perfil_completo(perfil)
+    pipeline = pipeline if pipeline is not None else grafo_acumulacion()
+    resultado, df_total = _acumulacion_cliente(p, pipeline)
+
+    # Misma búsqueda que simular_clientes, para que ambos coincidan
+    (retiros,) = _retiros_optimos_lote([(resultado, p)])
+    _agregar_retiros(resultado, p, retiros)
+
+    if tablas:
+        resultado["tabla_mensual"] = df_total
+    return resultado
+
+
+def simular_clientes(perfiles, tablas=False, pipeline=None):
+    """
+    simular_cliente para muchos perfiles: la acumulación corre cliente por
+    cliente, pero los retiros óptimos de todos (4 por cliente) se resuelven
+    en UNA búsqueda vectorizada, que es la parte cara. Los resultados son
+    idénticos a los de simular_cliente.
+
+    Regresa una lista con un dict por perfil, en el mismo orden, con la
+    llave "error": None, o el mensaje si el perfil no se pudo simular
+    (en ese caso el dict solo trae "error").
+    """
+    pipeline = pipeline if pipeline is not None else grafo_acumulacion()
+    resultados, validos = [], []
+    for perfil in perfiles:
+        try:
+            p = perfil_completo(perfil)
+            resultado, df_total = _acumulacion_cliente(p, pipeline)
+        except Exception as e:   # un cliente malo no tumba el lote
+            resultados.append({"error": f"{type(e).__name__}: {e}"})
+            continue
+        resultados.append(resultado)
+        validos.append((resultado, p, df_total))
+
+    if validos:
+        retiros = _retiros_optimos_lote([(r, p) for r, p, _df in validos])
+        for (resultado, p, df_total), cuatro in zip(validos, retiros):
+            _agregar_retiros(resultado, p, cuatro)
+            if tablas:
+                resultado["tabla_mensual"] = df_total
+            resultado["error"] = None
+
+    return resultados
@@ -0,0 +1,172 @@
+import numpy as np
+
+# ================================================================
+#   🧓 Retiro para MUCHOS escenarios a la vez (PPR / CETES)
+# ================================================================
+#
+# Misma lógica que simular_retiro_ppr, simular_retiro_simple y sus
+# variantes _indexado, pero cada paso avanza un vector de escenarios.
+# Cada escenario elige su modelo:
+# - cetes=False → PPR (15 UDIs + 0.1% gestión + IVA)
+# - cetes=True  → CETES / renta fija sin comisiones
+# - indexado=True → el retiro sube una vez al año con la inflación
+
+
+def _vector(valor, n, dtype=float):
+    return np.broadcast_to(np.asarray(valor, dtype=dtype), (n,)).copy()
+
+
+def simular_retiro_vectorizado(
+    capital_inicial,
+    tasa_anual,
+    inflacion_anual,
+    udi_inicial,
+    meses,
+    retiro_mensual,
+    cetes=False,
+    indexado=False,
+    sin_piso=False,
+    detalle=False
+):
+    """
+    Simula el retiro de todos los escenarios y regresa
+    (saldo_final, mes_agotado), ambos como arreglos por escenario.
+
+    Todos los parámetros aceptan escalares o arreglos.
+    Con sin_piso=True el saldo puede quedar negativo.
+    Con detalle=True regresa (saldo_final, mes_agotado, tablas): matrices
+    (meses × escenarios) "Saldo Final", "Retiro" y "Comisiones" (cargo
+    fijo + gestión con IVA, en positivo), NaN después del plazo de cada
+    escenario. El retiro cuenta completo en cada mes con saldo al inicio.
+    """
+    n = int(np.broadcast(
+        *[np.asarray(v) for v in (capital_inicial, tasa_anual, inflacion_anual,
+                                  udi_inicial, meses, retiro_mensual, cetes, indexado)]
+    ).size)
+
+    saldo = _vector(capital_inicial, n)
+    # Escenario por escenario con pow de Python: idéntica a la versión escalar
+    tasa_mensual = np.array([(1 + t) ** (1/12) - 1 for t in _vector(tasa_anual, n)])
+    inflacion = _vector(inflacion_anual, n)
+    udi_actual = _vector(udi_inicial, n)
+    plazo = _vector(meses, n, int)
+    retiro = _vector(retiro_mensual, n)
+    cetes = _vector(cetes, n, bool)
+    indexado = _vector(indexado, n, bool)
+
+    mes_agotado = np.where(saldo <= 0, 0, plazo)
+    vivo = saldo > 0
+
+    total_meses = int(plazo.max(initial=0))
+    if detalle:
+        tablas = {c: np.full((total_meses, n), np.nan) for c in ("Saldo Final", "Retiro", "Comisiones")}
+
+    for mes in range(1, total_meses + 1):
+        activo = mes <= plazo
+        con_saldo = activo & (saldo > 0)
+
+        # CETES: sin comisiones
+        saldo_cetes = saldo * (1 + tasa_mensual) - retiro
+
+        # PPR: rendimiento, 15 UDIs + IVA, retiro y gestión 0.1% + IVA
+        cargo_fijo = 15 * udi_actual * (1 + inflacion) * 1.16
+        base = saldo + saldo * tasa_mensual - cargo_fijo - retiro
+        saldo_ppr = base - base * 0.001 * 1.16
+
+        nuevo = np.where(cetes, saldo_cetes, saldo_ppr)
+        if not sin_piso:
+            nuevo = np.maximum(nuevo, 0.0)
+
+        saldo = np.where(activo, nuevo, saldo)
+
+        if detalle:
+            comisiones = np.where(cetes, 0.0, cargo_fijo + base * 0.001 * 1.16)
+            tablas["Saldo Final"][mes - 1] = np.where(activo, saldo, np.nan)
+            tablas["Retiro"][mes - 1] = np.where(con_saldo, retiro, np.where(activo, 0.0, np.nan))
+            tablas["Comisiones"][mes - 1] = np.where(con_saldo, comisiones, np.where(activo, 0.0, np.nan))
+
+        recien_agotado = activo & vivo & (saldo <= 0)
+        mes_agotado = np.where(recien_agotado, mes, mes_agotado)
+        vivo &= ~recien_agotado
+
+        if mes % 12 == 0:
+            udi_actual = udi_actual * (1 + inflacion)
+            retiro = np.where(indexado, retiro * (1 + inflacion), retiro)
+
+    if detalle:
+        return saldo, mes_agotado, tablas
+    return saldo, mes_agotado
+
+
+def buscar_retiro_optimo_lote(
+    capital_inicial,
+    meses,
+    tasa_anual,
+    inflacion_anual,
+    udi_inicial,
+    cetes=False,
+    indexado=False,
+    tol_pesos=0.01,
+    max_iter=80,
+    avance=None
+):
+    """
+    Resuelve muchos problemas de retiro máximo a la vez con bisección
+    vectorizada: en cada iteración se avanzan juntos todos los intervalos
+    que todavía no convergen.
+
+    Regresa (retiro, mes_agotado, iteraciones):
+    - retiro: retiro mensual (inicial, si es indexado) máximo por escenario
+    - mes_agotado: mes de agotamiento con ese retiro
+    - iteraciones: número de pasadas vectorizadas
+
+    'avance(fraccion, mensaje)' se llama en cada pasada (ejecutor.py).
+    """
+    n = int(np.broadcast(
+        *[np.asarray(v) for v in (capital_inicial, meses, tasa_anual, inflacion_anual,
+                                  udi_inicial, cetes, indexado)]
+    ).size)
+
+    parametros = {
+        "capital_inicial": _vector(capital_inicial, n),
+        "tasa_anual": _vector(tasa_anual, n),
+        "inflacion_anual": _vector(inflacion_anual, n),
+        "udi_inicial": _vector(udi_inicial, n),
+        "meses": _vector(meses, n, int),
+        "cetes": _vector(cetes, n, bool),
+        "indexado": _vector(indexado, n, bool),
+    }
+
+    def sobra_dinero(retiro, idx):
+        if avance is not None:
+            avance(iteraciones / max_iter, f"{idx.size} búsquedas activas")
+        subset = {k: v[idx] for k, v in parametros.items()}
+        saldo, _ = simular_retiro_vectorizado(retiro_mensual=retiro, sin_piso=True, **subset)
+        return saldo > 0
+
+    low = np.zeros(n)
+    high = parametros["capital_inicial"] / parametros["meses"] * 2  # cota superior burda
+    iteraciones = 0
+
+    # 1) Ampliar la cota superior donde todavía sobra dinero
+    idx = np.flatnonzero(high > 0)
+    while idx.size and iteraciones < max_iter:
+        iteraciones += 1
+        sobra = sobra_dinero(high[idx], idx)
+        low[idx[sobra]] = high[idx[sobra]]
+        high[idx[sobra]] *= 2
+        idx = idx[sobra]
+
+    # 2) Bisección simultánea
+    idx = np.flatnonzero(high - low > tol_pesos)
+    while idx.size and iteraciones < max_iter:
+        iteraciones += 1
+        mid = (low[idx] + high[idx]) / 2
+        sobra = sobra_dinero(mid, idx)
+        low[idx[sobra]] = mid[sobra]
+        high[idx[~sobra]] = mid[~sobra]
+        idx = idx[high[idx] - low[idx] > tol_pesos]
+
+    _, mes_agotado = simular_retiro_vectorizado(retiro_mensual=low, **parametros)
+
+    return low, mes_agotado, iteraciones
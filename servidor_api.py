@@ -0,0 +1,318 @@
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ================================================================
+#   🌐 API local de simulación (HTTP + JSON)
+# ================================================================
+#
+# Servicio para que otras herramientas internas llamen al simulador sin
+# Streamlit. Solo escucha en localhost (127.0.0.1 por defecto), así que
+# se puede levantar y someter a pruebas de carga en CI.
+#
+# - Un pool de procesos se calienta al arrancar: cada trabajador importa
+#   el núcleo y corre una simulación antes de aceptar solicitudes.
+# - Las solicitudes concurrentes se agrupan: el agrupador junta los
+#   escenarios que llegan dentro de una ventana corta, o mientras todos
+#   los trabajadores están ocupados (hasta llenar un lote), y los manda
+#   juntos a un trabajador, que resuelve todos los retiros óptimos en una
+#   sola búsqueda vectorizada (pipeline_allianz.simular_clientes).
+#
+# Escenario: los parámetros de parametros_actuales_json (edad_actual,
+# edad_retiro, edad_final, pension_hoy, inflacion, rendimiento,
+# aporte_inicial, aportes_crecen) y/o los de pipeline_allianz.PERFIL_BASE.
+# Los campos de Allianz que falten se toman de los de simulation.py.
+#
+#   POST /simular  {"escenario": {...}, "tablas": false}
+#                  {"escenarios": [{...}, ...], "tablas": true}
+#   GET  /salud    estado del pool y tamaño promedio de los lotes
+#
+# Uso:
+#   python servidor_api.py --puerto 8765 --procesos 4
+#   curl -s localhost:8765/simular -d '{"escenario": {"edad_actual": 30, "edad_retiro": 60}}'
+
+MAX_LOTE = 64          # escenarios por lote enviado a un trabajador
+ESPERA_MS = 5          # ventana para juntar solicitudes concurrentes
+TIEMPO_MAXIMO = 120    # segundos que una solicitud espera su resultado
+
+PARAMETROS_PENSION = (
+    "edad_actual", "edad_retiro", "edad_final", "pension_hoy",
+    "inflacion", "rendimiento", "aporte_inicial", "aportes_crecen",
+)
+
+
+def perfil_desde_escenario(escenario):
+    """
+    Perfil de Allianz de un escenario: los campos de PERFIL_BASE tal
+    cual y, si faltan, los equivalentes de simulation.py.
+    """
+    perfil = dict(escenario)
+    equivalencias = {
+        "edad": "edad_actual",
+        "aportacion": "aporte_inicial",
+        "inflacion_anual": "inflacion",
+        "rendimiento_anual": "rendimiento",
+        "incrementar": "aportes_crecen",
+    }
+    for campo, origen in equivalencias.items():
+        if campo not in perfil and origen in escenario:
+            perfil[campo] = escenario[origen]
+    if "plazo" not in perfil and "edad_retiro" in escenario and "edad_actual" in escenario:
+        perfil["plazo"] = escenario["edad_retiro"] - escenario["edad_actual"]
+    if "años_retiro" not in perfil and "edad_final" in escenario and "edad_retiro" in escenario:
+        perfil["años_retiro"] = escenario["edad_final"] - escenario["edad_retiro"]
+    return perfil
+
+
+def _tabla_json(df):
+    """
+    DataFrame como {"columns": [...], "data": [[...], ...]} con tipos de JSON.
+    """
+    return json.loads(df.to_json(orient="split", index=False))
+
+
+def _atender_lote(escenarios, con_tablas):
+    """
+    Trabajo de un proceso del pool: todos los escenarios de un lote.
+    Regresa una respuesta (dict) por escenario, en el mismo orden.
+    """
+    from nucleo_simulacion import resumen_pension, simula_acumulacion
+    from pipeline_allianz import pipeline_del_proceso, simular_clientes
+
+    allianz = simular_clientes(
+        [perfil_desde_escenario(e) for e in escenarios],
+        tablas=any(con_tablas),
+        pipeline=pipeline_del_proceso()
+    )
+
+    respuestas = []
+    for escenario, tablas, resultado in zip(escenarios, con_tablas, allianz):
+        respuesta = {"error": resultado.pop("error")}
+        tabla_allianz = resultado.pop("tabla_mensual", None)
+        respuesta["allianz"] = resultado if respuesta["error"] is None else None
+
+        # Métricas de simulation.py, solo si vienen todos sus parámetros
+        respuesta["pension"] = None
+        if all(campo in escenario for campo in PARAMETROS_PENSION):
+            parametros = {campo: escenario[campo] for campo in PARAMETROS_PENSION}
+            try:
+                respuesta["pension"] = resumen_pension(**parametros)
+            except Exception as e:
+                respuesta["error"] = respuesta["error"] or f"{type(e).__name__}: {e}"
+
+        if tablas:
+            respuesta["tablas"] = {}
+            if tabla_allianz is not None:
+                respuesta["tablas"]["allianz_mensual"] = _tabla_json(tabla_allianz)
+            if respuesta["pension"] is not None:
+                _saldo, df = simula_acumulacion(
+                    escenario["edad_retiro"] - escenario["edad_actual"], escenario["inflacion"],
+                    escenario["rendimiento"], escenario["aporte_inicial"], escenario["aportes_crecen"]
+                )
+                respuesta["tablas"]["acumulacion_mensual"] = _tabla_json(df)
+        respuestas.append(respuesta)
+    return respuestas
+
+
+def _calentar_trabajador():
+    """
+    Inicializador del pool: importa el núcleo y llena las cachés de
+    arranque (grafo, kernels) con una simulación de los valores por defecto.
+    """
+    _atender_lote([{}], [False])
+
+
+def _listo():
+    return os.getpid()
+
+
+class AgrupadorSolicitudes:
+    """
+    Junta escenarios que llegan de hilos distintos y los manda al pool en
+    lotes de hasta 'max_lote', esperando a lo más 'espera_ms' por más.
+
+    Hay a lo más 'procesos' lotes en vuelo: mientras todos los
+    trabajadores están ocupados, la cola crece y el siguiente lote sale
+    más grande (bajo carga, más escenarios por búsqueda vectorizada).
+    """
+
+    def __init__(self, pool, procesos, max_lote=MAX_LOTE, espera_ms=ESPERA_MS):
+        self._pool = pool
+        self._libres = threading.Semaphore(procesos)
+        self.max_lote = max_lote
+        self.espera = espera_ms / 1000
+        self._cola = queue.Queue()
+        self.lotes = 0
+        self.escenarios = 0
+        self._hilo = threading.Thread(target=self._bucle, name="agrupador", daemon=True)
+        self._hilo.start()
+
+    def enviar(self, escenario, tablas=False):
+        """
+        Encola un escenario. Regresa un Future con su respuesta.
+        """
+        futuro = Future()
+        self._cola.put((escenario, tablas, futuro))
+        return futuro
+
+    def cerrar(self):
+        self._cola.put(None)
+        self._hilo.join()
+
+    def _bucle(self):
+        while True:
+            primero = self._cola.get()
+            if primero is None:
+                return
+            self._libres.acquire()
+            lote = [primero]
+            limite = time.monotonic() + self.espera
+            while len(lote) < self.max_lote:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    siguiente = self._cola.get(timeout=restante)
+                except queue.Empty:
+                    break
+                if siguiente is None:
+                    self._despachar(lote)
+                    return
+                lote.append(siguiente)
+            self._despachar(lote)
+
+    def _despachar(self, lote):
+        self.lotes += 1
+        self.escenarios += len(lote)
+        trabajo = self._pool.submit(
+            _atender_lote, [escenario for escenario, _t, _f in lote], [tablas for _e, tablas, _f in lote]
+        )
+
+        def repartir(trabajo):
+            self._libres.release()
+            try:
+                respuestas = trabajo.result()
+            except Exception as e:   # p. ej. un trabajador murió: falla todo el lote
+                for _e, _t, futuro in lote:
+                    futuro.set_exception(e)
+                return
+            for (_e, _t, futuro), respuesta in zip(lote, respuestas):
+                futuro.set_result(respuesta)
+
+        trabajo.add_done_callback(repartir)
+
+
+class _Manejador(BaseHTTPRequestHandler):
+    server_version = "PPRSimulador/1.5"
+
+    def _responder(self, estado, cuerpo):
+        datos = json.dumps(cuerpo, ensure_ascii=False).encode("utf-8")
+        self.send_response(estado)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def do_GET(self):
+        if self.path != "/salud":
+            return self._responder(404, {"error": f"Ruta desconocida: {self.path}"})
+        agrupador = self.server.agrupador
+        self._responder(200, {
+            "estado": "ok",
+            "procesos": self.server.procesos,
+            "lotes": agrupador.lotes,
+            "escenarios": agrupador.escenarios,
+            "escenarios_por_lote": agrupador.escenarios / agrupador.lotes if agrupador.lotes else 0.0,
+        })
+
+    def do_POST(self):
+        if self.path != "/simular":
+            return self._responder(404, {"error": f"Ruta desconocida: {self.path}"})
+        try:
+            largo = int(self.headers.get("Content-Length", 0))
+            cuerpo = json.loads(self.rfile.read(largo) or b"{}")
+            tablas = bool(cuerpo.get("tablas", False))
+            if "escenarios" in cuerpo:
+                escenarios, uno = list(cuerpo["escenarios"]), False
+            else:
+                escenarios, uno = [cuerpo.get("escenario", {})], True
+            if not all(isinstance(e, dict) for e in escenarios):
+                raise ValueError("cada escenario debe ser un objeto JSON")
+        except (ValueError, AttributeError, TypeError) as e:
+            return self._responder(400, {"error": f"Solicitud inválida: {e}"})
+
+        futuros = [self.server.agrupador.enviar(e, tablas) for e in escenarios]
+        _hechos, pendientes = wait(futuros, timeout=TIEMPO_MAXIMO)
+        if pendientes:
+            return self._responder(504, {"error": "La simulación tardó demasiado"})
+        try:
+            respuestas = [f.result() for f in futuros]
+        except Exception as e:
+            return self._responder(500, {"error": f"{type(e).__name__}: {e}"})
+
+        self._responder(200, respuestas[0] if uno else {"resultados": respuestas})
+
+    def log_message(self, formato, *args):
+        if self.server.registrar:
+            super().log_message(formato, *args)
+
+
+class ServidorSimulacion(ThreadingHTTPServer):
+    """
+    Servidor HTTP con su pool de procesos (ya caliente) y su agrupador.
+    puerto=0 elige un puerto libre (ver server_address).
+    """
+
+    daemon_threads = True
+    request_queue_size = 128   # conexiones en espera (pruebas de carga)
+
+    def __init__(self, host="127.0.0.1", puerto=0, procesos=None, max_lote=MAX_LOTE,
+                 espera_ms=ESPERA_MS, registrar=False):
+        self.procesos = procesos or os.cpu_count() or 1
+        self.registrar = registrar
+
+        # El pool se crea y calienta antes de abrir el socket y los hilos
+        self.pool = ProcessPoolExecutor(max_workers=self.procesos, initializer=_calentar_trabajador)
+        wait([self.pool.submit(_listo) for _ in range(self.procesos)])
+        self.agrupador = AgrupadorSolicitudes(self.pool, self.procesos, max_lote, espera_ms)
+
+        super().__init__((host, puerto), _Manejador)
+
+    def server_close(self):
+        super().server_close()
+        self.agrupador.cerrar()
+        self.pool.shutdown(cancel_futures=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="API HTTP local del simulador PPR.")
+    parser.add_argument("--host", default="127.0.0.1", help="Interfaz (default: 127.0.0.1)")
+    parser.add_argument("--puerto", type=int, default=8765, help="Puerto (0 = uno libre)")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos del pool (default: núcleos)")
+    parser.add_argument("--lote", type=int, default=MAX_LOTE, help=f"Escenarios por lote (default: {MAX_LOTE})")
+    parser.add_argument("--espera-ms", type=float, default=ESPERA_MS,
+                        help=f"Ventana para agrupar solicitudes (default: {ESPERA_MS} ms)")
+    parser.add_argument("--registrar", action="store_true", help="Imprime cada solicitud")
+    args = parser.parse_args(argv)
+
+    servidor = ServidorSimulacion(args.host, args.puerto, args.procesos, args.lote,
+                                  args.espera_ms, args.registrar)
+    host, puerto = servidor.server_address[:2]
+    print(f"Escuchando en http://{host}:{puerto} ({servidor.procesos} procesos)", file=sys.stderr, flush=True)
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
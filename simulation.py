@@ -1,357 +1,31 @@
 import streamlit as st
-import numpy as np
 import pandas as pd
-import math
 import plotly.graph_objects as go
-import plotly.express as px
-import altair as alt
-import io
 import json
 
-
-# -----------------------
-# Funciones financieras
-# -----------------------
-
-def export_excel_completo(
-    df_acum=None,
-    df_resumen=None,
-    df_ret=None,
-    df_sens=None,
-    df_adv=None,
-    df_retiro=None,
-    params=None
-):
-    buffer = io.BytesIO()
-    with pd.ExcelWriter(buffer, engine="xlsxwriter") as writer:
-
-        if df_acum is not None:
-            df_acum.to_excel(writer, sheet_name="Acumulación", index=False)
-
-        if df_resumen is not None:
-            df_resumen.to_excel(writer, sheet_name="Valor Presente", index=False)
-
-        if df_ret is not None:
-            df_ret.to_excel(writer, sheet_name="Edades Retiro", index=False)
-
-        if df_sens is not None:
-            df_sens.to_excel(writer, sheet_name="Sensibilidad", index=False)
-
-        if df_adv is not None:
-            df_adv.to_excel(writer, sheet_name="Estrategia Avanzada", index=False)
-
-        if df_retiro is not None:
-            df_retiro.to_excel(writer, sheet_name="Retiro Mes a Mes", index=False)
-
-        if params is not None:
-            pd.DataFrame(params.items(), columns=["Parámetro", "Valor"]).to_excel(
-                writer, sheet_name="Parámetros", index=False
-            )
-
-    return buffer.getvalue()
-
-
-def export_df_to_csv(df):
-    return df.to_csv(index=False).encode("utf-8")
-
-def export_df_to_excel(df):
-    buffer = io.BytesIO()
-    with pd.ExcelWriter(buffer, engine="xlsxwriter") as writer:
-        df.to_excel(writer, index=False, sheet_name="Hoja1")
-    return buffer.getvalue()
-
-def parametros_actuales_json(
-        edad_actual, edad_retiro, edad_final,
-        pension_hoy, inflacion, rendimiento,
-        aporte_inicial, aportes_crecen
-):
-    return {
-        "edad_actual": edad_actual,
-        "edad_retiro": edad_retiro,
-        "edad_final": edad_final,
-        "pension_hoy": pension_hoy,
-        "inflacion": inflacion,
-        "rendimiento": rendimiento,
-        "aporte_inicial": aporte_inicial,
-        "aportes_crecen": aportes_crecen,
-    }
-
-def simula_retiro_mes_a_mes(capital_inicial, años_retiro, inflacion_anual, rendimiento_anual, pension_mensual_inicial):
-    """
-    Simula mes a mes el periodo de retiro:
-    - saldo
-    - pensión que sube con inflación
-    - intereses mensuales
-    """
-
-    meses = años_retiro * 12
-    infl_m = tasa_mensual(inflacion_anual)
-    rend_m = tasa_mensual(rendimiento_anual)
-
-    saldo = capital_inicial
-    pension = pension_mensual_inicial
-
-    registros = []
-
-    for m in range(meses):
-        saldo_inicial = saldo
-
-        # Retiro del mes
-        saldo -= pension
-
-        # Si ya no queda saldo → límite
-        if saldo <= 0:
-            registros.append((m, saldo_inicial, pension, 0, 0))
-            saldo = 0
-            break
-
-        # Rendimiento del mes
-        interes = saldo * rend_m
-        saldo += interes
-
-        registros.append((m, saldo_inicial, pension, interes, saldo))
-
-        # Aumenta la pensión según inflación mensual
-        pension *= (1 + infl_m)
-
-    df = pd.DataFrame(registros, columns=[
-        "Mes", "Saldo inicial", "Pensión mensual", "Interés ganado", "Saldo final"
-    ])
-
-    return df
-
-
-def aplica_crecimiento_inflacion_back(aportes, inflacion_anual, activar):
-    """
-    Toma una lista de aportes definidos en pesos de HOY y, si 'activar' es True,
-    los ajusta por inflación acumulada mes a mes.
-    Es decir: aporte_real[m] = aporte_base[m] * (1 + infl_m)^m
-    """
-    if not activar:
-        return aportes
-
-    infl_m = tasa_mensual(inflacion_anual)
-    aportes_ajustados = [
-        aporte * ((1 + infl_m) ** i)
-        for i, aporte in enumerate(aportes)
-    ]
-    return aportes_ajustados
-
-def aplica_crecimiento_inflacion(aportes, inflacion_anual, activar):
-    if not activar:
-        return aportes
-
-    lista = []
-    for m, aporte in enumerate(aportes):
-        años_transcurridos = m // 12
-        aporte_real = aporte * ((1 + inflacion_anual) ** años_transcurridos)
-        lista.append(aporte_real)
-
-    return lista
-
-def estrategia_front_loaded(años_a_retiro, aporte_normal, aporte_alto, años_front):
-    meses = años_a_retiro * 12
-    lista = []
-    for m in range(meses):
-        if m < años_front * 12:
-            lista.append(aporte_alto)
-        else:
-            lista.append(aporte_normal)
-    return lista
-
-def estrategia_back_loaded(años_a_retiro, aporte_bajo, aporte_alto, años_bajo):
-    meses = años_a_retiro * 12
-    lista = []
-    for m in range(meses):
-        if m < años_bajo * 12:
-            lista.append(aporte_bajo)
-        else:
-            lista.append(aporte_alto)
-    return lista
-
-def estrategia_crecimiento_salarial(años_a_retiro, aporte_inicial, crecimiento_anual, inflacion_anual=None):
-    meses = años_a_retiro * 12
-    lista = []
-    aporte = aporte_inicial
-    g_m = tasa_mensual(crecimiento_anual)
-    infl_m = tasa_mensual(inflacion_anual) if inflacion_anual else 0
-
-    for m in range(meses):
-        lista.append(aporte)
-        aporte *= (1 + g_m + infl_m)
-
-    return lista
-
-def simula_aportes_personalizados(aportes, inflacion_anual, rendimiento_anual):
-    saldo = 0
-    r_m = tasa_mensual(rendimiento_anual)
-
-    registros = []
-    for m, aporte in enumerate(aportes):
-        saldo += aporte
-        saldo *= (1 + r_m)
-        registros.append((m, saldo, aporte))
-
-    return saldo, pd.DataFrame(registros, columns=["Mes", "Saldo", "Aporte"])
-
-
-def calcula_pension_scenario(años_a, años_r, infl, rend, aporte_mensual, aportes_crecen):
-    """
-    Helper para calcular pensión alcanzable en un escenario dado.
-    Regresa: saldo_al_retiro, pension_mensual_nominal, pension_mensual_valor_presente
-    """
-    if años_a <= 0 or años_r <= 0:
-        return None, None, None
-
-    saldo_s, _df_s = simula_acumulacion(años_a, infl, rend, aporte_mensual, aportes_crecen)
-    pension_alc_s = pension_alcanzable_desde_capital(saldo_s, años_r, infl, rend)
-    vp_alc_s = valor_presente(pension_alc_s, infl, años_a)
-    return saldo_s, pension_alc_s, vp_alc_s
-
-def valor_presente(valor_futuro, inflacion_anual, años):
-    return valor_futuro / ((1 + inflacion_anual) ** años)
-
-def pension_alcanzable_desde_capital(K, años_retiro, inflacion_anual, rendimiento_anual):
-    r = rendimiento_anual
-    g = inflacion_anual
-    N = años_retiro
-
-    if abs(r - g) < 1e-8:
-        P0_anual = K * (r) / N
-    else:
-        P0_anual = K * (r - g) / (1 - ((1 + g) / (1 + r)) ** N)
-
-    return P0_anual / 12
-
-def tasa_mensual(tasa_anual):
-    return (1 + tasa_anual) ** (1 / 12) - 1
-
-def capital_necesario_para_pension(
-        pension_mensual_hoy,
-        años_a_retiro,
-        años_retiro,
-        inflacion_anual,
-        rendimiento_anual
-):
-    pension_mensual_retiro = pension_mensual_hoy * (1 + inflacion_anual) ** años_a_retiro
-    P0 = pension_mensual_retiro * 12
-    g = inflacion_anual
-    r = rendimiento_anual
-    N = años_retiro
-
-    if abs(r - g) < 1e-8:
-        K = P0 * N / (1 + r)
-    else:
-        K = P0 * (1 - ((1 + g) / (1 + r)) ** N) / (r - g)
-
-    return K, pension_mensual_retiro
-
-def simula_acumulacion(años, inflacion_anual, rendimiento_anual, aporte_inicial, aportes_crecen):
-    meses = años * 12
-    r_m = tasa_mensual(rendimiento_anual)
-    g_m = tasa_mensual(inflacion_anual)
-
-    saldo = 0.0
-    aporte = aporte_inicial
-    registros = []
-
-    for m in range(meses):
-        saldo += aporte
-        saldo *= (1 + r_m)
-
-        registros.append((m, saldo, aporte))
-
-        # Solo incrementar aportes una vez por AÑO, no por mes
-        if aportes_crecen:
-            # si estamos en el primer mes de cada año (m % 12 == 0 y m > 0)
-            if m > 0 and m % 12 == 0:
-                aporte *= (1 + inflacion_anual)
-
-    df = pd.DataFrame(registros, columns=["Mes", "Saldo", "Aporte"])
-    return saldo, df
-
-def simula_acumulacion_allianz(años, inflacion_anual, rendimiento_anual, aporte_inicial, aportes_crecen, precio_actual_udi):
-    meses = años * 12
-    r_m = tasa_mensual(rendimiento_anual)
-    g_m = tasa_mensual(inflacion_anual)
-
-    saldo = 0.0
-    aporte = aporte_inicial
-    registros = []
-
-    for m in range(meses):
-        saldo += aporte
-        saldo *= (1 + r_m)
-        saldo = saldo - precio_actual_udi * 15  # costo mensual del seguro de vida
-        registros.append((m, saldo, aporte))
-
-        # Solo incrementar aportes una vez por AÑO, no por mes
-        if aportes_crecen:
-            # si estamos en el primer mes de cada año (m % 12 == 0 y m > 0)
-            if m > 0 and m % 12 == 0:
-                aporte *= (1 + inflacion_anual)
-        if m > 0 and m % 12 == 0:
-            precio_actual_udi  *= (1 + inflacion_anual)
-
-    df = pd.DataFrame(registros, columns=["Mes", "Saldo", "Aporte"])
-    return saldo, df
-
-
-def simula_allianz_con_sat(
-    años,
-    inflacion_anual,
-    rendimiento_anual,
-    aporte_inicial,
-    aportes_crecen,
-    precio_actual_udi,
-    tasa_marginal_isr,
-    reinvertir_sat
-):
-    meses = años * 12
-    r_m = tasa_mensual(rendimiento_anual)
-
-    saldo = 0.0
-    aporte = aporte_inicial
-    precio_udi = precio_actual_udi
-    devolucion_acumulada = 0.0  # solo para gráfica individual del SAT
-
-    registros = []
-
-    for m in range(meses):
-        # ---- Aporte mensual ----
-        saldo += aporte
-
-        # ---- Rendimiento mensual ----
-        saldo *= (1 + r_m)
-
-        # ---- Comisión mensual de 15 UDIS ----
-        saldo -= precio_udi * 15
-
-        # ---- Cada año ocurre esto ----
-        if (m + 1) % 12 == 0:
-            # Aumento del aporte
-            if aportes_crecen:
-                aporte *= (1 + inflacion_anual)
-
-            # Aumento del precio UDI
-            precio_udi *= (1 + inflacion_anual)
-
-            # Cálculo de devolución SAT anual
-            devolucion_anual = aporte_inicial * 12 * tasa_marginal_isr
-            devolucion_acumulada += devolucion_anual
-
-            # Reinvertir o no la devolución
-            if reinvertir_sat:
-                saldo += devolucion_anual
-
-        registros.append((m, saldo, devolucion_acumulada))
-
-    df = pd.DataFrame(
-        registros,
-        columns=["Mes", "Saldo_Allianz_SAT", "SAT_Acumulado"]
-    )
-
-    return saldo, df
+from nucleo_simulacion import (
+    parametros_actuales_json,
+    simula_retiro_mes_a_mes,
+    aplica_crecimiento_inflacion_back,
+    aplica_crecimiento_inflacion,
+    estrategia_front_loaded,
+    estrategia_back_loaded,
+    estrategia_crecimiento_salarial,
+    simula_aportes_personalizados,
+    calcula_pension_scenario,
+    valor_presente,
+    pension_alcanzable_desde_capital,
+    capital_necesario_para_pension,
+    simula_acumulacion,
+    simula_acumulacion_allianz,
+    simula_allianz_con_sat,
+    barrido_edades_retiro
+)
+from ejecutor import despachador_de_sesion, esperar_en_streamlit
+from exportaciones import boton_descarga
+from graficas import Grafica, figura_cacheada, mostrar_grafica
+from paginacion import mostrar_detalle_mensual
+from tablas import resumen_anual
 
 
 # -----------------------
@@ -414,6 +88,10 @@ tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8 = st.tabs([
 with tab1:
     st.header("📈 Evolución del ahorro hasta el retiro")
 
+    # Altair solo se usa en esta gráfica: se importa aquí y no al arrancar
+    # (python benchmark_importacion.py --perfil simulation)
+    import altair as alt
+
     # Gráfica con dos líneas
     line_saldo = alt.Chart(df).mark_line(color="#1f77b4", strokeWidth=3).encode(
         x="Mes",
@@ -438,8 +116,9 @@ with tab1:
     st.markdown(f"**Aportes totales:** ${df['Aportes acumulados'].iloc[-1]:,.2f}")
     st.markdown(f"**Interés compuesto generado:** ${saldo - df['Aportes acumulados'].iloc[-1]:,.2f}")
 
-    with st.expander("📄 Ver tabla completa"):
-        st.dataframe(df)
+    st.subheader("📄 Resumen por año")
+    st.dataframe(resumen_anual(df), hide_index=True)
+    mostrar_detalle_mensual(df, clave="acumulacion")
 
 
 # ================
@@ -464,18 +143,22 @@ with tab2:
     objetivo = pension_retiro
     actual = pension_alcanzada
 
-    if actual >= objetivo:
-        fig = go.Figure(data=[
-            go.Bar(name='Objetivo', x=['Pensión'], y=[objetivo], marker_color='lightblue'),
-            go.Bar(name='Extra', x=['Pensión'], y=[actual - objetivo], marker_color='green')
-        ])
-    else:
-        fig = go.Figure(data=[
-            go.Bar(name='Alcanzado', x=['Pensión'], y=[actual], marker_color='lightblue'),
-            go.Bar(name='Falta', x=['Pensión'], y=[objetivo - actual], marker_color='red')
-        ])
+    def figura_pension(objetivo, actual):
+        if actual >= objetivo:
+            fig = go.Figure(data=[
+                go.Bar(name='Objetivo', x=['Pensión'], y=[objetivo], marker_color='lightblue'),
+                go.Bar(name='Extra', x=['Pensión'], y=[actual - objetivo], marker_color='green')
+            ])
+        else:
+            fig = go.Figure(data=[
+                go.Bar(name='Alcanzado', x=['Pensión'], y=[actual], marker_color='lightblue'),
+                go.Bar(name='Falta', x=['Pensión'], y=[objetivo - actual], marker_color='red')
+            ])
 
-    fig.update_layout(barmode='stack', yaxis_title="Pesos mensuales")
+        fig.update_layout(barmode='stack', yaxis_title="Pesos mensuales")
+        return fig
+
+    fig = figura_cacheada(figura_pension, objetivo=objetivo, actual=actual)
     st.plotly_chart(fig, use_container_width=True)
 
 # ================
@@ -495,39 +178,14 @@ with tab3:
 
     edades = list(range(min_edad, max_edad + 1))
 
-    resultados = []
-
-    for retiro_ed in edades:
-        años_a = retiro_ed - edad_actual
-        años_r = edad_final - retiro_ed
-
-        if años_a <= 0:
-            continue
-
-        # Simular acumulación para esta edad
-        saldo_temp, df_temp = simula_acumulacion(años_a, inflacion, rendimiento, aporte_inicial, aportes_crecen)
-
-        # Pensión objetivo y alcanzada
-        cap_obj_temp, pension_ret_temp = capital_necesario_para_pension(
-            pension_hoy, años_a, años_r, inflacion, rendimiento
-        )
-
-        pension_alc_temp = pension_alcanzable_desde_capital(saldo_temp, años_r, inflacion, rendimiento)
-
-        # Valor presente
-        vp_obj_temp = valor_presente(pension_ret_temp, inflacion, años_a)
-        vp_alc_temp = valor_presente(pension_alc_temp, inflacion, años_a)
-
-        resultados.append({
-            "Edad de retiro": retiro_ed,
-            "% objetivo nominal": pension_alc_temp / pension_ret_temp * 100,
-            "Pensión alcanzada (nominal)": pension_alc_temp,
-            "Pensión objetivo (nominal)": pension_ret_temp,
-            "Saldo acumulado": saldo_temp,
-            "% objetivo en valor presente": vp_alc_temp / vp_obj_temp * 100,
-            "Pensión alcanzada (hoy)": vp_alc_temp,
-            "Pensión objetivo (hoy)": vp_obj_temp,
-        })
+    # El barrido corre en segundo plano: si cambian los sliders, el
+    # trabajo viejo se cancela y se reemplaza
+    trabajo = despachador_de_sesion().enviar(
+        "barrido_edades", barrido_edades_retiro,
+        edades, edad_actual, edad_final, inflacion, rendimiento, aporte_inicial,
+        aportes_crecen, pension_hoy
+    )
+    resultados = esperar_en_streamlit(trabajo, "Simulando edades de retiro…")
 
     df_ret = pd.DataFrame(resultados)
 
@@ -535,27 +193,14 @@ with tab3:
     st.dataframe(df_ret)
 
     # Gráfica principal
-    fig = go.Figure()
-
-    fig.add_trace(go.Scatter(
-        x=df_ret["Edad de retiro"],
-        y=df_ret["% objetivo nominal"],
-        mode="lines+markers",
-        name="% objetivo (nominal)",
-        line=dict(color="blue", width=3),
-        marker=dict(size=7)
-    ))
-
-    fig.add_trace(go.Scatter(
-        x=df_ret["Edad de retiro"],
-        y=df_ret["% objetivo en valor presente"],
-        mode="lines+markers",
-        name="% objetivo (hoy)",
-        line=dict(color="green", width=3, dash="dash"),
-        marker=dict(size=7)
-    ))
-
-    fig.update_layout(
+    # Pocas edades: sin reducción de puntos, solo el caché de la figura
+    graf = Grafica(eje_x="Edad de retiro", presupuesto=None)
+    graf.linea(df_ret["Edad de retiro"], df_ret["% objetivo nominal"], "% objetivo (nominal)",
+               mode="lines+markers", line=dict(color="blue", width=3), marker=dict(size=7))
+    graf.linea(df_ret["Edad de retiro"], df_ret["% objetivo en valor presente"], "% objetivo (hoy)",
+               mode="lines+markers", line=dict(color="green", width=3, dash="dash"), marker=dict(size=7))
+
+    fig = graf.figura(
         title="Cumplimiento del objetivo según edad de retiro",
         xaxis_title="Edad de retiro",
         yaxis_title="% del objetivo",
@@ -703,23 +348,30 @@ with tab4:
     # Ordenamos por pensión nominal
     df_plot = df_sens.sort_values("Pensión nominal", ascending=True)
 
-    fig = go.Figure()
-
-    fig.add_trace(go.Bar(
-        y=df_plot["Escenario"],
-        x=df_plot["Pensión nominal"],
-        orientation='h',
-        text=[f"${v:,.0f}" for v in df_plot["Pensión nominal"]],
-        textposition="outside",
-        marker_color=["#1f77b4" if esc == "Base" else "#ff7f0e" for esc in df_plot["Escenario"]]
-    ))
-
-    fig.update_layout(
-        xaxis_title="Pensión mensual (nominal)",
-        yaxis_title="Escenario",
-        margin=dict(l=10, r=10, t=10, b=10),
-    )
+    def figura_sensibilidad(escenarios, pensiones):
+        fig = go.Figure()
+
+        fig.add_trace(go.Bar(
+            y=escenarios,
+            x=pensiones,
+            orientation='h',
+            text=[f"${v:,.0f}" for v in pensiones],
+            textposition="outside",
+            marker_color=["#1f77b4" if esc == "Base" else "#ff7f0e" for esc in escenarios]
+        ))
 
+        fig.update_layout(
+            xaxis_title="Pensión mensual (nominal)",
+            yaxis_title="Escenario",
+            margin=dict(l=10, r=10, t=10, b=10),
+        )
+        return fig
+
+    fig = figura_cacheada(
+        figura_sensibilidad,
+        escenarios=df_plot["Escenario"].tolist(),
+        pensiones=df_plot["Pensión nominal"].tolist()
+    )
     st.plotly_chart(fig, use_container_width=True)
 
     st.subheader("💡 Interpretación rápida")
@@ -867,34 +519,23 @@ with tab5:
 
 
         # ---- GRÁFICO CON FANTASMA ----
-        fig = go.Figure()
+        graf = Grafica()
+        graf.linea(df_base["Mes"], df_base["Saldo"], "Base (mensualidad constante)",
+                   mode="lines", line=dict(color="gray", width=2, dash="dash"))
+        graf.linea(df_adv["Mes"], df_adv["Saldo"], "Estrategia avanzada",
+                   mode="lines", line=dict(width=4))
 
-        fig.add_trace(go.Scatter(
-            x=df_base["Mes"],
-            y=df_base["Saldo"],
-            mode="lines",
-            name="Base (mensualidad constante)",
-            line=dict(color="gray", width=2, dash="dash")
-        ))
-
-        fig.add_trace(go.Scatter(
-            x=df_adv["Mes"],
-            y=df_adv["Saldo"],
-            mode="lines",
-            name="Estrategia avanzada",
-            line=dict(width=4)
-        ))
-
-        fig.update_layout(
+        fig = graf.figura(
             title="Evolución del saldo — Estrategia vs Base",
             xaxis_title="Mes",
             yaxis_title="Saldo",
         )
 
-        st.plotly_chart(fig, use_container_width=True)
+        mostrar_grafica(graf, fig, "estrategia_vs_base.csv")
 
-        with st.expander("📄 Tabla completa de la estrategia"):
-            st.dataframe(df_adv)
+        st.subheader("📄 Estrategia por año")
+        st.dataframe(resumen_anual(df_adv), hide_index=True)
+        mostrar_detalle_mensual(df_adv, clave="estrategia")
 
 with tab6:
     st.header("🧓 Simulación completa del retiro")
@@ -940,23 +581,17 @@ with tab6:
     col3.metric("Años reales alcanzados", f"{mes_final / 12:.2f}")
 
     # --- Gráfica ---
-    fig = go.Figure()
+    graf = Grafica()
+    graf.linea(df_retiro["Mes"], df_retiro["Saldo final"], "Saldo durante el retiro",
+               mode="lines", line=dict(color="purple", width=4))
 
-    fig.add_trace(go.Scatter(
-        x=df_retiro["Mes"],
-        y=df_retiro["Saldo final"],
-        mode="lines",
-        name="Saldo durante el retiro",
-        line=dict(color="purple", width=4)
-    ))
-
-    fig.update_layout(
+    fig = graf.figura(
         title="📉 Evolución del saldo durante el retiro",
         xaxis_title="Mes",
         yaxis_title="Saldo",
     )
 
-    st.plotly_chart(fig, use_container_width=True)
+    mostrar_grafica(graf, fig, "saldo_retiro.csv")
 
     # Advertencia si se acabó
     if saldo_final == 0:
@@ -964,9 +599,10 @@ with tab6:
     else:
         st.success("🎉 ¡Tu capital duró hasta el final del periodo de retiro!")
 
-    # Tabla
-    with st.expander("📄 Ver tabla completa del retiro mes a mes"):
-        st.dataframe(df_retiro)
+    # Tabla: resumen anual y detalle mensual bajo demanda
+    st.subheader("📄 Retiro por año")
+    st.dataframe(resumen_anual(df_retiro), hide_index=True)
+    mostrar_detalle_mensual(df_retiro, clave="retiro")
 
 with tab7:
     st.header("⬇️ Exportación de resultados")
@@ -981,19 +617,11 @@ with tab7:
 
     # --- Export Acumulación ---
     st.markdown("### 🟦 Acumulación (Tab 1)")
-    st.download_button(
-        "📤 Descargar acumulación (CSV)",
-        export_df_to_csv(df),
-        file_name="acumulacion.csv",
-        mime="text/csv"
-    )
+    boton_descarga("📤 Descargar acumulación (CSV)", "acumulacion.csv", "csv",
+                   clave="acumulacion_csv", df=df)
 
-    st.download_button(
-        "📤 Descargar acumulación (Excel)",
-        export_df_to_excel(df),
-        file_name="acumulacion.xlsx",
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
+    boton_descarga("📤 Descargar acumulación (Excel)", "acumulacion.xlsx", "xlsx",
+                   clave="acumulacion_xlsx", df=df)
 
     # --- Export valor presente y resumen pensión ---
     resumen_objetivo = pd.DataFrame({
@@ -1007,56 +635,35 @@ with tab7:
     st.markdown("### 🟩 Resumen de Pensión (Tabs 2 y 3)")
     st.dataframe(resumen_objetivo)
 
-    st.download_button(
-        "📤 Descargar resumen pensión (CSV)",
-        export_df_to_csv(resumen_objetivo),
-        file_name="resumen_pension.csv",
-        mime="text/csv"
-    )
+    boton_descarga("📤 Descargar resumen pensión (CSV)", "resumen_pension.csv", "csv",
+                   clave="resumen_pension", df=resumen_objetivo)
 
     # --- Export comparador de edades ---
     st.markdown("### 🟧 Comparador de edades de retiro (Tab 4)")
-    st.download_button(
-        "📤 Descargar comparador edades (CSV)",
-        export_df_to_csv(df_ret),
-        file_name="comparador_edades.csv",
-        mime="text/csv",
-        disabled=("df_ret" not in locals())
-    )
+    boton_descarga("📤 Descargar comparador edades (CSV)", "comparador_edades.csv", "csv",
+                   clave="comparador_edades", df=df_ret)
 
     # --- Export sensibilidad ---
     st.markdown("### 🟨 Sensibilidad (Tab 5)")
     if "df_sens" in locals():
-        st.download_button(
-            "📤 Descargar sensibilidad (CSV)",
-            export_df_to_csv(df_sens),
-            file_name="sensibilidad.csv",
-            mime="text/csv"
-        )
+        boton_descarga("📤 Descargar sensibilidad (CSV)", "sensibilidad.csv", "csv",
+                       clave="sensibilidad", df=df_sens)
     else:
         st.info("Realiza una simulación en la pestaña Sensibilidad para habilitar la descarga.")
 
     # --- Export estrategia avanzada ---
     st.markdown("### 🟪 Estrategias avanzadas (Tab 6)")
     if "df_adv" in locals():
-        st.download_button(
-            "📤 Descargar estrategia avanzada (CSV)",
-            export_df_to_csv(df_adv),
-            file_name="estrategia_avanzada.csv",
-            mime="text/csv"
-        )
+        boton_descarga("📤 Descargar estrategia avanzada (CSV)", "estrategia_avanzada.csv", "csv",
+                       clave="estrategia_avanzada", df=df_adv)
     else:
         st.info("Realiza una simulación en Estrategias Avanzadas para habilitar la exportación.")
 
     # --- Export retiro mes a mes ---
     st.markdown("### 🧓 Simulación de Retiro (Tab 7)")
     if "df_retiro" in locals():
-        st.download_button(
-            "📤 Descargar simulación de retiro (CSV)",
-            export_df_to_csv(df_retiro),
-            file_name="simulacion_retiro.csv",
-            mime="text/csv"
-        )
+        boton_descarga("📤 Descargar simulación de retiro (CSV)", "simulacion_retiro.csv", "csv",
+                       clave="simulacion_retiro", df=df_retiro)
     else:
         st.info("Ejecuta la pestaña de Simulación de Retiro para habilitar esta descarga.")
 
@@ -1083,7 +690,9 @@ with tab7:
 
     st.subheader("📘 Exportar archivo Excel completo (varias hojas)")
 
-    excel_completo = export_excel_completo(
+    boton_descarga(
+        "📤 Descargar Excel completo (XLSX)", "simulador_retiro.xlsx", "excel_completo",
+        clave="excel_completo",
         df_acum=df,
         df_resumen=resumen_objetivo,
         df_ret=df_ret if "df_ret" in locals() else None,
@@ -1093,13 +702,6 @@ with tab7:
         params=params
     )
 
-    st.download_button(
-        "📤 Descargar Excel completo (XLSX)",
-        data=excel_completo,
-        file_name="simulador_retiro.xlsx",
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
-
     st.markdown("---")
     st.info("PDF estará disponible próximamente (requiere módulo adicional).")
 
@@ -1216,53 +818,32 @@ with tab8:
         # ==========================================================
         #   4) GRÁFICA ETF vs Allianz vs Colchón
         # ==========================================================
-        fig = go.Figure()
+        graf = Grafica()
 
         # ETF
-        fig.add_trace(go.Scatter(
-            x=df_etf["Mes"],
-            y=df_etf["Saldo"],
-            name="ETF mágico (sin comisiones)",
-            line=dict(width=3)
-        ))
+        graf.linea(df_etf["Mes"], df_etf["Saldo"], "ETF mágico (sin comisiones)",
+                   line=dict(width=3))
 
-        # Allianz
-        fig.add_trace(go.Scatter(
-            x=df_etf["Mes"],  # mismos meses
-            y=df_allianz["Saldo"],
-            name="Allianz simple (15 UDIS/mes)",
-            line=dict(width=3, color="red")
-        ))
+        # Allianz (mismos meses)
+        graf.linea(df_etf["Mes"], df_allianz["Saldo"], "Allianz simple (15 UDIS/mes)",
+                   line=dict(width=3, color="red"))
 
         # Colchón
-        fig.add_trace(go.Scatter(
-            x=df_etf["Mes"],
-            y=df_etf["Colchón"],
-            name="Colchón (sin rendimiento)",
-            line=dict(width=2, dash="dash", color="gray")
-        ))
+        graf.linea(df_etf["Mes"], df_etf["Colchón"], "Colchón (sin rendimiento)",
+                   line=dict(width=2, dash="dash", color="gray"))
 
-        fig.add_trace(go.Scatter(
-            x=df_allianz_sat["Mes"],
-            y=df_allianz_sat["SAT_Acumulado"],
-            name="Devolución SAT acumulada",
-            line=dict(width=3, color="green")
-        ))
-
-        fig.add_trace(go.Scatter(
-            x=df_allianz_sat["Mes"],
-            y=df_allianz_sat["Saldo_Allianz_SAT"],
-            name="Allianz + SAT reinvertido",
-            line=dict(width=3, color="green")
-        ))
+        graf.linea(df_allianz_sat["Mes"], df_allianz_sat["SAT_Acumulado"], "Devolución SAT acumulada",
+                   line=dict(width=3, color="green"))
+        graf.linea(df_allianz_sat["Mes"], df_allianz_sat["Saldo_Allianz_SAT"], "Allianz + SAT reinvertido",
+                   line=dict(width=3, color="green"))
 
-        fig.update_layout(
+        fig = graf.figura(
             title="Evolución — Allianz (simple) vs ETF vs Colchón",
             xaxis_title="Mes",
             yaxis_title="Saldo",
         )
 
-        st.plotly_chart(fig, use_container_width=True)
+        mostrar_grafica(graf, fig, "allianz_vs_etf.csv")
 
 
         # ==========================================================
@@ -1271,5 +852,6 @@ with tab8:
         df_final["Saldo_Allianz_SAT"] = df_allianz_sat["Saldo_Allianz_SAT"]
         df_final["SAT_Acumulado"] = df_allianz_sat["SAT_Acumulado"]
 
-        st.subheader("📋 Tabla completa de la simulación")
-        st.dataframe(df_final)
\ No newline at end of file
+        st.subheader("📋 Simulación por año")
+        st.dataframe(resumen_anual(df_final), hide_index=True)
+        mostrar_detalle_mensual(df_final, clave="allianz_vs_etf")
@@ -0,0 +1,118 @@
+import math
+
+# ================================================================
+#   🎯 Solver del retiro óptimo (Brent con intervalo garantizado)
+# ================================================================
+#
+# El saldo final (sin piso en 0) baja de forma continua y monótona
+# cuando sube el retiro mensual, así que el retiro máximo es la raíz
+# de saldo_final(retiro) = 0.
+#
+# En lugar de 40 bisecciones fijas:
+# 1) Se siembra con la anualidad analítica (analitico.py, sin comisiones).
+# 2) Se amplía la cota superior hasta que el saldo final sea negativo.
+# 3) Se refina con Brent hasta una tolerancia en pesos.
+#
+# Como el saldo final es lineal en el retiro, Brent converge en muy
+# pocas evaluaciones.
+
+
+def resolver_retiro(saldo_final, semilla, cota_superior, tol_pesos=0.01, max_iter=100):
+    """
+    Encuentra el retiro mensual máximo tal que saldo_final(retiro) = 0.
+
+    - saldo_final(retiro) -> saldo al final del plazo, SIN piso en 0
+    - semilla: primera estimación (p. ej. la anualidad analítica)
+    - cota_superior: cota inicial; se duplica si todavía sobra dinero
+    - tol_pesos: ancho máximo del intervalo final, en pesos
+
+    Regresa (retiro, iteraciones), donde iteraciones es el número de
+    simulaciones ejecutadas.
+    """
+    iteraciones = 0
+
+    def f(retiro):
+        nonlocal iteraciones
+        iteraciones += 1
+        return saldo_final(retiro)
+
+    a, fa = 0.0, f(0.0)
+    if fa <= 0:
+        # Ni retirando 0 alcanza el capital
+        return 0.0, iteraciones
+
+    # 1) Semilla: acota el intervalo por un lado
+    b = max(cota_superior, semilla * 1.5, tol_pesos)
+    if 0 < semilla < b:
+        fs = f(semilla)
+        if fs == 0:
+            return semilla, iteraciones
+        if fs > 0:
+            a, fa = semilla, fs
+        else:
+            b = semilla
+
+    # 2) Ampliar la cota superior hasta cambiar de signo
+    fb = f(b)
+    while fb > 0 and iteraciones < max_iter:
+        a, fa = b, fb
+        b *= 2
+        fb = f(b)
+
+    if fb > 0:
+        return b, iteraciones
+
+    # 3) Brent
+    c, fc = a, fa
+    d = e = b - a
+
+    while iteraciones < max_iter:
+        if (fb > 0) == (fc > 0):
+            c, fc = a, fa
+            d = e = b - a
+
+        if abs(fc) < abs(fb):
+            a, b, c = b, c, b
+            fa, fb, fc = fb, fc, fb
+
+        tol = 2 * 2.2e-16 * abs(b) + 0.5 * tol_pesos
+        m = 0.5 * (c - b)
+
+        if abs(m) <= tol or fb == 0:
+            break
+
+        if abs(e) >= tol and abs(fa) > abs(fb):
+            s = fb / fa
+            if a == c:
+                # Secante
+                p = 2 * m * s
+                q = 1 - s
+            else:
+                # Interpolación cuadrática inversa
+                q = fa / fc
+                r = fb / fc
+                p = s * (2 * m * q * (q - r) - (b - a) * (r - 1))
+                q = (q - 1) * (r - 1) * (s - 1)
+
+            if p > 0:
+                q = -q
+            else:
+                p = -p
+
+            if 2 * p < min(3 * m * q - abs(tol * q), abs(e * q)):
+                e = d
+                d = p / q
+            else:
+                d = m
+                e = d
+        else:
+            d = m
+            e = d
+
+        a, fa = b, fb
+        b += d if abs(d) > tol else math.copysign(tol, m)
+        fb = f(b)
+
+    # Regresar el lado del intervalo donde todavía sobra (o no falta) dinero
+    retiro = b if fb >= 0 else c
+    return retiro, iteraciones
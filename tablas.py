@@ -1,3 +1,5 @@
+from dataclasses import dataclass
+
 import pandas as pd
 
 def generar_aportes(aporte_inicial, meses, inflacion_anual, incrementar):
@@ -9,6 +11,15 @@ def generar_aportes(aporte_inicial, meses, inflacion_anual, incrementar):
             aporte *= (1 + inflacion_anual)
     return aportes
 
+def _resumen(saldo, totales):
+    """
+    Resultado de las simulaciones sin tabla (detalle=False).
+    """
+    resumen = {"Saldo Final": saldo}
+    for concepto, total in totales.items():
+        resumen["Total " + concepto] = total
+    return resumen
+
 def simular_saldo_inicial_excel(
     aporte_inicial,
     meses_totales=25*12,
@@ -16,12 +27,17 @@ def simular_saldo_inicial_excel(
     tasa_anual=0.10,
     cargo_fijo_inicial=-500,
     incrementar=False,
-    inflacion_anual=0.0499
+    inflacion_anual=0.0499,
+    detalle=True
 ):
     """
     Simula el SALDO INICIAL exactamente como el Excel:
     - Recibe aportaciones SOLO por 18 meses
     - Sigue creciendo por 300 meses (rendimiento + cargos)
+
+    Con detalle=False no arma la tabla mes a mes y regresa solo un dict
+    con el saldo final y los totales.
+    Con detalle="anual" regresa una fila por año (ver FilasAnuales).
     """
 
     tasa_mensual = round((1 + tasa_anual) ** (1 / 12) - 1, 3)
@@ -29,7 +45,8 @@ def simular_saldo_inicial_excel(
     saldo = 0
     aporte = aporte_inicial
 
-    rows = []
+    rows = _nuevas_filas(detalle)
+    totales = {"Aportación": 0, "Interés": 0, "Cargos": 0}
 
     for mes in range(1, meses_totales + 1):
 
@@ -65,6 +82,12 @@ def simular_saldo_inicial_excel(
         # === SALDO FINAL ===
         saldo = base_gestion + cargo_admin + cargo_gestion
 
+        if not detalle:
+            totales["Aportación"] += aportacion
+            totales["Interés"] += interes
+            totales["Cargos"] += cargo_fijo + cargo_admin + cargo_gestion
+            continue
+
         rows.append({
             "Mes": mes,
             "Saldo Anterior": saldo_anterior,
@@ -76,46 +99,65 @@ def simular_saldo_inicial_excel(
             "Saldo Final": saldo
         })
 
-    return pd.DataFrame(rows)
+    if not detalle:
+        return _resumen(saldo, totales)
 
-def simular_saldo_comprometido_excel(
+    return _tabla(rows)
+
+@dataclass(frozen=True)
+class EstadoComprometido:
+    """
+    Foto del saldo comprometido al cierre de un mes.
+    Es inmutable: se puede guardar y reanudar varias veces (bifurcar).
+    """
+    mes: int = 0          # último mes simulado (0 = todavía no empieza)
+    saldo: float = 0
+    udi: float = 0
+
+
+def avanzar_saldo_comprometido(
+    estado,
     aportes_lista,
     sat_inyectado_lista,
     inflacion,
-    udi_inicial,
     tasa_anual,
-    meses=25*12,
-    offset=18
+    hasta_mes,
+    offset=18,
+    rows=None,
+    totales=None
 ):
     """
-    Simulación real del saldo comprometido Allianz,
-    ahora incluyendo aportaciones SAT dentro del PPR.
-    """
+    Avanza el saldo comprometido desde 'estado' hasta el mes 'hasta_mes'
+    (inclusive) y regresa el nuevo EstadoComprometido.
 
+    - rows: lista (o FilasAnuales) donde se agregan las filas de la
+      tabla (opcional)
+    - totales: dict donde se acumulan los totales (opcional)
+    """
     tasa_mensual = round((1 + tasa_anual)**(1/12) - 1, 3)
 
-    udi_actual = udi_inicial
-    saldo = 0
-    rows = []
+    udi_actual = estado.udi
+    saldo = estado.saldo
 
-    for mes in range(1, meses + 1):
+    for mes in range(estado.mes + 1, hasta_mes + 1):
 
         # ------------------------------------
         # 0) Meses sin aportación (igual al Excel)
         # ------------------------------------
         if mes <= offset:
-            rows.append({
-                "Mes": mes,
-                "Saldo Anterior": 0,
-                "Aportación": 0,
-                "Aporte SAT": 0,
-                "Aportación Total": 0,
-                "Interés": 0,
-                "Cargo Fijo": 0,
-                "Cargo Administrativo": 0,
-                "Cargo Gestión Inversión": 0,
-                "Saldo Final": 0,
-            })
+            if rows is not None:
+                rows.append({
+                    "Mes": mes,
+                    "Saldo Anterior": 0,
+                    "Aportación": 0,
+                    "Aporte SAT": 0,
+                    "Aportación Total": 0,
+                    "Interés": 0,
+                    "Cargo Fijo": 0,
+                    "Cargo Administrativo": 0,
+                    "Cargo Gestión Inversión": 0,
+                    "Saldo Final": 0,
+                })
 
             # Actualizar UDI una vez por año
             if mes % 12 == 0:
@@ -159,18 +201,25 @@ def simular_saldo_comprometido_excel(
         # ------------------------------------
         saldo = base_gestion + cargo_admin + cargo_gestion
 
-        rows.append({
-            "Mes": mes,
-            "Saldo Anterior": saldo_anterior,
-            "Aportación": aporte_normal,
-            "Aporte SAT": aporte_sat,
-            "Aportación Total": aporte_total,
-            "Interés": interes,
-            "Cargo Fijo": cargo_fijo,
-            "Cargo Administrativo": cargo_admin,
-            "Cargo Gestión Inversión": cargo_gestion,
-            "Saldo Final": saldo,
-        })
+        if totales is not None:
+            totales["Aportación"] += aporte_normal
+            totales["Aporte SAT"] += aporte_sat
+            totales["Interés"] += interes
+            totales["Cargos"] += cargo_fijo + cargo_admin + cargo_gestion
+
+        if rows is not None:
+            rows.append({
+                "Mes": mes,
+                "Saldo Anterior": saldo_anterior,
+                "Aportación": aporte_normal,
+                "Aporte SAT": aporte_sat,
+                "Aportación Total": aporte_total,
+                "Interés": interes,
+                "Cargo Fijo": cargo_fijo,
+                "Cargo Administrativo": cargo_admin,
+                "Cargo Gestión Inversión": cargo_gestion,
+                "Saldo Final": saldo,
+            })
 
         # ------------------------------------
         # 7) Actualización anual de UDI
@@ -178,16 +227,117 @@ def simular_saldo_comprometido_excel(
         if mes % 12 == 0:
             udi_actual *= (1 + inflacion)
 
-    return pd.DataFrame(rows)
+    return EstadoComprometido(mes=max(estado.mes, hasta_mes), saldo=saldo, udi=udi_actual)
+
+
+def _totales_comprometido():
+    return {"Aportación": 0, "Aporte SAT": 0, "Interés": 0, "Cargos": 0}
+
+
+def simular_saldo_comprometido_excel(
+    aportes_lista,
+    sat_inyectado_lista,
+    inflacion,
+    udi_inicial,
+    tasa_anual,
+    meses=25*12,
+    offset=18,
+    detalle=True
+):
+    """
+    Simulación real del saldo comprometido Allianz,
+    ahora incluyendo aportaciones SAT dentro del PPR.
+
+    Con detalle=False regresa solo un dict con el saldo final y los totales.
+    Con detalle="anual" regresa una fila por año (ver FilasAnuales).
+    """
+    rows = _nuevas_filas(detalle) if detalle else None
+    totales = None if detalle else _totales_comprometido()
+
+    estado = avanzar_saldo_comprometido(
+        EstadoComprometido(udi=udi_inicial),
+        aportes_lista,
+        sat_inyectado_lista,
+        inflacion,
+        tasa_anual,
+        hasta_mes=meses,
+        offset=offset,
+        rows=rows,
+        totales=totales
+    )
+
+    if not detalle:
+        return _resumen(estado.saldo, totales)
+
+    return _tabla(rows)
+
+
+def simular_saldo_comprometido_bifurcado(
+    aportes_lista,
+    sat_a,
+    sat_b,
+    inflacion,
+    udi_inicial,
+    tasa_anual,
+    meses=25*12,
+    offset=18,
+    detalle=True
+):
+    """
+    Simula dos escenarios del saldo comprometido que solo difieren en la
+    serie del SAT (p. ej. "sin SAT" y "con SAT").
+
+    El tramo común (hasta el mes anterior a la primera diferencia que sí
+    cuenta, es decir, después del offset) se simula una sola vez y ambos
+    escenarios se reanudan desde esa foto.
+
+    Regresa (resultado_a, resultado_b): DataFrames (por año si
+    detalle="anual"), o dicts si detalle=False.
+    """
+    bifurcacion = meses
+    for idx in range(offset, meses):
+        if sat_a[idx] != sat_b[idx]:
+            bifurcacion = idx
+            break
+
+    rows = _nuevas_filas(detalle) if detalle else None
+    totales = None if detalle else _totales_comprometido()
+
+    foto = avanzar_saldo_comprometido(
+        EstadoComprometido(udi=udi_inicial),
+        aportes_lista, sat_a, inflacion, tasa_anual,
+        hasta_mes=bifurcacion, offset=offset, rows=rows, totales=totales
+    )
+
+    resultados = []
+    for sat in (sat_a, sat_b):
+        rows_rama = rows.copy() if detalle else None
+        totales_rama = None if detalle else dict(totales)
+
+        estado = avanzar_saldo_comprometido(
+            foto, aportes_lista, sat, inflacion, tasa_anual,
+            hasta_mes=meses, offset=offset, rows=rows_rama, totales=totales_rama
+        )
+
+        if detalle:
+            resultados.append(_tabla(rows_rama))
+        else:
+            resultados.append(_resumen(estado.saldo, totales_rama))
+
+    return resultados[0], resultados[1]
 
 
 def simular_bono_excel(
         aporte_mensual,
         plazo_anios,
-        tasa_anual_bono=0.09
+        tasa_anual_bono=0.09,
+        detalle=True
 ):
     """
     Simula la tabla del BONO exactamente como el Excel de Allianz.
+
+    Con detalle=False regresa solo un dict con el saldo final y los totales.
+    Con detalle="anual" regresa una fila por año (ver FilasAnuales).
     """
 
     # 1) Calcular porcentaje del bono según tabla oficial
@@ -202,7 +352,8 @@ def simular_bono_excel(
     tasa_mensual = round((1 + tasa_anual_bono) ** (1 / 12) - 1, 4)
 
     saldo = 0
-    rows = []
+    rows = _nuevas_filas(detalle)
+    totales = {"Bono": 0, "Interés": 0, "Cargos": 0}
 
     meses = plazo_anios * 12
 
@@ -230,6 +381,12 @@ def simular_bono_excel(
         # === SALDO FINAL ===
         saldo = saldo_anterior + bono_mensual + interes + cargo_admin + cargo_gestion
 
+        if not detalle:
+            totales["Bono"] += bono_mensual
+            totales["Interés"] += interes
+            totales["Cargos"] += cargo_admin + cargo_gestion
+            continue
+
         rows.append({
             "Mes": mes,
             "Saldo Anterior": saldo_anterior,
@@ -240,8 +397,96 @@ def simular_bono_excel(
             "Saldo Final": saldo,
         })
 
-    return pd.DataFrame(rows)
+    if not detalle:
+        return _resumen(saldo, totales)
+
+    return _tabla(rows)
+
+
+
+# Columnas que son flujos del mes (se suman en el resumen anual) y saldos
+# de apertura (se toma el primer mes); el resto son saldos de cierre.
+FLUJOS_MENSUALES = (
+    "Aportación", "Aporte SAT", "Aportación Total", "Bono Mensual", "Interés",
+    "Cargo Fijo", "Cargo Administrativo", "Cargo Gestión Inversión", "SAT_inyectado",
+    "Aporte", "Pensión mensual", "Interés ganado",
+)
+SALDOS_DE_APERTURA = ("Saldo Anterior", "Saldo inicial")
+
+
+def resumen_anual(df, sumar=None, apertura=None):
+    """
+    Tabla mes a mes → una fila por año del plazo: suma de los flujos
+    (aportes, intereses, cargos, bono, SAT), saldo de apertura del primer
+    mes y saldo de cierre del último.
+
+    'sumar' y 'apertura' permiten elegir las columnas; por defecto se usan
+    FLUJOS_MENSUALES y SALDOS_DE_APERTURA.
+    """
+    if sumar is None:
+        sumar = [c for c in df.columns if c in FLUJOS_MENSUALES]
+    if apertura is None:
+        apertura = [c for c in df.columns if c in SALDOS_DE_APERTURA]
+
+    columnas = [c for c in df.columns if c != "Mes"]
+    reglas = {
+        c: "sum" if c in sumar else "first" if c in apertura else "last"
+        for c in columnas
+    }
+    años = (pd.RangeIndex(len(df)) // 12 + 1).to_numpy()
+
+    anual = df[columnas].groupby(años).agg(reglas)
+    anual.index.name = "Año"
+    return anual.reset_index()
+
+
+class FilasAnuales:
+    """
+    Reemplazo de la lista de filas de los simuladores con detalle="anual":
+    cada fila mensual se suma a la del año en curso con las reglas de
+    resumen_anual (flujos sumados, saldo de apertura del primer mes y
+    saldo de cierre del último), sin guardar los meses.
+    """
 
+    def __init__(self):
+        self.filas = []
+        self._sumar = self._cierre = None   # se fijan con la primera fila
+
+    def append(self, fila):
+        año = (fila["Mes"] - 1) // 12 + 1
+        if not self.filas or self.filas[-1]["Año"] != año:
+            if self._sumar is None:
+                self._sumar = [c for c in fila if c in FLUJOS_MENSUALES]
+                self._cierre = [c for c in fila if c != "Mes" and c not in FLUJOS_MENSUALES
+                                and c not in SALDOS_DE_APERTURA]
+            nueva = {"Año": año}
+            nueva.update(fila)
+            del nueva["Mes"]
+            self.filas.append(nueva)
+            return
+
+        actual = self.filas[-1]
+        for columna in self._sumar:
+            actual[columna] += fila[columna]
+        for columna in self._cierre:
+            actual[columna] = fila[columna]
+
+    def copy(self):
+        copia = FilasAnuales()
+        copia.filas = [dict(f) for f in self.filas]
+        copia._sumar, copia._cierre = self._sumar, self._cierre
+        return copia
+
+    def tabla(self):
+        return pd.DataFrame(self.filas)
+
+
+def _nuevas_filas(detalle):
+    return FilasAnuales() if detalle == "anual" else []
+
+
+def _tabla(rows):
+    return rows.tabla() if isinstance(rows, FilasAnuales) else pd.DataFrame(rows)
 
 # # --- Generate aportes ---
 # aportes_lista = generar_aportes(5000, 25*12, 0.0499, True)
@@ -0,0 +1,313 @@
+import numpy as np
+
+from allianz_functions import obtener_bono_fidelidad_porcentaje
+
+# ================================================================
+#   🧮 Tablas reales (Excel) para MUCHOS escenarios a la vez
+# ================================================================
+#
+# Mismas reglas que tablas.py, pero cada paso avanza un vector de
+# escenarios. El resultado es una matriz (meses × escenarios).
+#
+# - Se conserva el round(..., 0) de cada paso (np.rint redondea igual
+#   que round(): mitades al par), así que cada columna coincide peso
+#   por peso con la función escalar equivalente.
+# - Cada escenario puede tener su propio plazo. Los meses posteriores
+#   a su plazo quedan como NaN.
+
+
+def _vector(valor, n):
+    return np.broadcast_to(np.asarray(valor, dtype=float), (n,)).copy()
+
+
+def _num_escenarios(*valores):
+    return int(np.broadcast(*[np.asarray(v) for v in valores]).size)
+
+
+def _tasa_mensual_redondeada(tasa_anual, decimales):
+    # Se calcula escenario por escenario con round() de Python para que
+    # la tasa sea idéntica a la que usa tablas.py
+    return np.array([round((1 + t) ** (1 / 12) - 1, decimales) for t in tasa_anual])
+
+
+def saldo_final_por_escenario(saldos, meses):
+    """
+    Regresa el saldo del último mes de cada escenario (según su plazo).
+    """
+    meses = np.broadcast_to(np.asarray(meses, dtype=int), (saldos.shape[1],))
+    return saldos[meses - 1, np.arange(saldos.shape[1])]
+
+
+def generar_aportes_vectorizado(
+    aporte_inicial,
+    meses,
+    inflacion_anual,
+    incrementar,
+    meses_aportando=None
+):
+    """
+    Versión vectorizada de generar_aportes.
+    Regresa una matriz (meses × escenarios).
+
+    Si se da 'meses_aportando', los aportes se vuelven 0 después de ese
+    mes (igual que generar_aportes_early_stop).
+    """
+    n = _num_escenarios(aporte_inicial, inflacion_anual, incrementar)
+    aporte = _vector(aporte_inicial, n)
+    inflacion = _vector(inflacion_anual, n)
+    incrementar = np.broadcast_to(np.asarray(incrementar, dtype=bool), (n,))
+
+    aportes = np.empty((meses, n))
+
+    for m in range(meses):
+        aportes[m] = aporte
+
+        if m > 0 and m % 12 == 0:
+            aporte = np.where(incrementar, aporte * (1 + inflacion), aporte)
+
+    if meses_aportando is not None:
+        limite = np.broadcast_to(np.asarray(meses_aportando), (n,))
+        aportes[np.arange(meses)[:, None] >= limite[None, :]] = 0
+
+    return aportes
+
+
+def simular_saldo_inicial_vectorizado(
+    aporte_inicial,
+    tasa_anual=0.10,
+    inflacion_anual=0.0499,
+    meses_totales=25*12,
+    meses_aportando=18,
+    cargo_fijo_inicial=-500,
+    incrementar=False,
+    detalle=False
+):
+    """
+    Simula el SALDO INICIAL de muchos escenarios a la vez.
+
+    Todos los parámetros aceptan escalares o arreglos (uno por escenario).
+    Regresa la matriz (meses × escenarios) de "Saldo Final".
+    Con detalle=True regresa un dict con todas las columnas de
+    simular_saldo_inicial_excel, cada una como matriz.
+    """
+    n = _num_escenarios(aporte_inicial, tasa_anual, inflacion_anual,
+                        meses_totales, meses_aportando, incrementar)
+
+    aporte = _vector(aporte_inicial, n)
+    inflacion = _vector(inflacion_anual, n)
+    tasa_mensual = _tasa_mensual_redondeada(_vector(tasa_anual, n), 3)
+    plazo = np.broadcast_to(np.asarray(meses_totales, dtype=int), (n,))
+    aportando = np.broadcast_to(np.asarray(meses_aportando, dtype=int), (n,))
+    incrementar = np.broadcast_to(np.asarray(incrementar, dtype=bool), (n,))
+    cargo_fijo_inicial = _vector(cargo_fijo_inicial, n)
+
+    meses = int(plazo.max())
+    saldo = np.zeros(n)
+
+    columnas = ["Saldo Anterior", "Aportación", "Interés", "Cargo Fijo",
+                "Cargo Administrativo", "Cargo Gestión Inversión", "Saldo Final"]
+    tablas = {c: np.full((meses, n), np.nan) for c in (columnas if detalle else ["Saldo Final"])}
+
+    for mes in range(1, meses + 1):
+        activo = mes <= plazo
+
+        # Ajuste por inflación (solo mientras se aporta)
+        if mes > 1 and (mes - 1) % 12 == 0:
+            ajustar = incrementar & (mes <= aportando)
+            aporte = np.where(ajustar, np.rint(aporte * (1 + inflacion)), aporte)
+
+        saldo_anterior = saldo
+        aportacion = np.where(mes <= aportando, aporte, 0.0)
+        cargo_fijo = cargo_fijo_inicial if mes == 1 else np.zeros(n)
+
+        # === INTERÉS ===
+        base_interes = saldo_anterior + aportacion
+        interes = np.rint(base_interes * tasa_mensual)
+
+        # === CARGO ADMINISTRATIVO (trimestral) ===
+        if mes % 3 == 0:
+            cargo_admin = - np.rint(base_interes * 0.009 * 1.16)
+        else:
+            cargo_admin = np.zeros(n)
+
+        # === CARGO GESTIÓN (mensual) ===
+        base_gestion = saldo_anterior + aportacion + interes + cargo_fijo
+        cargo_gestion = - np.rint(base_gestion * 0.001 * 1.16)
+
+        saldo = np.where(activo, base_gestion + cargo_admin + cargo_gestion, saldo)
+
+        tablas["Saldo Final"][mes - 1] = np.where(activo, saldo, np.nan)
+        if detalle:
+            for col, valor in (
+                ("Saldo Anterior", saldo_anterior),
+                ("Aportación", aportacion),
+                ("Interés", interes),
+                ("Cargo Fijo", cargo_fijo),
+                ("Cargo Administrativo", cargo_admin),
+                ("Cargo Gestión Inversión", cargo_gestion),
+            ):
+                tablas[col][mes - 1] = np.where(activo, valor, np.nan)
+
+    return tablas if detalle else tablas["Saldo Final"]
+
+
+def simular_saldo_comprometido_vectorizado(
+    aportes,
+    inflacion,
+    udi_inicial,
+    tasa_anual,
+    meses=25*12,
+    offset=18,
+    sat_inyectado=None,
+    detalle=False
+):
+    """
+    Simula el SALDO COMPROMETIDO de muchos escenarios a la vez.
+
+    - aportes: matriz (meses × escenarios) o vector (meses,) compartido
+    - sat_inyectado: misma forma que aportes (None = sin SAT)
+    - inflacion, udi_inicial, tasa_anual, meses, offset: escalares o
+      arreglos (uno por escenario)
+
+    Regresa la matriz (meses × escenarios) de "Saldo Final".
+    Con detalle=True regresa un dict con las columnas de
+    simular_saldo_comprometido_excel.
+    """
+    aportes = np.asarray(aportes, dtype=float)
+    if aportes.ndim == 1:
+        aportes = aportes[:, None]
+
+    n = _num_escenarios(aportes[0], inflacion, udi_inicial, tasa_anual, meses, offset)
+    aportes = np.broadcast_to(aportes, (aportes.shape[0], n))
+
+    if sat_inyectado is None:
+        sat = np.zeros_like(aportes)
+    else:
+        sat = np.asarray(sat_inyectado, dtype=float)
+        if sat.ndim == 1:
+            sat = sat[:, None]
+        sat = np.broadcast_to(sat, aportes.shape)
+
+    inflacion = _vector(inflacion, n)
+    udi_actual = _vector(udi_inicial, n)
+    tasa_mensual = _tasa_mensual_redondeada(_vector(tasa_anual, n), 3)
+    plazo = np.broadcast_to(np.asarray(meses, dtype=int), (n,))
+    offset = np.broadcast_to(np.asarray(offset, dtype=int), (n,))
+
+    total_meses = int(plazo.max())
+    saldo = np.zeros(n)
+
+    columnas = ["Saldo Anterior", "Aportación", "Aporte SAT", "Aportación Total",
+                "Interés", "Cargo Fijo", "Cargo Administrativo",
+                "Cargo Gestión Inversión", "Saldo Final"]
+    tablas = {c: np.full((total_meses, n), np.nan) for c in (columnas if detalle else ["Saldo Final"])}
+
+    for mes in range(1, total_meses + 1):
+        activo = mes <= plazo
+        aportando = activo & (mes > offset)
+
+        aporte_normal = aportes[mes - 1]
+        aporte_sat = sat[mes - 1]
+        aporte_total = aporte_normal + aporte_sat
+
+        saldo_anterior = saldo
+        base_interes = saldo_anterior + aporte_total
+        interes = np.rint(base_interes * tasa_mensual)
+
+        # Cargo fijo de 15 UDIs (igual a Excel)
+        cargo_fijo = - np.rint(15 * udi_actual * (1 + inflacion) * 1.16)
+
+        base_gestion = saldo_anterior + aporte_total + interes + cargo_fijo
+        cargo_gestion = - np.rint(base_gestion * 0.001 * 1.16)
+
+        saldo = np.where(aportando, base_gestion + cargo_gestion, saldo)
+
+        tablas["Saldo Final"][mes - 1] = np.where(activo, saldo, np.nan)
+        if detalle:
+            for col, valor in (
+                ("Saldo Anterior", saldo_anterior),
+                ("Aportación", aporte_normal),
+                ("Aporte SAT", aporte_sat),
+                ("Aportación Total", aporte_total),
+                ("Interés", interes),
+                ("Cargo Fijo", cargo_fijo),
+                ("Cargo Administrativo", np.zeros(n)),
+                ("Cargo Gestión Inversión", cargo_gestion),
+            ):
+                tablas[col][mes - 1] = np.where(aportando, valor, np.where(activo, 0.0, np.nan))
+
+        # Actualización anual de UDI
+        if mes % 12 == 0:
+            udi_actual = udi_actual * (1 + inflacion)
+
+    return tablas if detalle else tablas["Saldo Final"]
+
+
+def simular_bono_vectorizado(
+    aporte_mensual,
+    plazo_anios,
+    tasa_anual_bono=0.09,
+    detalle=False
+):
+    """
+    Simula la tabla del BONO de muchos escenarios a la vez.
+
+    Regresa la matriz (meses × escenarios) de "Saldo Final".
+    Con detalle=True regresa un dict con las columnas de simular_bono_excel.
+    """
+    n = _num_escenarios(aporte_mensual, plazo_anios, tasa_anual_bono)
+    aporte = _vector(aporte_mensual, n)
+    plazo = np.broadcast_to(np.asarray(plazo_anios, dtype=int), (n,))
+
+    porcentaje = np.array([
+        obtener_bono_fidelidad_porcentaje(a, p) for a, p in zip(aporte, plazo)
+    ])
+    bono_mensual = np.rint(aporte * porcentaje)
+    tasa_mensual = _tasa_mensual_redondeada(_vector(tasa_anual_bono, n), 4)
+
+    meses = plazo * 12
+    total_meses = int(meses.max())
+    saldo = np.zeros(n)
+
+    columnas = ["Saldo Anterior", "Bono Mensual", "Interés", "Cargo Administrativo",
+                "Cargo Gestión Inversión", "Saldo Final"]
+    tablas = {c: np.full((total_meses, n), np.nan) for c in (columnas if detalle else ["Saldo Final"])}
+
+    for mes in range(1, total_meses + 1):
+        activo = mes <= meses
+        saldo_anterior = saldo
+
+        # === INTERÉS ===
+        base_interes = saldo_anterior + bono_mensual
+        interes = np.rint(base_interes * tasa_mensual)
+
+        # === CARGO ADMIN CADA 3 MESES ===
+        if mes % 3 == 0:
+            cargo_admin = - np.rint((saldo_anterior + bono_mensual + interes) * 0.009)
+        else:
+            cargo_admin = np.zeros(n)
+
+        if mes > 12:
+            bono_mensual = np.zeros(n)
+
+        # === CARGO DE GESTIÓN (MENSUAL) ===
+        cargo_gestion = - np.rint((saldo_anterior + bono_mensual + interes) * 0.001)
+
+        saldo = np.where(
+            activo,
+            saldo_anterior + bono_mensual + interes + cargo_admin + cargo_gestion,
+            saldo
+        )
+
+        tablas["Saldo Final"][mes - 1] = np.where(activo, saldo, np.nan)
+        if detalle:
+            for col, valor in (
+                ("Saldo Anterior", saldo_anterior),
+                ("Bono Mensual", bono_mensual),
+                ("Interés", interes),
+                ("Cargo Administrativo", cargo_admin),
+                ("Cargo Gestión Inversión", cargo_gestion),
+            ):
+                tablas[col][mes - 1] = np.where(activo, valor, np.nan)
+
+    return tablas if detalle else tablas["Saldo Final"]